@@ -0,0 +1,174 @@
+'''
+Asynchronous plotting for the convolutional patch connectivity experiments.
+
+Instead of drawing every figure inline (which blocks the simulation on matplotlib
+rendering), the training loop publishes snapshots of the quantities it wants to
+show onto a bounded multiprocessing queue. A separate renderer process drains the
+queue at its own frame rate, keeps only the newest snapshot of each kind, and
+draws those; snapshots published while the queue is full are dropped.
+'''
+
+import numpy as np
+import multiprocessing as mp
+import Queue, time
+
+
+class PlotPublisher(object):
+	'''
+	Trainer-side handle on the renderer process. Publishing never blocks the caller.
+	'''
+
+	def __init__(self, config, frame_rate=2.0, queue_size=16):
+		'''
+		config: dictionary of static plotting parameters ('conv_size', 'conv_features', 'n_e', 'wmax_ee')
+		frame_rate: maximum number of redraws per second in the renderer process
+		queue_size: number of snapshots that may be in flight before new ones are dropped
+		'''
+		self.queue = mp.Queue(maxsize=queue_size)
+		self.num_dropped = 0
+
+		self.process = mp.Process(target=render_loop, args=(self.queue, config, frame_rate))
+		self.process.daemon = True
+		self.process.start()
+
+	def publish(self, kind, data):
+		'''
+		Hand a snapshot to the renderer; one of 'input_weights', 'patch_weights', 'votes',
+		'input' or 'performance'. Arrays are copied so the simulation may keep mutating its own.
+		'''
+		if isinstance(data, dict):
+			data = { key : np.array(value) for key, value in data.items() }
+		else:
+			data = np.array(data)
+
+		try:
+			self.queue.put_nowait((kind, data))
+		except Queue.Full:
+			# the renderer is behind; this frame is stale by the time it would be drawn
+			self.num_dropped += 1
+
+	def close(self):
+		'''
+		Ask the renderer to finish and wait for it; its windows close with it, so closing never
+		blocks on a user (or on a display which isn't there).
+		'''
+		try:
+			self.queue.put(None, timeout=1.0)
+		except Queue.Full:
+			self.process.terminate()
+		self.process.join()
+
+
+def render_loop(queue, config, frame_rate):
+	'''
+	Main loop of the renderer process: gather the newest snapshot of each kind, redraw
+	the figures whose data changed, and sleep until the next frame.
+	'''
+	import matplotlib.pyplot as plt
+	import matplotlib.cm as cmap
+
+	plt.ion()
+	frame_time = 1.0 / frame_rate
+	monitors = {}
+	running = True
+
+	while running:
+		frame_start = time.time()
+
+		# drain the queue, only keeping the latest snapshot of every kind
+		latest = {}
+		try:
+			while True:
+				item = queue.get(timeout=frame_time) if not latest else queue.get_nowait()
+				if item is None:
+					running = False
+					break
+				kind, data = item
+				latest[kind] = data
+		except Queue.Empty:
+			pass
+
+		for kind, data in latest.items():
+			if kind not in monitors:
+				monitors[kind] = create_figure(plt, cmap, kind, data, config, len(monitors) + 1)
+			else:
+				update_figure(monitors[kind], kind, data)
+
+		for artist, fig in monitors.values():
+			fig.canvas.draw_idle()
+
+		plt.pause(max(0.001, frame_time - (time.time() - frame_start)))
+
+	plt.close('all')
+
+
+def create_figure(plt, cmap, kind, data, config, fig_num):
+	'''
+	Create the figure for a snapshot kind, mirroring the inline plotting functions of
+	the simulation scripts.
+	'''
+	conv_size, conv_features, n_e, wmax_ee = config['conv_size'], config['conv_features'], config['n_e'], config['wmax_ee']
+
+	if kind == 'input_weights':
+		fig = plt.figure(fig_num, figsize=(18, 18))
+		artist = plt.imshow(data, interpolation='nearest', vmin=0, vmax=wmax_ee, cmap=cmap.get_cmap('hot_r'))
+		plt.colorbar(artist, fraction=0.016)
+		plt.title('Reshaped input -> convolution weights')
+		plt.xticks(xrange(conv_size, conv_size * (conv_features + 1), conv_size), xrange(1, conv_features + 1))
+		plt.yticks(xrange(conv_size, conv_size * (n_e + 1), conv_size), xrange(1, n_e + 1))
+		plt.xlabel('Convolution patch')
+		plt.ylabel('Location in input (from top left to bottom right')
+
+	elif kind == 'patch_weights':
+		fig = plt.figure(fig_num, figsize=(8, 8))
+		artist = plt.imshow(data, interpolation='nearest', vmin=0, vmax=wmax_ee, cmap=cmap.get_cmap('hot_r'))
+		for idx in xrange(n_e, n_e * conv_features, n_e):
+			plt.axvline(idx, ls='--', lw=1)
+			plt.axhline(idx, ls='--', lw=1)
+		plt.colorbar(artist)
+		plt.title('Between-patch connectivity')
+
+	elif kind == 'votes':
+		fig = plt.figure(fig_num, figsize=(6, 4))
+		artist = plt.bar(xrange(10), data)
+		plt.ylim([0, 1])
+		plt.title('Percentage votes per label')
+
+	elif kind == 'input':
+		fig = plt.figure(fig_num, figsize=(5, 5))
+		artist = plt.imshow(data.reshape((28, 28)), interpolation='nearest', vmin=0, vmax=64, cmap=cmap.get_cmap('gray'))
+		plt.colorbar(artist)
+		plt.title('Current input example')
+
+	elif kind == 'performance':
+		fig = plt.figure(fig_num, figsize=(15, 5))
+		artist = {}
+		for performance in sorted(data.keys()):
+			artist[performance], = plt.plot(xrange(len(data[performance])), data[performance], label=performance)
+		plt.ylim(ymax=100)
+		plt.legend(loc='lower right')
+		plt.title('Classification performance')
+
+	else:
+		raise Exception('unknown snapshot kind: ' + kind)
+
+	return artist, fig
+
+
+def update_figure(monitor, kind, data):
+	'''
+	Push a new snapshot into an existing figure.
+	'''
+	artist, fig = monitor
+
+	if kind in [ 'input_weights', 'patch_weights' ]:
+		artist.set_array(data)
+	elif kind == 'input':
+		artist.set_array(data.reshape((28, 28)))
+	elif kind == 'votes':
+		for rect, h in zip(artist, data):
+			rect.set_height(h)
+	elif kind == 'performance':
+		for performance in data:
+			if performance in artist:
+				artist[performance].set_ydata(data[performance])
@@ -0,0 +1,291 @@
+'''
+Synthetic-scale benchmark suite for network construction and simulation.
+
+For every configuration in a parameter grid (conv_size, conv_stride, conv_features,
+connectivity, lattice_structure), runs 'spiking_conv_patch_connectivity_MNIST.py'
+in training mode on a small fixed prefix of the MNIST training set and then in
+test mode on a small prefix of the test set, with per-phase timing traces turned on.
+Reports wall time, peak RSS, synapse counts and the mean time of the hot phases
+(network construction, one example presentation, weight normalization, label
+assignment, evaluation), and compares them against stored baselines so that
+regressions in any hot path are caught locally.
+
+With '--scaling', instead reports how data-parallel training ('--workers', NumPy engine
+only) scales: training throughput and the accuracy of the resulting weights on the test
+prefix, per number of workers.
+
+With '--inhibition full,direct,wta', instead compares the approximate inhibition modes of the
+NumPy engine ('--inhibition' of the simulation script) against the full model: training and
+test throughput, and test accuracy with its difference from the first mode.
+
+All runs happen inside a sandbox directory which mirrors the repository layout
+('code', 'data', 'weights', ...), so benchmark weights and results never overwrite
+those of real experiments.
+
+Usage: python benchmark.py [--grid quick|full] [--save_baseline] [--tolerance 0.25] [--threads 1] [--engine brian|numpy]
+       python benchmark.py --scaling [--workers 1,2,4,8] [--average_interval 100] [--num_train 2000]
+       python benchmark.py --inhibition full,direct,wta [--num_train 1000] [--num_test 500]
+'''
+
+import os, sys, json, time, argparse, itertools, subprocess
+import numpy as np
+
+code_path = os.path.dirname(os.path.abspath(__file__))
+top_level_path = os.path.dirname(code_path)
+benchmark_dir = os.path.join(top_level_path, 'benchmarks')
+sandbox_dir = os.path.join(benchmark_dir, 'sandbox')
+default_baseline = os.path.join(benchmark_dir, 'baselines.json')
+script = os.path.join(code_path, 'spiking_conv_patch_connectivity_MNIST.py')
+
+# (conv_size, conv_stride, conv_features, connectivity, lattice_structure)
+grids = { 'quick' : [ (16, 4, 10, 'none', '4'), (16, 4, 10, 'pairs', '4'), (16, 4, 10, 'all', '4'), (16, 4, 10, 'all', '8'),
+						(16, 4, 25, 'all', '4'), (10, 6, 25, 'all', '4') ],
+			'full' : list(itertools.product([ 10, 16, 22 ], [ 2, 4, 6 ], [ 10, 25, 50 ], [ 'none', 'pairs', 'linear', 'all' ], [ '4', '8' ])) }
+
+# trace phases to report (mean seconds per call), and the run they are taken from
+reported_phases = [ ('train', 'build_network'), ('train', 'run_example'), ('train', 'normalize_weights'),
+						('train', 'assign_labels'), ('train', 'predict_label'), ('test', 'run_example'), ('test', 'evaluate_results') ]
+
+
+def prepare_sandbox():
+	'''
+	Create the sandbox directory tree; the MNIST files are linked in, not copied. The
+	parsed dataset pickles are kept in the sandbox, so they're only built once.
+	'''
+	for d in [ 'code', 'data' ]:
+		if not os.path.isdir(os.path.join(sandbox_dir, d)):
+			os.makedirs(os.path.join(sandbox_dir, d))
+
+	for file_name in os.listdir(os.path.join(top_level_path, 'data')):
+		if 'ubyte' in file_name or file_name.endswith('.pickle'):
+			link = os.path.join(sandbox_dir, 'data', file_name)
+			if not os.path.exists(link):
+				os.symlink(os.path.join(top_level_path, 'data', file_name), link)
+
+
+def config_name(config):
+	'''
+	Key under which a configuration's results and baselines are stored.
+	'''
+	return '_'.join([ str(value) for value in config ])
+
+
+def run(mode, config, num_examples, update_interval, threads, engine, options=()):
+	'''
+	Run one phase of the simulation script for a configuration (with extra command line
+	'options') and return its trace summary, wall time and peak resident set size.
+	'''
+	conv_size, conv_stride, conv_features, connectivity, lattice_structure = config
+	trace_file = os.path.join(sandbox_dir, 'trace_' + mode + '_' + config_name(config) + '.jsonl')
+
+	command = [ sys.executable, script, '--mode=' + mode, '--connectivity=' + connectivity, '--conv_size=' + str(conv_size),
+				'--conv_stride=' + str(conv_stride), '--conv_features=' + str(conv_features), '--lattice_structure=' + lattice_structure,
+				'--num_examples=' + str(num_examples), '--update_interval=' + str(update_interval), '--profile_trace=' + trace_file,
+				'--profile_interval=0', '--threads=' + str(threads), '--engine=' + engine, '--do_plot=' ] + list(options)  # '--do_plot' is parsed with type=bool, so only an empty value disables it
+
+	environment = dict(os.environ, MPLBACKEND='Agg')
+	log = open(os.path.join(sandbox_dir, 'log_' + mode + '_' + config_name(config) + '.txt'), 'w')
+
+	start = time.time()
+	process = subprocess.Popen(command, cwd=os.path.join(sandbox_dir, 'code'), env=environment, stdout=log, stderr=subprocess.STDOUT)
+	# wait4 gives the resource usage of this child alone (ru_maxrss is in kilobytes on Linux)
+	_, status, usage = os.wait4(process.pid, 0)
+	wall = time.time() - start
+	log.close()
+
+	if status != 0:
+		raise Exception(mode + ' run failed for ' + config_name(config) + '; see ' + log.name)
+
+	summary = [ json.loads(line) for line in open(trace_file) ][-1]['summary']
+
+	return { 'wall' : wall, 'peak_rss_mb' : usage.ru_maxrss / 1024.0, 'summary' : summary }
+
+
+def benchmark(config, num_train, num_test, update_interval, threads, engine):
+	'''
+	Benchmark a single configuration (a training run followed by a test run).
+	'''
+	runs = { 'train' : run('train', config, num_train, update_interval, threads, engine),
+				'test' : run('test', config, num_test, num_test, threads, engine) }
+
+	result = { 'wall_train' : runs['train']['wall'], 'wall_test' : runs['test']['wall'],
+				'peak_rss_mb' : max(runs['train']['peak_rss_mb'], runs['test']['peak_rss_mb']) }
+
+	for name, value in runs['train']['summary']['values'].items():
+		if name.startswith('synapses_') or name == 'neurons':
+			result[name] = value
+
+	for mode, phase in reported_phases:
+		summary = runs[mode]['summary']
+		if phase in summary['phases']:
+			result[mode + '_' + phase] = summary['phases'][phase] / summary['calls'][phase]
+
+	return result
+
+
+def assign_labels(rates, labels):
+	'''
+	Assign each neuron the label for which its average rate (over the examples in 'rates', one
+	row per example) is highest.
+	'''
+	label_rates = np.array([ np.mean(rates[labels == label], axis=0) if np.any(labels == label) else np.zeros(rates.shape[1]) for label in xrange(10) ])
+	return np.argmax(label_rates, axis=0)
+
+
+def vote(rates, assignments):
+	'''
+	Label of every example in 'rates' by the 'all' voting mechanism: the label whose assigned
+	neurons have the highest mean rate.
+	'''
+	votes = np.array([ np.mean(rates[:, assignments == label], axis=1) if np.any(assignments == label) else np.zeros(len(rates)) for label in xrange(10) ])
+	return np.argmax(votes, axis=0)
+
+
+def get_accuracy(num_examples, start):
+	'''
+	Accuracy of the 'all' voting mechanism on the newest test results written after 'start',
+	with labels assigned on those same results (as 'evaluate_results' does).
+	'''
+	activity_dir = os.path.join(sandbox_dir, 'activity', 'conv_patch_connectivity_activity')
+
+	def newest(prefix):
+		files = [ os.path.join(activity_dir, f) for f in os.listdir(activity_dir) if f.startswith(prefix + str(num_examples) + '_') ]
+		return max([ f for f in files if os.path.getmtime(f) >= start ], key=os.path.getmtime)
+
+	rates = np.load(newest('results_')).reshape((num_examples, -1))
+	labels = np.load(newest('input_numbers_'))
+
+	return np.mean(vote(rates, assign_labels(rates, labels)) == labels) * 100
+
+
+def scaling(config, num_train, num_test, update_interval, worker_counts, average_interval):
+	'''
+	Train a configuration with each number of data-parallel workers and test the result;
+	returns training throughput (examples per second) and test accuracy per worker count.
+	'''
+	results = {}
+	for num_workers in worker_counts:
+		train = run('train', config, num_train, update_interval, 1, 'numpy', [ '--workers=' + str(num_workers),
+																			'--average_interval=' + str(average_interval) ])
+		start = time.time()
+		run('test', config, num_test, num_test, 1, 'numpy')
+		results[num_workers] = { 'throughput' : num_train / train['wall'], 'accuracy' : get_accuracy(num_test, start) }
+
+	return results
+
+
+def inhibition(config, num_train, num_test, update_interval, modes):
+	'''
+	Train and test a configuration with each inhibition mode; returns training and test
+	throughput (examples per second) and test accuracy per mode.
+	'''
+	results = {}
+	for mode in modes:
+		train = run('train', config, num_train, update_interval, 1, 'numpy', [ '--inhibition=' + mode ])
+		start = time.time()
+		test = run('test', config, num_test, num_test, 1, 'numpy', [ '--inhibition=' + mode ])
+		results[mode] = { 'train' : num_train / train['wall'], 'test' : num_test / test['wall'], 'accuracy' : get_accuracy(num_test, start) }
+
+	return results
+
+
+def compare(results, baselines, tolerance):
+	'''
+	Print results next to their baselines, flagging timings / memory which regressed
+	by more than 'tolerance' (relative), and changed synapse counts. Returns the
+	number of regressions.
+	'''
+	num_regressions = 0
+
+	for name in sorted(results):
+		print '\n' + name
+		print '%-32s %14s %14s %10s' % ('metric', 'current', 'baseline', 'change')
+
+		for metric in sorted(results[name]):
+			current = results[name][metric]
+			baseline = baselines.get(name, {}).get(metric)
+
+			if baseline is None:
+				print '%-32s %14.4f %14s %10s' % (metric, current, '-', '-')
+				continue
+
+			change = (current - baseline) / float(baseline) if baseline != 0 else 0.0
+			if metric.startswith('synapses_') or metric == 'neurons':
+				regressed = current != baseline
+			else:
+				regressed = change > tolerance
+
+			num_regressions += regressed
+			print '%-32s %14.4f %14.4f %9.1f%%%s' % (metric, current, baseline, 100 * change, '  <-- REGRESSION' if regressed else '')
+
+	return num_regressions
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+
+	parser.add_argument('--grid', default='quick')
+	parser.add_argument('--num_train', type=int, default=101)
+	parser.add_argument('--num_test', type=int, default=100)
+	parser.add_argument('--update_interval', type=int, default=50)
+	parser.add_argument('--baseline', default=default_baseline)
+	parser.add_argument('--save_baseline', action='store_true')
+	parser.add_argument('--tolerance', type=float, default=0.25)
+	parser.add_argument('--threads', type=int, default=1)
+	parser.add_argument('--engine', default='brian')
+	parser.add_argument('--scaling', action='store_true')
+	parser.add_argument('--workers', default='1,2,4,8')
+	parser.add_argument('--average_interval', type=int, default=100)
+	parser.add_argument('--inhibition', default=None)
+
+	args = parser.parse_args()
+
+	prepare_sandbox()
+
+	if args.scaling or args.inhibition is not None:
+		# the test runs of both modes load the weights their training run saved
+		for d in [ 'weights/conv_patch_connectivity_weights', 'activity/conv_patch_connectivity_activity' ]:
+			if not os.path.isdir(os.path.join(sandbox_dir, d)):
+				os.makedirs(os.path.join(sandbox_dir, d))
+
+	if args.scaling:
+		worker_counts = [ int(num_workers) for num_workers in args.workers.split(',') ]
+		if any([ args.num_train % num_workers != 0 for num_workers in worker_counts ]):
+			raise Exception('--num_train must be divisible by every number of --workers')
+		for config in grids[args.grid]:
+			print '\n' + config_name(config)
+			print '%-10s %16s %10s %10s' % ('workers', 'examples / s', 'speedup', 'accuracy')
+
+			results = scaling(config, args.num_train, args.num_test, args.update_interval, worker_counts, args.average_interval)
+			for num_workers in worker_counts:
+				print '%-10d %16.2f %9.2fx %10.2f' % (num_workers, results[num_workers]['throughput'], results[num_workers]['throughput'] / \
+																results[worker_counts[0]]['throughput'], results[num_workers]['accuracy'])
+		sys.exit(0)
+
+	if args.inhibition is not None:
+		modes = args.inhibition.split(',')
+		for config in grids[args.grid]:
+			print '\n' + config_name(config)
+			print '%-10s %16s %16s %10s %10s %12s' % ('inhibition', 'train ex. / s', 'test ex. / s', 'speedup', 'accuracy', 'difference')
+
+			results = inhibition(config, args.num_train, args.num_test, args.update_interval, modes)
+			for mode in modes:
+				print '%-10s %16.2f %16.2f %9.2fx %10.2f %12.2f' % (mode, results[mode]['train'], results[mode]['test'], results[mode]['train'] / \
+																results[modes[0]]['train'], results[mode]['accuracy'], results[mode]['accuracy'] - results[modes[0]]['accuracy'])
+		sys.exit(0)
+
+	results = {}
+	for config in grids[args.grid]:
+		print '...benchmarking', config_name(config)
+		results[config_name(config)] = benchmark(config, args.num_train, args.num_test, args.update_interval, args.threads, args.engine)
+
+	baselines = json.load(open(args.baseline)) if os.path.isfile(args.baseline) else {}
+	num_regressions = compare(results, baselines, args.tolerance)
+
+	if args.save_baseline:
+		baselines.update(results)
+		json.dump(baselines, open(args.baseline, 'w'), indent=2, sort_keys=True)
+		print '\n...saved baselines to', args.baseline
+
+	print '\n', num_regressions, 'regression(s) found\n'
+	sys.exit(1 if num_regressions > 0 and not args.save_baseline else 0)
@@ -9,6 +9,7 @@ import networkx as nx
 from scipy.sparse import coo_matrix
 from struct import unpack
 from brian import *
+from topology_cache import get_lattice_mask
 
 fig_num = 0
 wmax_ee = 1.0
@@ -34,20 +35,23 @@ def get_matrix_from_file(file_name, n_src, n_tgt):
 	return weight_matrix
 
 
-def get_patch_weights():
+def get_patch_weights(sparse=False):
 	'''
-	Get the weights from the input to excitatory layer and reshape them.
+	Get the weights between excitatory neurons of different convolution patches which
+	lie on the lattice, straight from the stored (row, column, entry) triplets. Returned
+	as a dense matrix, or as a scipy COO matrix if 'sparse' is set.
 	'''
+	readout = np.load(weight_dir + file_name)
+	rows, cols, data = np.int32(readout[:,0]), np.int32(readout[:,1]), readout[:,2]
+
+	# keep only between-patch synapses connecting lattice neighbors
+	keep = np.logical_and(rows // n_e != cols // n_e, get_lattice_mask(n_e_sqrt, lattice_structure)[rows % n_e, cols % n_e])
+
+	if sparse:
+		return coo_matrix((data[keep], (rows[keep], cols[keep])), shape=(conv_features * n_e, conv_features * n_e))
+
 	rearranged_weights = np.zeros((conv_features * n_e, conv_features * n_e))
-	connection = weight_matrix
-
-	for feature in xrange(conv_features):
-		for other_feature in xrange(conv_features):
-			if feature != other_feature:
-				for this_n in xrange(n_e):
-					for other_n in xrange(n_e):
-						if is_lattice_connection(n_e_sqrt, this_n, other_n):
-							rearranged_weights[feature * n_e + this_n, other_feature * n_e + other_n] = connection[feature * n_e + this_n, other_feature * n_e + other_n]
+	rearranged_weights[rows[keep], cols[keep]] = data[keep]
 
 	return rearranged_weights
 
@@ -0,0 +1,158 @@
+'''
+Lightweight per-phase timing instrumentation for the simulation loops.
+
+Wrap each phase of the training / test loop in 'timer.phase(name)' and call
+'timer.end_example(j)' once per example. When the timer is disabled, 'phase' hands
+back a shared do-nothing context manager, so the instrumented code pays only for
+a method call. When enabled, it prints a summary table every 'summary_interval'
+examples and can write one JSON line per example to a trace file, for comparing
+configurations and finding hot spots after the fact.
+'''
+
+import json, timeit
+
+from collections import defaultdict
+
+
+class NullPhase(object):
+	'''
+	Context manager which does nothing; used when instrumentation is disabled.
+	'''
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		return False
+
+
+null_phase = NullPhase()
+
+
+class Phase(object):
+	'''
+	Context manager which adds the time spent inside it to a named timer.
+	'''
+
+	def __init__(self, timer, name):
+		self.timer, self.name = timer, name
+
+	def __enter__(self):
+		self.start = timeit.default_timer()
+		return self
+
+	def __exit__(self, *args):
+		self.timer.add(self.name, timeit.default_timer() - self.start)
+		return False
+
+
+class PhaseTimer(object):
+	'''
+	Named timers and counters around the phases of a simulation loop.
+	'''
+
+	def __init__(self, enabled=False, summary_interval=100, trace_file=None, metadata=None):
+		'''
+		enabled: whether to record anything at all
+		summary_interval: number of examples between printed summary tables (0 to disable)
+		trace_file: path of a JSON-lines file to write per-example timings to (None to disable)
+		metadata: dictionary (e.g., the network configuration) written as the first trace line
+		'''
+		self.enabled = enabled or trace_file is not None
+		self.summary_interval = summary_interval
+
+		self.totals, self.calls, self.counters = defaultdict(float), defaultdict(int), defaultdict(int)
+		self.values = {}
+		self.example_totals, self.example_counters = defaultdict(float), defaultdict(int)
+		self.num_examples = 0
+		self.start = timeit.default_timer()
+
+		self.trace = None
+		if trace_file is not None:
+			self.trace = open(trace_file, 'w')
+			self.trace.write(json.dumps({ 'metadata' : metadata or {} }) + '\n')
+
+	def phase(self, name):
+		'''
+		Context manager timing the enclosed block under 'name'.
+		'''
+		if not self.enabled:
+			return null_phase
+		return Phase(self, name)
+
+	def add(self, name, elapsed):
+		'''
+		Record 'elapsed' seconds spent in phase 'name'.
+		'''
+		self.totals[name] += elapsed
+		self.calls[name] += 1
+		self.example_totals[name] += elapsed
+
+	def count(self, name, value=1):
+		'''
+		Increment the counter 'name' by 'value'.
+		'''
+		if not self.enabled:
+			return
+		self.counters[name] += value
+		self.example_counters[name] += value
+
+	def set_value(self, name, value):
+		'''
+		Record a static quantity (e.g., a synapse count) to report alongside the timings.
+		'''
+		if not self.enabled:
+			return
+		self.values[name] = value
+
+	def end_example(self, example_num):
+		'''
+		Close the bookkeeping for one input example: write its trace line and print
+		the summary table if it is due.
+		'''
+		if not self.enabled:
+			return
+
+		self.num_examples += 1
+
+		if self.trace is not None:
+			self.trace.write(json.dumps({ 'example' : example_num, 'phases' : dict(self.example_totals), \
+											'counters' : dict(self.example_counters) }) + '\n')
+
+		self.example_totals, self.example_counters = defaultdict(float), defaultdict(int)
+
+		if self.summary_interval and self.num_examples % self.summary_interval == 0:
+			self.print_summary()
+
+	def print_summary(self):
+		'''
+		Print a table of the time spent per phase since the start of the simulation.
+		'''
+		wall = timeit.default_timer() - self.start
+
+		print '\nTiming summary after', self.num_examples, 'examples (%.2f s wall clock):' % wall
+		print '%-24s %10s %12s %12s %8s' % ('phase', 'calls', 'total (s)', 'mean (ms)', '% wall')
+		for name in sorted(self.totals, key=lambda name: -self.totals[name]):
+			print '%-24s %10d %12.3f %12.3f %8.1f' % (name, self.calls[name], self.totals[name], \
+						1000.0 * self.totals[name] / self.calls[name], 100.0 * self.totals[name] / wall)
+		for name in sorted(self.counters):
+			print '%-24s %10d' % (name, self.counters[name])
+		for name in sorted(self.values):
+			print '%-24s %10s' % (name, self.values[name])
+		print '\n'
+
+	def close(self):
+		'''
+		Print the final summary and close the trace file.
+		'''
+		if not self.enabled:
+			return
+
+		self.print_summary()
+
+		if self.trace is not None:
+			self.trace.write(json.dumps({ 'summary' : { 'wall' : timeit.default_timer() - self.start, \
+					'examples' : self.num_examples, 'phases' : dict(self.totals), 'calls' : dict(self.calls), \
+					'counters' : dict(self.counters), 'values' : self.values } }) + '\n')
+			self.trace.close()
+			self.trace = None
@@ -0,0 +1,105 @@
+'''
+Validates the exact exponential integrator of 'spiking_conv_patch_connectivity_MNIST.py'
+('--integrator=exact') at larger timesteps against the 0.5 ms forward Euler baseline.
+
+For every configuration, trains the network once with the baseline on a small fixed prefix of
+the MNIST training set. Every (integrator, dt) pair then tests those same weights on a prefix
+of the test set, so the comparison isolates the integration error from training divergence.
+Reports the simulation speed of each test run (simulated ms per wall clock second), its
+per-example spike counts compared with those of the baseline (same images and weights, no
+plasticity), and the accuracy of the 'all' voting mechanism with labels assigned on the test
+run itself (as 'evaluate_results' does). Runs happen in the benchmark sandbox (see
+'benchmark.py').
+
+Usage: python integrator_validation.py [--num_train 500] [--num_test 200] [--engine brian|numpy]
+'''
+
+import os, sys, json, time, argparse, subprocess
+import numpy as np
+
+from benchmark import code_path, sandbox_dir, prepare_sandbox, config_name, get_accuracy
+
+script = os.path.join(code_path, 'spiking_conv_patch_connectivity_MNIST.py')
+
+# (integrator, dt in ms); the first one is the baseline
+integrators = [ ('euler', 0.5), ('exact', 0.5), ('exact', 1.0), ('exact', 2.0) ]
+
+# (conv_size, conv_stride, conv_features, connectivity, lattice_structure)
+configs = [ (16, 4, 10, 'none', '4'), (16, 4, 10, 'all', '4'), (16, 4, 50, 'all', '8') ]
+
+# trace phases which advance simulated time, with the simulated seconds per call
+run_phases = { 'run_example' : 0.35, 'run_rest' : 0.15, 'run_retry_rest' : 0.15 }
+
+
+def run(mode, config, integrator, dt, num_examples, engine):
+	'''
+	Run one phase of the simulation script; returns the per-example trace lines and the summary.
+	'''
+	conv_size, conv_stride, conv_features, connectivity, lattice_structure = config
+	name = mode + '_' + integrator + '_' + str(dt) + '_' + config_name(config)
+	trace_file = os.path.join(sandbox_dir, 'trace_integrator_' + name + '.jsonl')
+
+	command = [ sys.executable, script, '--mode=' + mode, '--connectivity=' + connectivity, '--conv_size=' + str(conv_size),
+				'--conv_stride=' + str(conv_stride), '--conv_features=' + str(conv_features), '--lattice_structure=' + lattice_structure,
+				'--num_examples=' + str(num_examples), '--integrator=' + integrator, '--dt=' + str(dt), '--engine=' + engine,
+				'--profile_trace=' + trace_file, '--profile_interval=0', '--do_plot=' ]
+
+	environment = dict(os.environ, MPLBACKEND='Agg')
+	log = open(os.path.join(sandbox_dir, 'log_integrator_' + name + '.txt'), 'w')
+	status = subprocess.call(command, cwd=os.path.join(sandbox_dir, 'code'), env=environment, stdout=log, stderr=subprocess.STDOUT)
+	log.close()
+
+	if status != 0:
+		raise Exception(mode + ' run failed for ' + name + '; see ' + log.name)
+
+	lines = [ json.loads(line) for line in open(trace_file) ]
+	return [ line for line in lines if 'example' in line ], lines[-1]['summary']
+
+
+def validate(config, integrator, dt, num_test, engine):
+	'''
+	Test the trained weights of one configuration with one integrator; returns the test run's
+	per-example spike counts, speed and accuracy.
+	'''
+	start = time.time()
+	examples, summary = run('test', config, integrator, dt, num_test, engine)
+
+	simulated = sum([ summary['calls'].get(phase, 0) * duration for phase, duration in run_phases.items() ])
+	wall = sum([ summary['phases'].get(phase, 0.0) for phase in run_phases ])
+
+	return { 'spikes' : np.array([ example['counters'].get('spikes', 0) for example in examples ], dtype=float),
+				'speed' : 1000.0 * simulated / wall, 'accuracy' : get_accuracy(num_test, start) }
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+
+	parser.add_argument('--num_train', type=int, default=500)
+	parser.add_argument('--num_test', type=int, default=200)
+	parser.add_argument('--engine', default='brian')
+
+	args = parser.parse_args()
+
+	prepare_sandbox()
+	for d in [ 'weights/conv_patch_connectivity_weights', 'activity/conv_patch_connectivity_activity', 'performance/conv_patch_connectivity_performance' ]:
+		if not os.path.isdir(os.path.join(sandbox_dir, d)):
+			os.makedirs(os.path.join(sandbox_dir, d))
+
+	print '%-24s %-14s %14s %9s %14s %16s %12s %10s' % ('configuration', 'integrator', 'sim. ms / s', 'speedup', 'spikes / ex.',
+																'rel. difference', 'correlation', 'accuracy')
+	for config in configs:
+		# the test runs all load the weights (and thresholds) of this baseline training run
+		run('train', config, integrators[0][0], integrators[0][1], args.num_train, args.engine)
+
+		baseline = None
+		for integrator, dt in integrators:
+			result = validate(config, integrator, dt, args.num_test, args.engine)
+			if baseline is None:
+				baseline = result
+
+			# per-example spike counts relative to the baseline's, on the same test images
+			difference = np.mean(np.abs(result['spikes'] - baseline['spikes']) / np.maximum(baseline['spikes'], 1.0))
+			correlation = np.corrcoef(result['spikes'], baseline['spikes'])[0, 1]
+
+			print '%-24s %-14s %14.1f %8.2fx %14.1f %15.1f%% %12.3f %10.2f' % (config_name(config), integrator + ' ' + str(dt) + ' ms',
+					result['speed'], result['speed'] / baseline['speed'], np.mean(result['spikes']), 100 * difference, correlation, result['accuracy'])
@@ -0,0 +1,183 @@
+'''
+Location-partitioned simulation of NumPy engine networks whose convolution locations never
+interact (connectivity 'none', without random inhibition): every location only sees the input
+pixels of its window, and inhibition only couples the features at the same location, so the
+network splits exactly into independent sub-networks, one per block of locations, which share
+nothing but the input spikes.
+
+Each block is simulated by a worker process forked when the partitions are set up (the engine's
+per-step work is mostly Python overhead on small arrays, which threads would serialize on the
+GIL). The state arrays declared by the engine objects ('partition_arrays') are moved to shared
+memory, so the main process keeps reading and writing them (weight normalization, thresholds,
+spike counts) between runs as before. For every run, the main process draws the input spikes of
+all timesteps, and every worker copies its locations' state in, simulates them, and copies it
+back out.
+'''
+
+import sys, traceback
+import numpy as np
+import multiprocessing as mp
+
+import numpy_engine as ne
+
+
+def get_objects(network):
+	return network.groups + network.connections + network.plasticity + network.counters
+
+
+def get_skipped(network):
+	'''
+	Connections without any synapses (e.g., the lattice connections of connectivity 'none'), and
+	their plasticity, which partitions can leave out.
+	'''
+	skipped = [ connection for connection in network.connections if isinstance(connection, ne.SparseConnection) and len(connection.data) == 0 ]
+	return skipped + [ stdp for stdp in network.plasticity if stdp.connection in skipped ]
+
+
+def is_location_separable(network):
+	'''
+	Whether 'network' splits into independent sub-networks by convolution location.
+	'''
+	skipped = get_skipped(network)
+	inputs = [ obj for obj in network.groups if isinstance(obj, ne.PoissonInput) ]
+
+	for obj in get_objects(network):
+		if isinstance(obj, ne.PoissonInput) or obj in skipped:
+			continue
+		if not hasattr(obj, 'get_partition'):
+			return False
+		if isinstance(obj, ne.LocationInhibition) and obj.residual is not None:
+			return False
+
+	return len(inputs) == 1
+
+
+def get_index(kind, axis, neurons, locations):
+	index = { 'neurons' : neurons, 'locations' : locations, 'shared' : slice(None) }[kind]
+	return (slice(None),) * axis + (index,)
+
+
+class LocationPartitions(object):
+	'''
+	Simulates 'network' (of 'n_features' features at 'n_e' locations) in 'num_workers' location
+	blocks, one per worker process; 'run' replaces the network's own.
+	'''
+
+	def __init__(self, network, n_features, n_e, num_workers):
+		if not is_location_separable(network):
+			raise Exception('the network does not split by convolution location')
+
+		self.network, self.num_workers = network, num_workers
+		self.input = [ obj for obj in network.groups if isinstance(obj, ne.PoissonInput) ][0]
+		skipped = get_skipped(network)
+		self.objects = [ obj for obj in get_objects(network) if obj is not self.input and obj not in skipped ]
+
+		# move the full state to shared memory, where the workers can write it back
+		for obj in self.objects:
+			for name, kind, axis in obj.partition_arrays:
+				array = getattr(obj, name)
+				if array is not None:
+					shared = np.frombuffer(mp.RawArray('b', array.nbytes), dtype=array.dtype).reshape(array.shape)
+					shared[:] = array
+					setattr(obj, name, shared)
+
+		self.blocks = np.array_split(np.arange(n_e), num_workers)
+		self.indices = [ (ne.get_location_neurons(n_features, n_e, locations), locations) for locations in self.blocks ]
+		self.partitions = [ self.get_partition(*index) for index in self.indices ]
+
+		# flush buffered output, or the forked workers would print it again
+		sys.stdout.flush()
+
+		self.pipes, self.workers = [], []
+		for worker in xrange(num_workers):
+			pipe, worker_pipe = mp.Pipe()
+			process = mp.Process(target=self.run_worker, args=(worker, worker_pipe))
+			process.daemon = True
+			process.start()
+			self.pipes.append(pipe)
+			self.workers.append(process)
+
+	def get_partition(self, neurons, locations):
+		'''
+		Sub-network of the objects restricted to 'locations'; input spikes are set on the
+		(unstepped) input group directly.
+		'''
+		network = ne.NumpyNetwork(self.network.dt)
+		partitions = { self.input : self.input }
+
+		for obj in self.objects:
+			partitions[obj] = obj.get_partition(neurons, locations, partitions)
+			for name, kind, axis in obj.partition_arrays:
+				array = getattr(obj, name)
+				if array is not None:
+					setattr(partitions[obj], name, np.array(array[get_index(kind, axis, neurons, locations)], order='C'))
+			network.add(partitions[obj])
+
+		return network, [ partitions[obj] for obj in self.objects ]
+
+	def copy_state(self, worker, into_partition):
+		neurons, locations = self.indices[worker]
+		for obj, partition in zip(self.objects, self.partitions[worker][1]):
+			for name, kind, axis in obj.partition_arrays:
+				array = getattr(obj, name)
+				if array is None:
+					continue
+
+				index = get_index(kind, axis, neurons, locations)
+				if into_partition:
+					getattr(partition, name)[:] = array[index]
+				elif kind != 'shared' or worker == 0:
+					# shared state evolves the same in every partition
+					array[index] = getattr(partition, name)
+
+	def run_worker(self, worker, pipe):
+		network = self.partitions[worker][0]
+
+		while True:
+			message = pipe.recv()
+			if message is None:
+				break
+
+			try:
+				start, indptr, spikes = message
+				self.copy_state(worker, into_partition=True)
+
+				network.step_count = start
+				for step in xrange(len(indptr) - 1):
+					self.input.spikes = spikes[indptr[step] : indptr[step + 1]]
+					network.step()
+
+				self.copy_state(worker, into_partition=False)
+				pipe.send(None)
+			except Exception:
+				pipe.send(traceback.format_exc())
+
+	def run(self, duration):
+		'''
+		Simulate the network for 'duration' seconds.
+		'''
+		network = self.network
+		start, num_steps = network.step_count, int(round(duration / network.dt))
+
+		# the input spikes, drawn as the unpartitioned network would
+		spikes = [ self.input.update(step, network.random_state) for step in xrange(start, start + num_steps) ]
+		indptr = np.concatenate([ [ 0 ], np.cumsum([ len(step_spikes) for step_spikes in spikes ]) ])
+		spikes = np.concatenate(spikes) if num_steps > 0 else np.zeros(0, dtype=np.intp)
+
+		for pipe in self.pipes:
+			pipe.send((start, indptr, spikes))
+		for worker, pipe in enumerate(self.pipes):
+			error = pipe.recv()
+			if error is not None:
+				raise Exception('location partition ' + str(worker) + ' failed:\n' + error)
+
+		network.step_count = start + num_steps
+		for group in network.groups:
+			if isinstance(group, ne.NeuronGroup):
+				group.decay_steps = network.step_count
+
+	def close(self):
+		for pipe in self.pipes:
+			pipe.send(None)
+		for process in self.workers:
+			process.join()
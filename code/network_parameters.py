@@ -0,0 +1,31 @@
+'''
+Neuron and connection parameters of the network of 'spiking_conv_patch_connectivity_MNIST.py',
+shared with the scripts which rebuild or model its test mode without brian ('pruned_network.py',
+'rate_surrogate.py'). Potentials are in mV and times in ms (presentation times in seconds), as
+written in the spiking script, which attaches the brian units; the NumPy scripts convert them to
+volts and seconds.
+'''
+
+# rest potential parameters, reset potential parameters, threshold potential parameters, and refractory periods
+v_rest_e, v_rest_i = -65., -60.
+v_reset_e, v_reset_i = -65., -45.
+v_thresh_e, v_thresh_i = -52., -40.
+refrac_e, refrac_i = 5., 2.
+
+# the excitatory threshold is 'v_thresh_e + theta - offset'
+offset = 20.0
+
+# membrane and excitatory conductance time constants, and inhibitory reversal potentials
+tc_v_e, tc_v_i = 100., 10.
+tc_ge = 1.0
+v_inhibitory_e, v_inhibitory_i = -100., -85.
+
+# the neurons start this far below their rest potentials
+v_init_below_rest = 40.
+
+# fixed weights of the excitatory -> inhibitory and inhibitory -> excitatory connections
+weight_ei, weight_ie = 10.4, 17.4
+
+# time (in seconds) per example presentation and rest period in between, and the starting input intensity
+single_example_time, resting_time = 0.35, 0.15
+start_input_intensity = 2.0
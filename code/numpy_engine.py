@@ -0,0 +1,805 @@
+'''
+Event-driven NumPy simulation engine for the convolutional patch connectivity network.
+
+A drop-in alternative to the brian 1 objects built in 'spiking_conv_patch_connectivity_MNIST.py'
+(selected there with '--engine=numpy'). State is kept in flat arrays indexed like the brian
+groups (excitatory neuron 'feature * n_e + n' sits at location 'n' of patch 'feature'), and
+synaptic propagation is event-driven: each timestep only the synapses of the neurons / input
+pixels which actually spiked are touched, so the per-step cost of a connection is proportional
+to the number of spikes it carries, not to its number of synapses.
+
+The input -> excitatory connection is stored as a dense (conv_features, n_e, conv_size ** 2)
+kernel, with an inverse of the convolution gather index (pixel -> (location, window position)
+pairs) to find the synapses of a spiking pixel. Its synaptic delays are handled with a circular
+buffer of pending conductance increments.
+
+Groups, connections, plasticity and counters which can be split by convolution location declare
+their state arrays in 'partition_arrays' as (attribute, kind, axis) triples, where 'kind' is
+'neurons' (indexed by neuron along 'axis'), 'locations' (indexed by location along 'axis') or
+'shared' (the same for every location), and build a copy of themselves restricted to some
+locations with 'get_partition' (see 'location_partitions.py').
+
+For inference, the input and lattice weights can be kept 'quantized': as 8-bit codes with one
+scale per feature, dequantized on the fly for the synapses which carry spikes.
+'''
+
+import copy
+import numpy as np
+
+from scipy.sparse import coo_matrix, csr_matrix
+
+
+def get_positions(indptr, rows):
+	'''
+	Positions of all entries of 'rows' in an array segmented by 'indptr' (as in a CSR
+	matrix), concatenated in the order of 'rows'.
+	'''
+	starts = indptr[rows]
+	lengths = indptr[rows + 1] - starts
+	total = np.sum(lengths)
+
+	if total == 0:
+		return np.zeros(0, dtype=np.intp)
+
+	return np.arange(total) - np.repeat(np.cumsum(lengths) - lengths - starts, lengths)
+
+
+def get_segments(keys, n_keys):
+	'''
+	Stable ordering of 'keys' and the 'indptr' array delimiting the entries of each key in it.
+	'''
+	order = np.argsort(keys, kind='mergesort')
+	indptr = np.concatenate([ [ 0 ], np.cumsum(np.bincount(keys, minlength=n_keys)) ])
+	return order, indptr
+
+
+def get_location_neurons(n_features, n_e, locations):
+	'''
+	Indices of the neurons of every feature at 'locations', feature by feature (the order of the
+	neurons of a group restricted to those locations).
+	'''
+	return np.ravel(np.arange(n_features)[:, np.newaxis] * n_e + np.asarray(locations)[np.newaxis, :])
+
+
+def quantize(weights, features, n_features):
+	'''
+	8-bit codes of the non-negative 'weights' and one scale per feature (its largest weight / 255),
+	given the feature of every weight in 'features'; weights are approximated by
+	codes * scale[features].
+	'''
+	if np.any(weights < 0):
+		raise Exception('only non-negative weights can be quantized')
+
+	features = np.broadcast_to(features, weights.shape)
+	scale = np.zeros(n_features)
+	np.maximum.at(scale, np.ravel(features), np.ravel(weights))
+	scale /= 255.0
+
+	codes = np.round(weights / np.where(scale > 0, scale, 1.0)[features])
+	return codes.astype(np.uint8), scale
+
+
+class PoissonInput(object):
+	'''
+	Group of independent Poisson spike sources; set 'rate' (in Hz, scalar or per source)
+	to change the firing rates.
+	'''
+
+	def __init__(self, n, dt):
+		self.n, self.dt = n, dt
+		self.spikes = np.zeros(0, dtype=np.intp)
+		self.rate = 0
+
+	@property
+	def rate(self):
+		return self._rate
+
+	@rate.setter
+	def rate(self, rate):
+		# only sources with a non-zero rate are sampled (most MNIST pixels are blank)
+		self._rate = np.ones(self.n) * rate
+		self.active = np.flatnonzero(self._rate)
+		self.spike_probability = self._rate[self.active] * self.dt
+
+	def update(self, step, random_state):
+		self.spikes = self.active[random_state.random_sample(len(self.active)) < self.spike_probability]
+		return self.spikes
+
+
+class NeuronGroup(object):
+	'''
+	Conductance-based leaky integrate-and-fire neurons with an optional adaptive threshold:
+
+		dv/dt = ((v_rest - v) + ge * -v + gi * (v_inhibitory - v)) / tau
+		dge/dt = -ge / tc_ge, dgi/dt = -gi / tc_gi
+		dtheta/dt = -theta / tc_theta (if 'tc_theta' is given)
+
+	They spike if v > theta - offset + v_thresh and the reset timer (which runs at 100 times the
+	simulation clock from the last spike) has run past 'refractory'; on a spike, v is reset (and
+	held at v_reset for 'refractory'), and theta grows by 'theta_plus'. Both conditions are
+	computed from the integer step of each neuron's last spike, so no timer is integrated.
+
+	With method 'euler', state variables are integrated with the forward Euler method, like
+	brian does for these (nonlinear) equations. With method 'exact', the linear decays of ge, gi
+	and theta use their exact exponential propagators, and v relaxes exponentially towards its
+	equilibrium under the conductances averaged over the step, which stays accurate for timesteps
+	well above the 1 ms conductance time constant.
+
+	With 'lazy_theta', the (very slow) decay of theta is not integrated every step: each neuron's
+	theta is stored with the number of decay steps applied to it, and brought up to date with the
+	per-step factor raised to the missing steps only when the neuron spikes or theta is read.
+	Thresholds are first tested against a common lower bound of the decayed thetas, and only the
+	candidates which cross it are checked exactly; all thetas are brought up to date whenever
+	that bound drifts more than 'theta_tolerance' (relative) below them.
+
+	With 'wta_locations' (the number of locations n_e of a convolution layer), at most one neuron
+	per location ('feature * n_e + n' for all features) spikes in a timestep: the one furthest
+	above its threshold.
+	'''
+
+	theta_tolerance = 1e-3
+
+	partition_arrays = tuple([ (name, 'neurons', 0) for name in [ 'v', 'ge', 'gi', 'theta_value', 'theta_steps', 'last_spike' ] ])
+
+	def __init__(self, n, dt, tau, v_rest, v_reset, v_thresh, v_inhibitory, refractory, v_init, tc_ge=1e-3, tc_gi=2e-3,
+					theta=None, theta_plus=0.0, tc_theta=None, offset=0.0, method='euler', lazy_theta=False, wta_locations=None):
+		if method not in [ 'euler', 'exact' ]:
+			raise Exception('unknown integration method: ' + str(method))
+
+		self.n, self.dt, self.tau, self.method = n, dt, tau, method
+		self.v_rest, self.v_reset, self.v_thresh, self.v_inhibitory = v_rest, v_reset, v_thresh, v_inhibitory
+		self.tc_ge, self.tc_gi = tc_ge, tc_gi
+		self.theta_plus, self.tc_theta, self.offset = theta_plus, tc_theta, offset
+		self.wta_locations = wta_locations
+
+		self.v = np.ones(n) * v_init
+		self.ge, self.gi = np.zeros(n), np.zeros(n)
+		self.theta_value = np.zeros(n) if theta is None else np.ones(n) * theta
+
+		# neurons which spiked less than 'refractory_steps' steps ago are held at the reset potential,
+		# and neurons which spiked 'timer_steps' steps ago or less cannot cross the threshold
+		self.refractory_steps = int(refractory / dt)
+		self.timer_steps = refractory / (100.0 * dt)
+		self.last_spike = -np.ones(n, dtype=np.int64) * (self.refractory_steps + 1)
+		self.refractory = refractory
+
+		self.spikes = np.zeros(0, dtype=np.intp)
+
+		# propagators of the exact method: per-step decay factors, and the mean of a decaying
+		# conductance over a step relative to its value at the start of the step
+		self.ge_decay, self.gi_decay = np.exp(-dt / tc_ge), np.exp(-dt / tc_gi)
+		self.ge_mean, self.gi_mean = (1.0 - self.ge_decay) * tc_ge / dt, (1.0 - self.gi_decay) * tc_gi / dt
+		self.theta_decay = np.exp(-dt / tc_theta) if tc_theta is not None else 1.0
+
+		# lazy theta decay: per-step factor of the integration method, decay steps applied to
+		# each neuron's theta, decay steps elapsed, and decay steps at the last full update
+		self.lazy_theta = lazy_theta and tc_theta is not None
+		self.theta_factor = self.theta_decay if method == 'exact' else 1.0 - dt / tc_theta if tc_theta is not None else 1.0
+		self.theta_steps, self.decay_steps, self.theta_flushed = np.zeros(n, dtype=np.int64), 0, 0
+		self.check_theta()
+
+	@property
+	def theta(self):
+		'''
+		Adaptive thresholds (brought up to date first with lazy decay).
+		'''
+		if self.lazy_theta:
+			self.flush_theta()
+		return self.theta_value
+
+	@theta.setter
+	def theta(self, theta):
+		self.theta_value[:] = theta
+		self.theta_steps[:] = self.decay_steps
+		self.check_theta()
+
+	def check_theta(self):
+		# the common lower bound of the decayed thetas only holds for non-negative ones
+		if self.lazy_theta and np.any(self.theta_value < 0):
+			raise Exception('lazy theta decay needs non-negative thresholds')
+
+	def flush_theta(self, neurons=None):
+		'''
+		Apply the pending decay of the thetas of 'neurons' (all if None).
+		'''
+		if neurons is None:
+			neurons = slice(None)
+			self.theta_flushed = self.decay_steps
+
+		self.theta_value[neurons] *= self.theta_factor ** (self.decay_steps - self.theta_steps[neurons])
+		self.theta_steps[neurons] = self.decay_steps
+
+	def get_winners(self, spikes):
+		'''
+		The spike of each location in 'spikes' furthest above its threshold.
+		'''
+		theta = self.theta_value[spikes]
+		if self.lazy_theta:
+			theta *= self.theta_factor ** (self.decay_steps - self.theta_steps[spikes])
+
+		locations = spikes % self.wta_locations
+		order = np.lexsort((theta - self.v[spikes], locations))
+		first = np.concatenate([ [ True ], locations[order][1:] != locations[order][:-1] ])
+		return np.sort(spikes[order][first])
+
+	def get_lazy_spikes(self, step):
+		refractory = step - self.last_spike > self.timer_steps
+		bound = self.theta_factor ** (self.decay_steps - self.theta_flushed)
+		if bound < 1.0 - self.theta_tolerance:
+			self.flush_theta()
+			bound = 1.0
+
+		candidates = np.flatnonzero((self.v > self.theta_value * bound - self.offset + self.v_thresh) & refractory)
+		theta = self.theta_value[candidates] * self.theta_factor ** (self.decay_steps - self.theta_steps[candidates])
+		return candidates[self.v[candidates] > theta - self.offset + self.v_thresh]
+
+	def update(self, step, random_state):
+		'''
+		Integrate the state variables over one timestep and return the indices of the
+		neurons which spiked.
+		'''
+		if self.method == 'exact':
+			ge, gi = self.ge * self.ge_mean, self.gi * self.gi_mean
+			conductance = 1.0 + ge + gi
+			v_inf = (self.v_rest + gi * self.v_inhibitory) / conductance
+			self.v[:] = v_inf + (self.v - v_inf) * np.exp(-self.dt * conductance / self.tau)
+			self.ge *= self.ge_decay
+			self.gi *= self.gi_decay
+			if self.tc_theta is not None and not self.lazy_theta:
+				self.theta_value *= self.theta_decay
+		else:
+			dv = ((self.v_rest - self.v) + self.ge * -self.v + self.gi * (self.v_inhibitory - self.v)) / self.tau
+			self.v += self.dt * dv
+			self.ge -= self.dt * self.ge / self.tc_ge
+			self.gi -= self.dt * self.gi / self.tc_gi
+			if self.tc_theta is not None and not self.lazy_theta:
+				self.theta_value -= self.dt * self.theta_value / self.tc_theta
+		self.decay_steps = step + 1
+
+		if self.lazy_theta:
+			self.spikes = self.get_lazy_spikes(step)
+		else:
+			self.spikes = np.flatnonzero((self.v > self.theta_value - self.offset + self.v_thresh) & (step - self.last_spike > self.timer_steps))
+
+		if self.wta_locations is not None and len(self.spikes) > 1:
+			self.spikes = self.get_winners(self.spikes)
+		self.last_spike[self.spikes] = step
+		return self.spikes
+
+	def reset(self, step):
+		'''
+		Reset the neurons which spiked this step, and hold the refractory ones at v_reset.
+		'''
+		self.v[step - self.last_spike < self.refractory_steps] = self.v_reset
+		if self.theta_plus != 0.0:
+			if self.lazy_theta:
+				self.flush_theta(self.spikes)
+			self.theta_value[self.spikes] += self.theta_plus
+
+	def get_partition(self, neurons, locations, partitions):
+		partition = copy.copy(self)
+		partition.n = len(neurons)
+		if self.wta_locations is not None:
+			partition.wta_locations = len(locations)
+		return partition
+
+
+class SpikeCounter(object):
+	'''
+	Number of spikes of every neuron of a group since the start of the simulation.
+	'''
+
+	partition_arrays = (('count', 'neurons', 0),)
+
+	def __init__(self, group):
+		self.group = group
+		self.count = np.zeros(group.n, dtype=np.int64)
+
+	def update(self):
+		self.count[self.group.spikes] += 1
+
+	def get_partition(self, neurons, locations, partitions):
+		partition = copy.copy(self)
+		partition.group = partitions[self.group]
+		return partition
+
+
+class SparseConnection(object):
+	'''
+	Generic synapses from 'source' to 'target', stored in CSR form; a spike of source neuron
+	'i' adds the weights of row 'i' to the state variable 'state' of the targets.
+	'''
+
+	def __init__(self, source, target, state, sources, targets, weights):
+		self.source, self.target, self.state = source, target, state
+		self.shape = (source.n, target.n)
+
+		matrix = csr_matrix((weights, (sources, targets)), shape=self.shape)
+		matrix.sum_duplicates()
+		self.indptr, self.indices, self.data = matrix.indptr, matrix.indices, matrix.data.astype(np.float64)
+		self.rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+		# column view, for finding the synapses onto a spiking target neuron
+		self.column_order, self.column_indptr = get_segments(self.indices, self.shape[1])
+
+	@property
+	def W(self):
+		return csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
+
+	def propagate(self, step):
+		positions = get_positions(self.indptr, self.source.spikes)
+		if len(positions) > 0:
+			getattr(self.target, self.state)[:] += np.bincount(self.indices[positions], self.data[positions], minlength=self.shape[1])
+
+	def get_pre_synapses(self, neurons):
+		'''
+		Positions (in 'data') of the synapses from the source neurons 'neurons'.
+		'''
+		return get_positions(self.indptr, neurons)
+
+	def get_post_synapses(self, neurons):
+		'''
+		Positions (in 'data') of the synapses onto the target neurons 'neurons'.
+		'''
+		return self.column_order[get_positions(self.column_indptr, neurons)]
+
+	def normalize_row_blocks(self, total, block_size):
+		'''
+		Scale the weights of each block of 'block_size' consecutive source neurons to sum to 'total'.
+		'''
+		block_sums = np.bincount(self.rows // block_size, self.data, minlength=self.shape[0] // block_size)
+		# empty blocks have nothing to scale (and 'total' is zero without any synapses)
+		factors = total / np.where(block_sums > 0, block_sums, 1.0)
+		self.data *= factors[self.rows // block_size]
+
+
+class LatticeConnection(object):
+	'''
+	Synapses between convolution patches which follow a lattice: each one links location 'n' of
+	feature 'f' to location 'n + offset' of feature 'g', for a set of (f, g) feature pairs and
+	a small set of offsets (the diagonals of the lattice's n_e x n_e adjacency matrix). Stored
+	DIA-style as data[pair, offset, n], the weight of (f, n) -> (g, n + offset), with 'valid'
+	marking which entries are synapses (the lattice is cut at the patch borders).
+
+	If 'quantized', data holds 8-bit codes, with one scale per source feature.
+	'''
+
+	def __init__(self, source, target, state, n_e, sources, targets, weights, quantized=False):
+		self.source, self.target, self.state, self.n_e = source, target, state, n_e
+		self.shape = (source.n, target.n)
+		n_features = target.n // n_e
+
+		locations = sources % n_e
+		pairs, pair_index = np.unique((sources // n_e) * n_features + targets // n_e, return_inverse=True)
+		self.offsets, offset_index = np.unique(targets % n_e - locations, return_inverse=True)
+		self.pair_sources, self.pair_targets = pairs // n_features, pairs % n_features
+
+		self.data = np.zeros((len(pairs), len(self.offsets), n_e))
+		self.valid = np.zeros((len(pairs), len(self.offsets), n_e), dtype=bool)
+		self.data[pair_index, offset_index, locations] = weights
+		self.valid[pair_index, offset_index, locations] = True
+
+		self.scale = None
+		if quantized:
+			self.data, self.scale = quantize(self.data, self.pair_sources[:, np.newaxis, np.newaxis], n_features)
+
+		# feature pairs by source and by target feature
+		self.source_order, self.source_indptr = get_segments(self.pair_sources, n_features)
+		self.target_order, self.target_indptr = get_segments(self.pair_targets, n_features)
+
+	@property
+	def W(self):
+		pairs, offsets, locations = np.nonzero(self.valid)
+		sources = self.pair_sources[pairs] * self.n_e + locations
+		targets = self.pair_targets[pairs] * self.n_e + locations + self.offsets[offsets]
+		return coo_matrix((self.get_weights((pairs, offsets, locations)), (sources, targets)), shape=self.shape)
+
+	def get_weights(self, synapses):
+		'''
+		Weights of the (pair, offset, location) indices 'synapses'.
+		'''
+		if self.scale is None:
+			return self.data[synapses]
+		return self.data[synapses] * self.scale[self.pair_sources[synapses[0]]]
+
+	def get_pre_synapses(self, neurons):
+		'''
+		(pair, offset, location) indices of the synapses from the source neurons 'neurons',
+		and their target neurons.
+		'''
+		features, locations = neurons // self.n_e, neurons % self.n_e
+		pairs = self.source_order[get_positions(self.source_indptr, features)]
+		locations = np.repeat(locations, np.diff(self.source_indptr)[features])
+
+		pairs, offsets = np.repeat(pairs, len(self.offsets)), np.tile(np.arange(len(self.offsets)), len(locations))
+		locations = np.repeat(locations, len(self.offsets))
+		keep = self.valid[pairs, offsets, locations]
+		pairs, offsets, locations = pairs[keep], offsets[keep], locations[keep]
+
+		return (pairs, offsets, locations), self.pair_targets[pairs] * self.n_e + locations + self.offsets[offsets]
+
+	def get_post_synapses(self, neurons):
+		'''
+		(pair, offset, location) indices of the synapses onto the target neurons 'neurons',
+		and their source neurons.
+		'''
+		features, target_locations = neurons // self.n_e, neurons % self.n_e
+		pairs = self.target_order[get_positions(self.target_indptr, features)]
+		target_locations = np.repeat(target_locations, np.diff(self.target_indptr)[features])
+
+		pairs, offsets = np.repeat(pairs, len(self.offsets)), np.tile(np.arange(len(self.offsets)), len(target_locations))
+		locations = np.repeat(target_locations, len(self.offsets)) - self.offsets[offsets]
+		keep = (locations >= 0) & (locations < self.n_e)
+		pairs, offsets, locations = pairs[keep], offsets[keep], locations[keep]
+		keep = self.valid[pairs, offsets, locations]
+		pairs, offsets, locations = pairs[keep], offsets[keep], locations[keep]
+
+		return (pairs, offsets, locations), self.pair_sources[pairs] * self.n_e + locations
+
+	def propagate(self, step):
+		if len(self.source.spikes) > 0:
+			synapses, targets = self.get_pre_synapses(self.source.spikes)
+			getattr(self.target, self.state)[:] += np.bincount(targets, self.get_weights(synapses), minlength=self.shape[1])
+
+	def normalize_row_blocks(self, total, block_size):
+		'''
+		Scale the weights of each source feature (block of 'block_size' = n_e source neurons)
+		to sum to 'total'.
+		'''
+		if block_size != self.n_e:
+			raise Exception('lattice connections can only be normalized per feature')
+		if self.scale is not None:
+			raise Exception('quantized weights cannot be normalized')
+
+		block_sums = np.bincount(self.pair_sources, np.sum(self.data, axis=(1, 2)), minlength=self.shape[0] // self.n_e)
+		# empty blocks have nothing to scale (and 'total' is zero without any synapses)
+		factors = total / np.where(block_sums > 0, block_sums, 1.0)
+		self.data *= factors[self.pair_sources][:, np.newaxis, np.newaxis]
+
+
+class OneToOneConnection(object):
+	'''
+	Synapses of weight 'weight' from each source neuron to the target neuron with the same index;
+	spikes add the weight directly into the targets' state variable, with no synapses stored.
+	'''
+
+	partition_arrays = ()
+
+	def __init__(self, source, target, state, weight):
+		if source.n != target.n:
+			raise Exception('one-to-one connections need groups of the same size')
+
+		self.source, self.target, self.state, self.weight = source, target, state, weight
+		self.shape = (source.n, target.n)
+
+	@property
+	def W(self):
+		return coo_matrix((np.ones(self.source.n) * self.weight, (np.arange(self.source.n), np.arange(self.source.n))), shape=self.shape)
+
+	def propagate(self, step):
+		getattr(self.target, self.state)[self.source.spikes] += self.weight
+
+	def get_partition(self, neurons, locations, partitions):
+		partition = copy.copy(self)
+		partition.source, partition.target = partitions[self.source], partitions[self.target]
+		partition.shape = (len(neurons), len(neurons))
+		return partition
+
+
+class LocationInhibition(object):
+	'''
+	Synapses of weight 'weight' from every neuron 'feature * n_e + n' to the neurons
+	'other_feature * n_e + n' at the same location in all other features, applied without
+	storing them: each step, the spikes are counted per location, the count (times 'weight') is
+	added to every feature at that location, and each spiking neuron's own contribution is taken
+	back out. Edges given in ('sources', 'targets', 'weights') which don't follow this pattern
+	(e.g., random extra inhibition) are kept as a small sparse residual.
+	'''
+
+	partition_arrays = ()
+
+	def __init__(self, source, target, state, conv_features, n_e, weight, sources, targets, weights):
+		self.source, self.target, self.state = source, target, state
+		self.n_features, self.n_e, self.weight = conv_features, n_e, weight
+		self.shape = (source.n, target.n)
+
+		pattern = (sources % n_e == targets % n_e) & (sources // n_e != targets // n_e)
+		if np.sum(pattern) != conv_features * (conv_features - 1) * n_e or np.any(weights[pattern] != weight):
+			raise Exception('edges do not contain the complete same-location pattern with weight ' + str(weight))
+
+		self.residual = None
+		if not np.all(pattern):
+			self.residual = SparseConnection(source, target, state, sources[~pattern], targets[~pattern], weights[~pattern])
+
+	@property
+	def W(self):
+		neurons = np.arange(self.n_features * self.n_e)
+		sources = np.repeat(neurons, self.n_features)
+		targets = np.tile(np.arange(self.n_features), len(neurons)) * self.n_e + sources % self.n_e
+		keep = sources != targets
+
+		W = coo_matrix((np.ones(np.sum(keep)) * self.weight, (sources[keep], targets[keep])), shape=self.shape)
+		if self.residual is not None:
+			W = (W + self.residual.W).tocoo()
+		return W
+
+	def propagate(self, step):
+		spikes = self.source.spikes
+
+		if len(spikes) > 0:
+			state = getattr(self.target, self.state)
+			counts = np.bincount(spikes % self.n_e, minlength=self.n_e)
+			locations = np.flatnonzero(counts)
+			state.reshape((self.n_features, self.n_e))[:, locations] += self.weight * counts[locations]
+			state[spikes] -= self.weight
+
+		if self.residual is not None:
+			self.residual.propagate(step)
+
+	def get_partition(self, neurons, locations, partitions):
+		# the residual may link different locations
+		if self.residual is not None:
+			raise Exception('inhibition with a residual cannot be split by location')
+
+		partition = copy.copy(self)
+		partition.source, partition.target = partitions[self.source], partitions[self.target]
+		partition.n_e, partition.shape = len(locations), (len(neurons), len(neurons))
+		return partition
+
+
+class ConvolutionConnection(object):
+	'''
+	Input -> excitatory synapses of the convolution patches: neuron 'feature * n_e + n' receives
+	one synapse from every pixel of window 'convolution_locations[n]', stored as
+	weights[feature, n, k] for the window's k-th pixel.
+
+	'delays' (in timesteps, one per synapse and less than 'max_delay' / dt + 1) are optional;
+	without them, spikes arrive in the same timestep (as for the brian connection, whose delays
+	are all left at zero).
+
+	If 'quantized', weights holds 8-bit codes, with one scale per feature.
+	'''
+
+	partition_arrays = (('weights', 'locations', 1), ('buffer', 'neurons', 1))
+
+	def __init__(self, source, target, state, convolution_locations, conv_features, weights, dt, max_delay=0.0, delays=None, quantized=False):
+		self.source, self.target, self.state = source, target, state
+		self.locations = convolution_locations
+		self.n_features = conv_features
+		self.n_e, self.window_size = convolution_locations.shape
+		self.weights = np.array(weights, dtype=np.float64).reshape((conv_features, self.n_e, self.window_size))
+
+		self.scale = None
+		if quantized:
+			self.weights, self.scale = quantize(self.weights, np.arange(conv_features)[:, np.newaxis, np.newaxis], conv_features)
+
+		# inverse of the gather index: the (location, window position) pairs of every pixel
+		self.inverse, self.inverse_indptr = get_segments(np.ravel(convolution_locations), source.n)
+		self.feature_offsets = np.arange(conv_features)[:, np.newaxis] * self.n_e
+
+		self.delays, self.buffer = None, None
+		if delays is not None:
+			num_slots = int(round(max_delay / dt)) + 1
+			self.delays = np.asarray(delays).reshape((conv_features, self.n_e * self.window_size))
+			if np.any(self.delays < 0) or np.any(self.delays >= num_slots):
+				raise Exception('synaptic delays must lie in [0, max_delay]')
+			# pending conductance increments, one slot per timestep up to the longest delay
+			self.buffer = np.zeros((num_slots, conv_features * self.n_e))
+
+	@property
+	def W(self):
+		rows = np.tile(np.ravel(self.locations), self.n_features)
+		cols = np.repeat(np.arange(self.n_features * self.n_e), self.window_size)
+		weights = self.weights if self.scale is None else self.weights * self.scale[:, np.newaxis, np.newaxis]
+		return coo_matrix((np.ravel(weights), (rows, cols)), shape=(self.source.n, self.n_features * self.n_e))
+
+	def get_synapses(self, pixels):
+		'''
+		Flat (location * window_size + window position) indices of the synapses of 'pixels',
+		shared by all features.
+		'''
+		return self.inverse[get_positions(self.inverse_indptr, pixels)]
+
+	def propagate(self, step):
+		state = getattr(self.target, self.state)
+		synapses = self.get_synapses(self.source.spikes)
+
+		if len(synapses) > 0:
+			weights = self.weights.reshape((self.n_features, -1))[:, synapses]
+			if self.scale is not None:
+				weights = weights * self.scale[:, np.newaxis]
+			targets = self.feature_offsets + synapses // self.window_size
+
+			if self.buffer is None:
+				state += np.bincount(np.ravel(targets), np.ravel(weights), minlength=len(state))
+			else:
+				slots = (step + self.delays[:, synapses]) % len(self.buffer)
+				self.buffer += np.bincount(np.ravel(slots * len(state) + targets), np.ravel(weights), minlength=self.buffer.size).reshape(self.buffer.shape)
+
+		# deliver the increments which are due this step
+		if self.buffer is not None:
+			slot = step % len(self.buffer)
+			state += self.buffer[slot]
+			self.buffer[slot] = 0.0
+
+	def get_partition(self, neurons, locations, partitions):
+		partition = copy.copy(self)
+		partition.source, partition.target = partitions[self.source], partitions[self.target]
+		partition.locations, partition.n_e = self.locations[locations], len(locations)
+
+		partition.inverse, partition.inverse_indptr = get_segments(np.ravel(partition.locations), self.source.n)
+		partition.feature_offsets = np.arange(self.n_features)[:, np.newaxis] * partition.n_e
+		if self.delays is not None:
+			delays = self.delays.reshape((self.n_features, self.n_e, self.window_size))[:, locations]
+			partition.delays = delays.reshape((self.n_features, -1))
+		return partition
+
+
+class STDP(object):
+	'''
+	Pair-based STDP with exponentially decaying pre- and postsynaptic traces:
+
+		on a presynaptic spike: pre = 1; w -= nu_pre * post (* w ** exp_pre with weight dependence)
+		on a postsynaptic spike: w += nu_post * pre (* (wmax - w) ** exp_post with weight dependence); post = 1
+
+	with weights clipped to [0, wmax]. Subclasses locate the synapses of the spiking neurons.
+
+	Traces are kept per neuron as (value, step of the last spike) and decayed analytically when
+	read, i.e. only for the partners of spiking neurons, so the cost of plasticity scales with
+	the number of spikes rather than the number of neurons times the number of steps.
+	'''
+
+	def __init__(self, connection, dt, tc_pre, tc_post, nu_pre, nu_post, wmax, depression=True, weight_dependence=False,
+					exp_pre=0.2, exp_post=0.2):
+		if getattr(connection, 'scale', None) is not None:
+			raise Exception('quantized weights are read-only')
+
+		self.connection = connection
+		self.nu_pre, self.nu_post, self.wmax = nu_pre, nu_post, wmax
+		self.depression, self.weight_dependence, self.exp_pre, self.exp_post = depression, weight_dependence, exp_pre, exp_post
+
+		self.pre_value, self.post_value = np.zeros(connection.source.n), np.zeros(connection.target.n)
+		self.pre_step, self.post_step = np.zeros(connection.source.n, dtype=np.int64), np.zeros(connection.target.n, dtype=np.int64)
+		self.pre_decay, self.post_decay = np.exp(-dt / tc_pre), np.exp(-dt / tc_post)
+
+	def get_pre(self, neurons, step):
+		'''
+		Presynaptic traces of 'neurons' at 'step'.
+		'''
+		return self.pre_value[neurons] * self.pre_decay ** (step - self.pre_step[neurons])
+
+	def get_post(self, neurons, step):
+		'''
+		Postsynaptic traces of 'neurons' at 'step'.
+		'''
+		return self.post_value[neurons] * self.post_decay ** (step - self.post_step[neurons])
+
+	def depress(self, weights, post):
+		if self.weight_dependence:
+			return np.maximum(weights - self.nu_pre * post * weights ** self.exp_pre, 0.0)
+		return np.maximum(weights - self.nu_pre * post, 0.0)
+
+	def potentiate(self, weights, pre):
+		if self.weight_dependence:
+			return np.minimum(weights + self.nu_post * pre * (self.wmax - weights) ** self.exp_post, self.wmax)
+		return np.minimum(weights + self.nu_post * pre, self.wmax)
+
+	def update(self, step):
+		pre_spikes, post_spikes = self.connection.source.spikes, self.connection.target.spikes
+
+		self.pre_value[pre_spikes], self.pre_step[pre_spikes] = 1.0, step
+		if self.depression and len(pre_spikes) > 0:
+			self.on_pre(pre_spikes, step)
+
+		if len(post_spikes) > 0:
+			self.on_post(post_spikes, step)
+		self.post_value[post_spikes], self.post_step[post_spikes] = 1.0, step
+
+
+class SparseSTDP(STDP):
+	'''
+	STDP on the synapses of a 'SparseConnection'.
+	'''
+
+	def on_pre(self, spikes, step):
+		positions = self.connection.get_pre_synapses(spikes)
+		data = self.connection.data
+		data[positions] = self.depress(data[positions], self.get_post(self.connection.indices[positions], step))
+
+	def on_post(self, spikes, step):
+		positions = self.connection.get_post_synapses(spikes)
+		data = self.connection.data
+		data[positions] = self.potentiate(data[positions], self.get_pre(self.connection.rows[positions], step))
+
+
+class LatticeSTDP(STDP):
+	'''
+	STDP on the synapses of a 'LatticeConnection'.
+	'''
+
+	def on_pre(self, spikes, step):
+		synapses, targets = self.connection.get_pre_synapses(spikes)
+		data = self.connection.data
+		data[synapses] = self.depress(data[synapses], self.get_post(targets, step))
+
+	def on_post(self, spikes, step):
+		synapses, sources = self.connection.get_post_synapses(spikes)
+		data = self.connection.data
+		data[synapses] = self.potentiate(data[synapses], self.get_pre(sources, step))
+
+
+class ConvolutionSTDP(STDP):
+	'''
+	STDP on the synapses of a 'ConvolutionConnection'; only the kernel entries of the spiking
+	pixels / neurons are touched.
+	'''
+
+	partition_arrays = (('pre_value', 'shared', 0), ('pre_step', 'shared', 0), ('post_value', 'neurons', 0), ('post_step', 'neurons', 0))
+
+	def get_partition(self, neurons, locations, partitions):
+		partition = copy.copy(self)
+		partition.connection = partitions[self.connection]
+		return partition
+
+	def on_pre(self, spikes, step):
+		connection = self.connection
+		synapses = connection.get_synapses(spikes)
+		weights = connection.weights.reshape((connection.n_features, -1))
+		post = self.get_post(connection.feature_offsets + synapses // connection.window_size, step)
+		weights[:, synapses] = self.depress(weights[:, synapses], post)
+
+	def on_post(self, spikes, step):
+		connection = self.connection
+		features, locations = spikes // connection.n_e, spikes % connection.n_e
+		pre = self.get_pre(connection.locations[locations], step)
+		connection.weights[features, locations] = self.potentiate(connection.weights[features, locations], pre)
+
+
+class NumpyNetwork(object):
+	'''
+	Container stepping groups, connections, plasticity and counters, in the order brian
+	updates them: state updates and thresholds, spike propagation, STDP, then resets.
+	'''
+
+	def __init__(self, dt, seed=None):
+		self.dt = dt
+		self.groups, self.connections, self.plasticity, self.counters = [], [], [], []
+		self.random_state = np.random.RandomState(seed)
+		self.step_count = 0
+
+	def add(self, *objects):
+		for obj in objects:
+			if isinstance(obj, (PoissonInput, NeuronGroup)):
+				self.groups.append(obj)
+			elif isinstance(obj, (SparseConnection, LatticeConnection, OneToOneConnection, LocationInhibition, ConvolutionConnection)):
+				self.connections.append(obj)
+			elif isinstance(obj, STDP):
+				self.plasticity.append(obj)
+			elif isinstance(obj, SpikeCounter):
+				self.counters.append(obj)
+			else:
+				raise Exception('cannot add object of type ' + type(obj).__name__ + ' to the network')
+
+	def step(self):
+		step = self.step_count
+
+		for group in self.groups:
+			group.update(step, self.random_state)
+		for connection in self.connections:
+			connection.propagate(step)
+		for stdp in self.plasticity:
+			stdp.update(step)
+		for group in self.groups:
+			if isinstance(group, NeuronGroup):
+				group.reset(step)
+		for counter in self.counters:
+			counter.update()
+
+		self.step_count += 1
+
+	def run(self, duration):
+		'''
+		Simulate the network for 'duration' seconds.
+		'''
+		for _ in xrange(int(round(duration / self.dt))):
+			self.step()
@@ -0,0 +1,113 @@
+'''
+Data-parallel training support: several worker processes train copies of the same network on
+disjoint shards of the training set, and every so often merge their plastic state (input and
+lattice weights, adaptive thresholds) through shared memory.
+
+The workers are forked from the process which built the network, so they all start from the
+same state. At each synchronization point every worker copies its state into its own slot of
+the shared arrays, waits for the others, and replaces its state with the merged one: the mean
+over workers, or (for weight sharing, where the kernels of a feature must stay identical at
+every location) the state of the worker whose neurons of that feature spiked the most since
+the last synchronization.
+'''
+
+import numpy as np
+import multiprocessing as mp
+
+
+class Barrier(object):
+	'''
+	Reusable barrier for 'n' processes (multiprocessing has none in Python 2). Once aborted
+	(e.g., because one of the processes failed and will never arrive), every waiting and
+	later call to 'wait' raises.
+	'''
+
+	# seconds between checks of the abort flag while waiting
+	poll_interval = 1.0
+
+	def __init__(self, n):
+		self.n = n
+		self.count, self.generation = mp.Value('i', 0, lock=False), mp.Value('i', 0, lock=False)
+		self.aborted = mp.Value('b', 0, lock=False)
+		self.condition = mp.Condition()
+
+	def abort(self):
+		# only the flag is set: a failed process may have died holding the condition's lock
+		self.aborted.value = 1
+
+	def wait(self):
+		with self.condition:
+			generation = self.generation.value
+			self.count.value += 1
+
+			if self.count.value == self.n:
+				self.count.value = 0
+				self.generation.value += 1
+				self.condition.notify_all()
+			else:
+				while generation == self.generation.value and not self.aborted.value:
+					self.condition.wait(self.poll_interval)
+
+		if self.aborted.value:
+			raise Exception('barrier aborted: another process failed')
+
+
+class WeightAverager(object):
+	'''
+	Merges the plastic state of 'num_workers' workers through shared memory.
+
+	state: dictionary of named arrays (e.g., weights, thresholds); only their shapes are used here
+	merge: 'mean' to average all arrays over workers, or 'winner' to take each row along the
+		first axis (the feature) of 'winner_arrays' from the worker with the highest score for
+		that feature, out of 'num_features'
+	'''
+
+	def __init__(self, state, num_workers, merge='mean', winner_arrays=(), num_features=0):
+		if merge not in [ 'mean', 'winner' ]:
+			raise Exception('unknown merge method: ' + str(merge))
+
+		self.num_workers, self.merge, self.winner_arrays = num_workers, merge, winner_arrays
+		self.shared = { name : self.allocate((num_workers,) + array.shape) for name, array in state.items() }
+		self.barrier = Barrier(num_workers)
+
+		# per-worker scores since the last synchronization, and this process' running total
+		self.scores, self.previous_scores = self.allocate((num_workers, num_features)), np.zeros(num_features)
+
+	def allocate(self, shape):
+		return np.frombuffer(mp.RawArray('d', int(np.prod(shape)))).reshape(shape)
+
+	def synchronize(self, worker, state, scores=None):
+		'''
+		Called by every worker at the same points of training: publish this worker's 'state',
+		then overwrite it in place with the merged state. 'scores' is the cumulative per-feature
+		spike count of this worker, used by the 'winner' merge.
+		'''
+		for name, array in state.items():
+			self.shared[name][worker] = array
+
+		if self.merge == 'winner':
+			self.scores[worker] = scores - self.previous_scores
+			self.previous_scores = np.array(scores, dtype=np.float64)
+
+		self.barrier.wait()
+		self.get_merged(state)
+
+		# nobody may publish the next state before everyone has read this one
+		self.barrier.wait()
+
+	def abort(self):
+		'''
+		Release every worker waiting to synchronize (they raise), e.g. when one of them failed.
+		'''
+		self.barrier.abort()
+
+	def get_merged(self, state):
+		'''
+		Write the merged state of the last synchronization into the arrays of 'state'.
+		'''
+		for name, array in state.items():
+			if self.merge == 'winner' and name in self.winner_arrays:
+				winners = np.argmax(self.scores, axis=0)
+				array[:] = self.shared[name][winners, np.arange(len(winners))]
+			else:
+				array[:] = np.mean(self.shared[name], axis=0)
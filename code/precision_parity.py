@@ -0,0 +1,89 @@
+'''
+Checks that the float32 simulation mode of 'spiking_conv_patch_connectivity_MNIST_brian2.py'
+matches its float64 baseline.
+
+For every configuration in a grid, trains the network on a small fixed prefix of the
+MNIST training set once per precision, then reports wall time, peak RSS, checkpoint size
+and classification accuracy (over all but the first 'update_interval' examples, for
+which no labels have been assigned yet). Runs happen in the benchmark sandbox (see
+'benchmark.py'), so they never touch real weights or results.
+
+Usage: python precision_parity.py [--num_examples 500] [--standalone] [--threads 1]
+'''
+
+import os, sys, time, argparse, subprocess
+import numpy as np
+
+from benchmark import code_path, sandbox_dir, prepare_sandbox, config_name
+
+script = os.path.join(code_path, 'spiking_conv_patch_connectivity_MNIST_brian2.py')
+precisions = [ 'float64', 'float32' ]
+
+# label assignment interval of the script in training mode
+update_interval = 100
+
+# (conv_size, conv_stride, conv_features, connectivity, lattice_structure)
+configs = [ (16, 4, 10, 'none', '4'), (16, 4, 10, 'all', '4'), (16, 4, 50, 'all', '8') ]
+
+
+def run(config, precision, num_examples, standalone, threads):
+	'''
+	Train one configuration at one precision; returns wall time, peak RSS, checkpoint size
+	and accuracy.
+	'''
+	conv_size, conv_stride, conv_features, connectivity, lattice_structure = config
+
+	command = [ sys.executable, script, '--mode=train', '--connectivity=' + connectivity, '--conv_size=' + str(conv_size),
+				'--conv_stride=' + str(conv_stride), '--conv_features=' + str(conv_features), '--lattice_structure=' + lattice_structure,
+				'--num_examples=' + str(num_examples), '--precision=' + precision, '--threads=' + str(threads) ]
+	if standalone:
+		command.append('--standalone')
+
+	environment = dict(os.environ, MPLBACKEND='Agg')
+	log = open(os.path.join(sandbox_dir, 'log_precision_' + precision + '_' + config_name(config) + '.txt'), 'w')
+
+	start = time.time()
+	process = subprocess.Popen(command, cwd=os.path.join(sandbox_dir, 'code'), env=environment, stdout=log, stderr=subprocess.STDOUT)
+	_, status, usage = os.wait4(process.pid, 0)
+	wall = time.time() - start
+	log.close()
+
+	if status != 0:
+		raise Exception('run failed for ' + config_name(config) + ' at ' + precision + '; see ' + log.name)
+
+	# the newest files written by this run
+	activity_dir = os.path.join(sandbox_dir, 'activity', 'conv_patch_connectivity_activity')
+	weights_dir = os.path.join(sandbox_dir, 'weights', 'conv_patch_connectivity_weights')
+	suffix = '_' + precision if precision != 'float64' else ''
+
+	output_file = max([ os.path.join(activity_dir, f) for f in os.listdir(activity_dir) if f.startswith('train_output_numbers_' + str(num_examples) + '_') \
+							and f.endswith(suffix + '.npy') ], key=os.path.getmtime)
+	outputs = np.load(output_file)[update_interval:]
+
+	checkpoint_size = sum([ os.path.getsize(os.path.join(weights_dir, f)) for f in os.listdir(weights_dir) \
+							if os.path.getmtime(os.path.join(weights_dir, f)) >= start ])
+
+	return { 'wall' : wall, 'peak_rss_mb' : usage.ru_maxrss / 1024.0, 'checkpoint_mb' : checkpoint_size / 1024.0 ** 2,
+				'accuracy' : np.mean(outputs[:, 0] == outputs[:, 1]) * 100 }
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+
+	parser.add_argument('--num_examples', type=int, default=500)
+	parser.add_argument('--standalone', action='store_true')
+	parser.add_argument('--threads', type=int, default=1)
+
+	args = parser.parse_args()
+
+	prepare_sandbox()
+	for d in [ 'weights/conv_patch_connectivity_weights', 'activity/conv_patch_connectivity_activity', 'performance/conv_patch_connectivity_performance' ]:
+		if not os.path.isdir(os.path.join(sandbox_dir, d)):
+			os.makedirs(os.path.join(sandbox_dir, d))
+
+	print '%-24s %-8s %10s %12s %14s %10s' % ('configuration', 'dtype', 'wall (s)', 'peak RSS (MB)', 'checkpoint (MB)', 'accuracy')
+	for config in configs:
+		for precision in precisions:
+			result = run(config, precision, args.num_examples, args.standalone, args.threads)
+			print '%-24s %-8s %10.1f %12.1f %14.2f %10.2f' % (config_name(config), precision, result['wall'], result['peak_rss_mb'], \
+																	result['checkpoint_mb'], result['accuracy'])
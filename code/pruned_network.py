@@ -0,0 +1,224 @@
+'''
+Pruned inference networks built from the trained weights of 'spiking_conv_patch_connectivity_MNIST.py'.
+
+The export step uses the per-neuron spike counts of a labeling pass (the results of a test run of
+the full network). It drops every excitatory neuron which spiked fewer than 'min_spikes' times
+(the neurons which never win the competition at their location, and so never get a meaningful
+label), and every input (or lattice) synapse weaker than a threshold, like the test-time
+thresholding of the contrasting variant. What remains is written to one '.npz' file: the
+surviving neurons' original indices, locations, thresholds and label assignments, and the input
+and lattice weights in CSR form over the remapped neuron indices.
+
+The test runner simulates only the surviving neurons with the NumPy engine. Inhibition couples
+the surviving features at each location, through inhibitory neurons ('full') or directly
+('direct', as '--inhibition=direct' of the main script). Input spikes take effect without
+synaptic delays. Examples are classified by the 'all' voting mechanism with the exported
+assignments. With '--compare', the unpruned network (every neuron and synapse, assignments from
+the same labeling pass) runs on the same examples, in the same runner, to measure the speedup.
+
+Usage: python pruned_network.py --labeling 10000 [--num_examples 10000] [--input_threshold 0.2] [--min_spikes 1] [--compare] [--network options of the spiking script]
+'''
+
+import os, time, argparse
+import numpy as np
+
+from scipy.sparse import csr_matrix
+
+import numpy_engine as ne
+import network_parameters as net_params
+from benchmark import assign_labels, vote
+from rate_surrogate import get_labeled_data, get_matrix_from_file, MNIST_data_path, weights_dir, activity_dir
+
+# neuron and connection parameters of the spiking script (converted to volts and seconds), test mode
+v_rest_e, v_reset_e, v_thresh_e, offset, refrac_e, tc_v_e, v_inhibitory_e = 1e-3 * np.array([ net_params.v_rest_e, net_params.v_reset_e,
+											net_params.v_thresh_e, net_params.offset, net_params.refrac_e, net_params.tc_v_e, net_params.v_inhibitory_e ])
+v_rest_i, v_reset_i, v_thresh_i, refrac_i, tc_v_i, v_inhibitory_i = 1e-3 * np.array([ net_params.v_rest_i, net_params.v_reset_i,
+											net_params.v_thresh_i, net_params.refrac_i, net_params.tc_v_i, net_params.v_inhibitory_i ])
+v_init_below_rest = 1e-3 * net_params.v_init_below_rest
+weight_ei, weight_ie = net_params.weight_ei, net_params.weight_ie
+single_example_time, resting_time = net_params.single_example_time, net_params.resting_time
+start_input_intensity = net_params.start_input_intensity
+
+
+def to_csr(matrix):
+	matrix = csr_matrix(matrix)
+	matrix.eliminate_zeros()
+	return matrix.indptr, matrix.indices, matrix.data
+
+
+def export_pruned(weights, lattice_weights, theta, results, labels, n_e, input_threshold, lattice_threshold, min_spikes):
+	'''
+	Prune the network with input weights 'weights' (pixels by neurons), lattice weights
+	'lattice_weights' (neurons by neurons, or None) and thresholds 'theta', given the spike counts
+	'results' (examples by neurons) of a labeling pass on examples labeled 'labels'.
+	'''
+	results = results.reshape((len(labels), -1))
+	assignments = assign_labels(results, labels)
+	neurons = np.flatnonzero(np.sum(results, axis=0) >= min_spikes)
+
+	weights = weights[:, neurons]
+	input_indptr, input_indices, input_data = to_csr(np.where(weights >= input_threshold, weights, 0.0))
+
+	if lattice_weights is None:
+		lattice_weights = np.zeros((len(neurons), len(neurons)))
+	else:
+		lattice_weights = lattice_weights[neurons][:, neurons]
+	lattice_indptr, lattice_indices, lattice_data = to_csr(np.where(lattice_weights >= lattice_threshold, lattice_weights, 0.0))
+
+	return { 'neurons' : neurons, 'locations' : neurons % n_e, 'theta' : theta[neurons], 'assignments' : assignments[neurons], 'n_e' : n_e,
+				'input_indptr' : input_indptr, 'input_indices' : input_indices, 'input_data' : input_data,
+				'lattice_indptr' : lattice_indptr, 'lattice_indices' : lattice_indices, 'lattice_data' : lattice_data }
+
+
+def get_csr_edges(pruned, name):
+	'''
+	(sources, targets, weights) of the CSR matrix 'name' of a pruned network.
+	'''
+	indptr = pruned[name + '_indptr']
+	return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr)), pruned[name + '_indices'], pruned[name + '_data']
+
+
+def get_location_pairs(locations, n_e):
+	'''
+	(sources, targets) of all pairs of different neurons at the same location.
+	'''
+	order, indptr = ne.get_segments(locations, n_e)
+	sources = np.repeat(order, np.diff(indptr)[locations[order]])
+	targets = order[ne.get_positions(indptr, locations[order])]
+	keep = sources != targets
+	return sources[keep], targets[keep]
+
+
+def build_network(pruned, dt, inhibition='full', seed=None):
+	'''
+	NumPy engine network of the neurons and synapses of 'pruned'; returns the network, its input
+	group, and the spike counter of the excitatory neurons.
+	'''
+	if inhibition not in [ 'full', 'direct' ]:
+		raise Exception('unknown inhibition mode: ' + str(inhibition))
+
+	n, n_input = len(pruned['neurons']), len(pruned['input_indptr']) - 1
+	network = ne.NumpyNetwork(dt, seed=seed)
+
+	input_group = ne.PoissonInput(n_input, dt)
+	excitatory = ne.NeuronGroup(n, dt, tau=tc_v_e, v_rest=v_rest_e, v_reset=v_reset_e, v_thresh=v_thresh_e, v_inhibitory=v_inhibitory_e,
+									refractory=refrac_e, v_init=v_rest_e - v_init_below_rest, theta=pruned['theta'], offset=offset)
+	network.add(input_group, excitatory)
+	network.add(ne.SparseConnection(input_group, excitatory, 'ge', *get_csr_edges(pruned, 'input')))
+
+	if len(pruned['lattice_data']) > 0:
+		network.add(ne.SparseConnection(excitatory, excitatory, 'ge', *get_csr_edges(pruned, 'lattice')))
+
+	sources, targets = get_location_pairs(pruned['locations'], int(pruned['n_e']))
+	if inhibition == 'full':
+		inhibitory = ne.NeuronGroup(n, dt, tau=tc_v_i, v_rest=v_rest_i, v_reset=v_reset_i, v_thresh=v_thresh_i, v_inhibitory=v_inhibitory_i,
+										refractory=refrac_i, v_init=v_rest_i - v_init_below_rest)
+		network.add(inhibitory, ne.OneToOneConnection(excitatory, inhibitory, 'ge', weight_ei))
+		network.add(ne.SparseConnection(inhibitory, excitatory, 'gi', sources, targets, np.ones(len(sources)) * weight_ie))
+	else:
+		network.add(ne.SparseConnection(excitatory, excitatory, 'gi', sources, targets, np.ones(len(sources)) * weight_ie))
+
+	counter = ne.SpikeCounter(excitatory)
+	network.add(counter)
+	return network, input_group, counter
+
+
+def run_examples(network, input_group, counter, images):
+	'''
+	Present 'images' as the test mode of the spiking script does (retrying examples with fewer
+	than five spikes at a higher intensity); returns the spike counts (examples by neurons).
+	'''
+	counts = np.zeros((len(images), counter.group.n), dtype=np.int64)
+
+	for example, image in enumerate(images):
+		input_intensity = start_input_intensity
+		for num_retries in xrange(4):
+			start = counter.count.copy()
+			input_group.rate = image.ravel() / 8.0 * input_intensity
+			network.run(single_example_time)
+			counts[example] = counter.count - start
+
+			input_group.rate = 0
+			network.run(resting_time)
+
+			if np.sum(counts[example]) >= 5:
+				break
+			input_intensity += 2
+
+	return counts
+
+
+def test(pruned, images, dt, inhibition, seed):
+	'''
+	Run 'pruned' on 'images'; returns the predicted labels and the wall clock time.
+	'''
+	network, input_group, counter = build_network(pruned, dt, inhibition, seed)
+
+	start = time.time()
+	counts = run_examples(network, input_group, counter, images)
+	return vote(counts, pruned['assignments']), time.time() - start
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+
+	parser.add_argument('--labeling', type=int, default=10000, help='Size of the spiking test run whose spike counts guide the pruning.')
+	parser.add_argument('--num_examples', type=int, default=10000, help='Number of test examples to run the pruned network on (0 to only export it).')
+	parser.add_argument('--input_threshold', type=float, default=0.2)
+	parser.add_argument('--lattice_threshold', type=float, default=0.0)
+	parser.add_argument('--min_spikes', type=int, default=1)
+	parser.add_argument('--compare', action='store_true', help='Also run the unpruned network, to measure the speedup.')
+	parser.add_argument('--inhibition', default='full', help='Inhibition of the pruned network: full or direct.')
+	parser.add_argument('--dt', type=float, default=0.5)
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--connectivity', default='none')
+	parser.add_argument('--weight_dependence', default='no_weight_dependence')
+	parser.add_argument('--post_pre', default='postpre')
+	parser.add_argument('--conv_size', type=int, default=16)
+	parser.add_argument('--conv_stride', type=int, default=4)
+	parser.add_argument('--conv_features', type=int, default=50)
+	parser.add_argument('--weight_sharing', default='no_weight_sharing')
+	parser.add_argument('--lattice_structure', default='8')
+	parser.add_argument('--random_lattice_prob', type=float, default=0.0)
+
+	args = parser.parse_args()
+
+	conv_size, conv_stride, conv_features = args.conv_size, args.conv_stride, args.conv_features
+	n_e = ((28 - conv_size) / conv_stride + 1) ** 2
+	n_e_total = conv_features * n_e
+	dt = args.dt * 0.001
+
+	ending = '_'.join([ args.connectivity, str(conv_size), str(conv_stride), str(conv_features), str(n_e), args.weight_dependence,
+						args.post_pre, args.weight_sharing, args.lattice_structure, str(args.random_lattice_prob) ])
+
+	weights = get_matrix_from_file(weights_dir + 'XeAe_' + ending + '.npy', 784, n_e_total)
+	lattice_weights = None
+	if os.path.isfile(weights_dir + 'AeAe_' + ending + '.npy'):
+		lattice_weights = get_matrix_from_file(weights_dir + 'AeAe_' + ending + '.npy', n_e_total, n_e_total)
+	theta = np.load(weights_dir + 'theta_A_' + ending + '.npy')
+
+	results = np.load(activity_dir + 'results_' + str(args.labeling) + '_' + ending + '.npy')
+	labels = np.load(activity_dir + 'input_numbers_' + str(args.labeling) + '_' + ending + '.npy')
+
+	pruned = export_pruned(weights, lattice_weights, theta, results, labels, n_e, args.input_threshold, args.lattice_threshold, args.min_spikes)
+	file_name = weights_dir + 'pruned_' + ending + '.npz'
+	np.savez(file_name, **pruned)
+
+	print 'neurons kept:', len(pruned['neurons']), '/', n_e_total
+	print 'input synapses kept:', len(pruned['input_data']), '/', np.count_nonzero(weights)
+	if lattice_weights is not None:
+		print 'lattice synapses kept:', len(pruned['lattice_data']), '/', np.count_nonzero(lattice_weights)
+	print 'pruned network written to', file_name, '(' + str(os.path.getsize(file_name)) + ' bytes)'
+
+	if args.num_examples > 0:
+		testing = get_labeled_data(MNIST_data_path + 'testing', b_train=False)
+		images, test_labels = testing['x'][:args.num_examples], testing['y'][:args.num_examples].ravel()
+
+		predictions, wall = test(pruned, images, dt, args.inhibition, args.seed)
+		print '\npruned network: %.1f ms / example, accuracy %.2f%%' % (1000 * wall / len(images), 100 * np.mean(predictions == test_labels))
+
+		if args.compare:
+			unpruned = export_pruned(weights, lattice_weights, theta, results, labels, n_e, 0.0, 0.0, 0)
+			full_predictions, full_wall = test(unpruned, images, dt, args.inhibition, args.seed)
+			print 'unpruned network: %.1f ms / example, accuracy %.2f%%' % (1000 * full_wall / len(images), 100 * np.mean(full_predictions == test_labels))
+			print 'speedup: %.2fx, prediction agreement: %.2f%%' % (full_wall / wall, 100 * np.mean(predictions == full_predictions))
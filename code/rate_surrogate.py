@@ -0,0 +1,275 @@
+'''
+Rate-based surrogate of the test-mode simulation of 'spiking_conv_patch_connectivity_MNIST.py'.
+
+Instead of simulating spikes, every excitatory neuron gets a mean-field firing rate from its
+input rates. The model uses the neuron's mean input conductance (summed weight times input rate,
+times the conductance time constant), the resulting steady-state membrane potential, and the
+leaky integrate-and-fire transfer function for its adaptive threshold. The features at each
+convolution location then compete through a softmax over their rates, standing in for the
+lateral inhibition, and the location's spikes over the 350 ms presentation are split between
+them. Examples predicted to spike fewer than five times are retried at a higher input
+intensity, as in the spiking simulation.
+
+The conductance gain and the softmax temperature are calibrated by grid search against the
+results of a spiking test run of the same network ('--calibrate'). The calibration report
+compares both on the examples held out of the calibration: spike count correlation, 'all'
+voting accuracy, and how often the two predict the same label. The surrogate then writes a
+'result_monitor'-compatible array of spike counts for the test set, next to the spiking
+results.
+
+Only connectivity 'none' is modelled: the lattice connections between locations are ignored.
+
+Usage: python rate_surrogate.py [--num_examples 10000] [--calibrate 10000] [--network options of the spiking script]
+'''
+
+import os, time, json, argparse
+import numpy as np
+import cPickle as p
+from struct import unpack
+
+import network_parameters as net_params
+
+from benchmark import assign_labels, vote
+
+top_level_path = '../'
+MNIST_data_path = top_level_path + 'data/'
+weights_dir = top_level_path + 'weights/conv_patch_connectivity_weights/'
+activity_dir = top_level_path + 'activity/conv_patch_connectivity_activity/'
+
+# excitatory neuron parameters of the spiking script (converted to volts and seconds)
+v_rest_e, v_reset_e, v_thresh_e, offset = 1e-3 * np.array([ net_params.v_rest_e, net_params.v_reset_e, net_params.v_thresh_e, net_params.offset ])
+refrac_e, tc_v, tc_ge = 1e-3 * np.array([ net_params.refrac_e, net_params.tc_v_e, net_params.tc_ge ])
+single_example_time = net_params.single_example_time
+start_input_intensity = net_params.start_input_intensity
+
+# calibration grid
+gains = np.logspace(-1.0, 1.0, 21)
+temperatures = np.array([ 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0 ])
+
+
+def get_labeled_data(picklename, b_train=True):
+	'''
+	Read input-vector (image) and target class (label, 0-9) and return it as
+	a list of tuples.
+	'''
+	if os.path.isfile('%s.pickle' % picklename):
+		data = p.load(open('%s.pickle' % picklename))
+	else:
+		# Open the images with gzip in read binary mode
+		if b_train:
+			images = open(MNIST_data_path + 'train-images-idx3-ubyte', 'rb')
+			labels = open(MNIST_data_path + 'train-labels-idx1-ubyte', 'rb')
+		else:
+			images = open(MNIST_data_path + 't10k-images-idx3-ubyte', 'rb')
+			labels = open(MNIST_data_path + 't10k-labels-idx1-ubyte', 'rb')
+
+		# Get metadata for images
+		images.read(4)  # skip the magic_number
+		number_of_images = unpack('>I', images.read(4))[0]
+		rows = unpack('>I', images.read(4))[0]
+		cols = unpack('>I', images.read(4))[0]
+
+		# Get metadata for labels
+		labels.read(4)  # skip the magic_number
+		N = unpack('>I', labels.read(4))[0]
+
+		if number_of_images != N:
+			raise Exception('number of labels did not match the number of images')
+
+		# Get the data
+		x = np.zeros((N, rows, cols), dtype=np.uint8)  # Initialize numpy array
+		y = np.zeros((N, 1), dtype=np.uint8)  # Initialize numpy array
+		for i in xrange(N):
+			if i % 1000 == 0:
+				print("i: %i" % i)
+			x[i] = [[unpack('>B', images.read(1))[0] for unused_col in xrange(cols)]  for unused_row in xrange(rows) ]
+			y[i] = unpack('>B', labels.read(1))[0]
+
+		data = {'x': x, 'y': y, 'rows': rows, 'cols': cols}
+		p.dump(data, open("%s.pickle" % picklename, "wb"))
+	return data
+
+
+def get_matrix_from_file(file_name, n_src, n_tgt):
+	'''
+	Given the name of a file pointing to a .npy ndarray object, load it into
+	'weight_matrix' and return it
+	'''
+	readout = np.load(file_name)
+	weight_matrix = np.zeros((n_src, n_tgt))
+	weight_matrix[np.int32(readout[:,0]), np.int32(readout[:,1])] = readout[:,2]
+	return weight_matrix
+
+
+def get_rates(drive, theta, gain):
+	'''
+	Mean-field firing rates (Hz) of excitatory neurons with adaptive thresholds 'theta', given
+	their 'drive' (summed input weight times input rate, in Hz): the mean conductance sets the
+	steady-state potential and the effective membrane time constant, and a neuron whose
+	steady-state potential exceeds its threshold fires once per charging time plus refractory
+	period.
+	'''
+	ge = gain * tc_ge * drive
+	v_inf = v_rest_e / (1.0 + ge)
+	v_th = v_thresh_e + theta - offset
+
+	rates = np.zeros(drive.shape)
+	above = v_inf > v_th
+	v_inf, ge = v_inf[above], ge[above]
+	v_th = np.broadcast_to(v_th, drive.shape)[above]
+
+	charging = tc_v / (1.0 + ge) * np.log((v_inf - v_reset_e) / (v_inf - v_th))
+	rates[above] = 1.0 / (refrac_e + charging)
+	return rates
+
+
+def get_example_rates(drive, theta, gain, n_e):
+	'''
+	Rates (examples by features by locations) for the 'drive' at unit input intensity, at the
+	intensity where each example first produces five spikes, retrying at most three times as
+	the spiking simulation does. Every location contributes its fastest feature's spikes, so
+	whether an example is retried does not depend on the competition.
+	'''
+	rates = np.zeros(drive.shape)
+	intensity = np.repeat(start_input_intensity, len(drive))
+	retry = np.arange(len(drive))
+
+	for num_retries in xrange(4):
+		if len(retry) == 0:
+			break
+
+		rates[retry] = get_rates(intensity[retry, np.newaxis] * drive[retry], theta, gain)
+		spikes = single_example_time * np.sum(np.max(rates[retry].reshape((len(retry), -1, n_e)), axis=1), axis=1)
+
+		retry = retry[spikes < 5]
+		intensity[retry] += 2
+
+	return rates.reshape((len(drive), -1, n_e))
+
+
+def compete(rates, temperature):
+	'''
+	Surrogate spike counts of one example presentation: at every location, the fastest
+	feature's spikes are split between the features by a softmax of their rates.
+	'''
+	fastest = np.max(rates, axis=1)[:, np.newaxis]
+	share = np.exp((rates - fastest) / temperature)
+	return single_example_time * fastest * share / np.sum(share, axis=1)[:, np.newaxis]
+
+
+def get_counts(drive, theta, gain, temperature, n_e):
+	'''
+	Surrogate spike counts (examples by features by locations), as in the 'result_monitor' of
+	the spiking simulation.
+	'''
+	return compete(get_example_rates(drive, theta, gain, n_e), temperature)
+
+
+def get_drive(images, weights, batch_size=1000):
+	'''
+	Summed input weight times input rate (Hz, at unit intensity) of every excitatory neuron.
+	'''
+	images = images.reshape((len(images), -1))
+	return np.concatenate([ np.dot(images[start : start + batch_size] / 8.0, weights) for start in xrange(0, len(images), batch_size) ])
+
+
+def correlation(a, b):
+	return np.corrcoef(a.ravel(), b.ravel())[0, 1]
+
+
+def calibrate(drive, theta, results, n_e):
+	'''
+	Gain and temperature whose surrogate counts correlate best with the spiking 'results'.
+	'''
+	best = None
+	for gain in gains:
+		rates = get_example_rates(drive, theta, gain, n_e)
+		for temperature in temperatures:
+			score = correlation(compete(rates, temperature), results)
+			if not np.isnan(score) and (best is None or score > best[0]):
+				best = (score, gain, temperature)
+
+	if best is None:
+		raise Exception('the surrogate predicts no spikes anywhere on the calibration grid')
+
+	return best[1], best[2]
+
+
+def report(counts, results, labels):
+	'''
+	Compare surrogate 'counts' with spiking 'results' on the same examples, with neuron labels
+	assigned on the first half and evaluated on the second.
+	'''
+	half = len(labels) // 2
+	counts, results = counts.reshape((len(labels), -1)), results.reshape((len(labels), -1))
+
+	spiking_assignments = assign_labels(results[:half], labels[:half])
+	spiking = vote(results[half:], spiking_assignments)
+	surrogate = vote(counts[half:], assign_labels(counts[:half], labels[:half]))
+	transferred = vote(counts[half:], spiking_assignments)
+
+	print '\ncalibration report (' + str(len(labels) - half) + ' held-out examples)'
+	print '%-44s %10.3f' % ('spike count correlation (all neurons)', correlation(counts[half:], results[half:]))
+	print '%-44s %10.3f' % ('spike count correlation (example totals)', correlation(np.sum(counts[half:], axis=1), np.sum(results[half:], axis=1)))
+	print '%-44s %9.2f%%' % ('spiking accuracy', 100 * np.mean(spiking == labels[half:]))
+	print '%-44s %9.2f%%' % ('surrogate accuracy (own assignments)', 100 * np.mean(surrogate == labels[half:]))
+	print '%-44s %9.2f%%' % ('surrogate accuracy (spiking assignments)', 100 * np.mean(transferred == labels[half:]))
+	print '%-44s %9.2f%%' % ('prediction agreement (spiking assignments)', 100 * np.mean(transferred == spiking))
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+
+	parser.add_argument('--num_examples', type=int, default=10000)
+	parser.add_argument('--calibrate', type=int, default=10000, help='Size of the spiking test run to calibrate against (0 to use --gain and --temperature).')
+	parser.add_argument('--gain', type=float, default=1.0)
+	parser.add_argument('--temperature', type=float, default=5.0)
+	parser.add_argument('--connectivity', default='none')
+	parser.add_argument('--weight_dependence', default='no_weight_dependence')
+	parser.add_argument('--post_pre', default='postpre')
+	parser.add_argument('--conv_size', type=int, default=16)
+	parser.add_argument('--conv_stride', type=int, default=4)
+	parser.add_argument('--conv_features', type=int, default=50)
+	parser.add_argument('--weight_sharing', default='no_weight_sharing')
+	parser.add_argument('--lattice_structure', default='8')
+	parser.add_argument('--random_lattice_prob', type=float, default=0.0)
+
+	args = parser.parse_args()
+
+	if args.connectivity != 'none':
+		print 'note: the surrogate ignores the lattice connections of connectivity \'' + args.connectivity + '\''
+
+	conv_size, conv_stride, conv_features = args.conv_size, args.conv_stride, args.conv_features
+	n_e = ((28 - conv_size) / conv_stride + 1) ** 2
+
+	ending = '_'.join([ args.connectivity, str(conv_size), str(conv_stride), str(conv_features), str(n_e), args.weight_dependence,
+						args.post_pre, args.weight_sharing, args.lattice_structure, str(args.random_lattice_prob) ])
+
+	weights = get_matrix_from_file(weights_dir + 'XeAe_' + ending + '.npy', 784, conv_features * n_e)
+	theta = np.load(weights_dir + 'theta_A_' + ending + '.npy')
+
+	testing = get_labeled_data(MNIST_data_path + 'testing', b_train=False)
+
+	gain, temperature = args.gain, args.temperature
+	if args.calibrate > 0:
+		results = np.load(activity_dir + 'results_' + str(args.calibrate) + '_' + ending + '.npy')
+		labels = np.load(activity_dir + 'input_numbers_' + str(args.calibrate) + '_' + ending + '.npy')
+
+		# calibrate on the first half of the spiking run, report on the second
+		drive = get_drive(testing['x'][:args.calibrate], weights)
+		half = args.calibrate // 2
+		gain, temperature = calibrate(drive[:half], theta, results[:half], n_e)
+		print 'calibrated gain:', gain, ', temperature:', temperature, 'Hz'
+
+		report(get_counts(drive, theta, gain, temperature, n_e), results, labels)
+
+		json.dump({ 'gain' : gain, 'temperature' : temperature }, open(activity_dir + 'surrogate_calibration_' + ending + '.json', 'w'))
+
+	start = time.time()
+	drive = get_drive(testing['x'][:args.num_examples], weights)
+	result_monitor = get_counts(drive, theta, gain, temperature, n_e)
+	input_numbers = testing['y'][:args.num_examples].ravel()
+	print '\nsurrogate inference on', args.num_examples, 'test examples:', time.time() - start, 'seconds'
+
+	np.save(activity_dir + 'results_surrogate_' + str(args.num_examples) + '_' + ending, result_monitor)
+	np.save(activity_dir + 'input_numbers_surrogate_' + str(args.num_examples) + '_' + ending, input_numbers)
@@ -11,11 +11,21 @@ import brian as b
 import networkx as nx
 import pandas as pd
 import time, os.path, scipy, math, sys, timeit, random, argparse
-
+import multiprocessing as mp
+import numpy_engine as ne
+
+from async_plotting import PlotPublisher
+from instrumentation import PhaseTimer
+from streaming_metrics import StreamingMetrics
+from parallel_training import WeightAverager
+from location_partitions import LocationPartitions, is_location_separable
 from sklearn.cluster import KMeans
-from scipy.sparse import coo_matrix
+from topology_cache import get_topology, get_lattice_mask
+from scipy.sparse import coo_matrix, spmatrix
 from struct import unpack
 from brian import *
+# after the star import, which exports a 'parameters' module of its own
+import network_parameters as net_params
 
 np.set_printoptions(threshold=np.nan, linewidth=200)
 
@@ -97,6 +107,41 @@ def is_lattice_connection(sqrt, i, j):
 		return True
 
 
+def get_sparse_matrix(connection):
+	'''
+	Get the (row, column, value) triplets of a sparse brian Connection as a scipy COO
+	matrix, without densifying it.
+	'''
+	W = connection.W
+
+	# one-to-one (identity) connections hold a single weight
+	if np.isscalar(W):
+		n = len(connection.source)
+		return coo_matrix((np.ones(n) * W, (np.arange(n), np.arange(n))), shape=(n, n))
+
+	# before the network is run, the connection is still in its construction (lil) format
+	if isinstance(W, spmatrix):
+		return W.tocoo()
+
+	# afterwards, it's compressed into per-row arrays of column indices and values
+	rows = np.repeat(np.arange(W.shape[0]), [ len(row_j) for row_j in W.rowj ])
+	if len(rows) == 0:
+		return coo_matrix(W.shape)
+	cols = np.concatenate(W.rowj)
+	data = np.concatenate(W.rowdata)
+
+	return coo_matrix((data, (rows, cols)), shape=W.shape)
+
+
+def connect_from_arrays(connection, sources, targets, weights):
+	'''
+	Create all synapses (sources[k], targets[k]) of a sparse brian Connection, with
+	weights[k], in one go instead of one element assignment per synapse.
+	'''
+	W = coo_matrix((weights, (sources, targets)), shape=connection.W.shape)
+	connection.connect(W=W.tolil())
+
+
 def get_matrix_from_file(file_name, n_src, n_tgt):
 	'''
 	Given the name of a file pointing to a .npy ndarray object, load it into
@@ -127,13 +172,13 @@ def save_connections():
 	# iterate over all connections to save
 	for conn_name in save_conns:
 		if conn_name == 'AeAe':
-			conn_matrix = connections[conn_name][:]
+			conn_matrix = np.asarray(get_sparse_matrix(connections[conn_name]).todense())
 		else:
-			conn_matrix = input_connections[conn_name][:]
+			conn_matrix = np.asarray(get_sparse_matrix(input_connections[conn_name]).todense())
 		# sparsify it into (row, column, entry) tuples
 		conn_list_sparse = ([(i, j, conn_matrix[i, j]) for i in xrange(conn_matrix.shape[0]) for j in xrange(conn_matrix.shape[1]) ])
 		# save it out to disk
-		np.save(top_level_path + weights_dir + conn_name + '_' + ending, conn_list_sparse)
+		np.save(weights_dir + conn_name + '_' + ending, conn_list_sparse)
 
 
 def save_theta():
@@ -147,7 +192,62 @@ def save_theta():
 		print '...saving theta: ' + weights_dir + 'theta_' + pop_name + '_' + ending
 
 		# save out the theta parameters to file
-		np.save(top_level_path + weights_dir + 'theta_' + pop_name + '_' + ending, neuron_groups[pop_name + 'e'].theta)
+		np.save(weights_dir + 'theta_' + pop_name + '_' + ending, neuron_groups[pop_name + 'e'].theta)
+
+
+def get_saved_synapses(conn_name):
+	'''
+	(sources, targets) of the synapses of the saved connection 'conn_name', in the order of its
+	quantized checkpoint, and the feature whose scale each of them uses (the kernel's feature for
+	the input connection, the source feature for the lattice connection).
+	'''
+	if conn_name == 'AeAe':
+		sources, targets = topology['ee']
+		return sources, targets, sources // n_e
+
+	sources = np.tile(np.ravel(convolution_locations), conv_features)
+	targets = np.repeat(np.arange(conv_features * n_e), conv_size ** 2)
+	return sources, targets, targets // n_e
+
+
+def save_quantized(conn_name, weights, features):
+	'''
+	Save the weights of the synapses of 'conn_name' as 8-bit codes, with one scale per feature.
+	'''
+	print '...saving quantized connection: ' + weights_dir + conn_name + '_' + ending + '_uint8'
+
+	codes, scale = ne.quantize(weights, features, conv_features)
+	np.savez(weights_dir + conn_name + '_' + ending + '_uint8', codes=codes, scale=scale)
+
+
+def save_quantized_connections():
+	'''
+	Save all connections in 'save_conns' as 8-bit checkpoints.
+	'''
+	for conn_name in save_conns:
+		sources, targets, features = get_saved_synapses(conn_name)
+		connection = connections[conn_name] if conn_name == 'AeAe' else input_connections[conn_name]
+		weights = np.asarray(get_sparse_matrix(connection).tocsr()[sources, targets]).ravel() if len(sources) > 0 else np.zeros(0)
+		save_quantized(conn_name, weights, features)
+
+
+def load_weights(conn_name, n_src):
+	'''
+	Weights of the synapses of the saved connection 'conn_name' (in the order of
+	'get_saved_synapses'). With '--quantize', they are dequantized from its 8-bit checkpoint,
+	which is written from the full checkpoint the first time.
+	'''
+	sources, targets, features = get_saved_synapses(conn_name)
+	file_name = weights_dir + conn_name + '_' + ending + '_uint8.npz'
+
+	if not quantize or not os.path.isfile(file_name):
+		weights = get_matrix_from_file(weights_dir + conn_name + '_' + ending + '.npy', n_src, conv_features * n_e)[sources, targets]
+		if not quantize:
+			return weights
+		save_quantized(conn_name, weights, features)
+
+	checkpoint = np.load(file_name)
+	return checkpoint['codes'] * checkpoint['scale'][features]
 
 
 def set_weights_most_fired(current_spike_count):
@@ -164,6 +264,12 @@ def set_weights_most_fired(current_spike_count):
 			# find the excitatory neuron which spiked the most
 			most_spiked = np.argmax(column_sums)
 
+			# the NumPy engine stores the input weights per (feature, location, window position)
+			if engine == 'numpy':
+				kernel = input_connections[conn_name].weights
+				kernel[feature] = kernel[feature, most_spiked]
+				continue
+
 			# create a "dense" version of the most spiked excitatory neuron's weight
 			most_spiked_dense = input_connections[conn_name][:, feature * n_e + most_spiked].todense()
 
@@ -179,6 +285,16 @@ def normalize_weights():
 	'''
 	Squash the input -> excitatory weights to sum to a prespecified number.
 	'''
+	if engine == 'numpy':
+		for conn_name in input_connections:
+			kernel = input_connections[conn_name].weights
+			kernel *= weight['ee_input'] / np.sum(kernel, axis=2)[:, :, np.newaxis]
+
+		for conn_name in connections:
+			if 'AeAe' in conn_name and lattice_structure != 'none':
+				connections[conn_name].normalize_row_blocks(weight['ee_recurr'], n_e)
+		return
+
 	for conn_name in input_connections:
 		connection = input_connections[conn_name][:].todense()
 		for feature in xrange(conv_features):
@@ -295,7 +411,7 @@ def get_2d_input_weights():
 	rearranged_weights = np.zeros((conv_features * conv_size, conv_size * n_e))
 
 	# counts number of input -> excitatory weights displayed so far
-	connection = input_connections['XeAe'][:]
+	connection = get_sparse_matrix(input_connections['XeAe']).tocsc()
 
 	# for each excitatory neuron in this convolution feature
 	euclid_dists = np.zeros((n_e, conv_features))
@@ -368,20 +484,23 @@ def update_2d_input_weights(im, fig):
 	return im
 
 
-def get_patch_weights():
+def get_patch_weights(sparse=False):
 	'''
-	Get the weights from the input to excitatory layer and reshape them.
+	Get the weights between excitatory neurons of different convolution patches which
+	lie on the lattice. Returned as a dense matrix, or as a scipy COO matrix if 'sparse'
+	is set (for network sizes where the dense matrix is too large).
 	'''
-	rearranged_weights = np.zeros((conv_features * n_e, conv_features * n_e))
-	connection = connections['AeAe'][:]
+	connection = get_sparse_matrix(connections['AeAe'])
+	rows, cols, data = connection.row, connection.col, connection.data
 
-	for feature in xrange(conv_features):
-		for other_feature in xrange(conv_features):
-			if feature != other_feature:
-				for this_n in xrange(n_e):
-					for other_n in xrange(n_e):
-						if is_lattice_connection(n_e_sqrt, this_n, other_n):
-							rearranged_weights[feature * n_e + this_n, other_feature * n_e + other_n] = connection[feature * n_e + this_n, other_feature * n_e + other_n]
+	# keep only between-patch synapses connecting lattice neighbors
+	keep = np.logical_and(rows // n_e != cols // n_e, get_lattice_mask(n_e_sqrt, lattice_structure)[rows % n_e, cols % n_e])
+
+	if sparse:
+		return coo_matrix((data[keep], (rows[keep], cols[keep])), shape=(conv_features * n_e, conv_features * n_e))
+
+	rearranged_weights = np.zeros((conv_features * n_e, conv_features * n_e))
+	rearranged_weights[rows[keep], cols[keep]] = data[keep]
 
 	return rearranged_weights
 
@@ -432,9 +551,9 @@ def plot_neuron_votes(assignments, spike_rates):
 	return rects, fig
 
 
-def update_neuron_votes(rects, fig, spike_rates):
+def get_neuron_votes(spike_rates):
 	'''
-	Update the plot of the votes of the neurons by label.
+	Get the fraction of the (assignment-normalized) votes of the neurons per label.
 	'''
 	all_summed_rates = [0] * 10
 	num_assignments = [0] * 10
@@ -447,30 +566,23 @@ def update_neuron_votes(rects, fig, spike_rates):
 	total_votes = np.sum(all_summed_rates)
 
 	if total_votes != 0:
-		for rect, h in zip(rects, all_summed_rates):
-			rect.set_height(h / float(total_votes))
-
-	fig.canvas.draw()
-	return rects
+		return [ h / float(total_votes) for h in all_summed_rates ]
+	else:
+		return None
 
 
-def get_current_performance(performances, current_example_num):
+def update_neuron_votes(rects, fig, spike_rates):
 	'''
-	Evaluate the performance of the network on the past 'update_interval' training
-	examples.
+	Update the plot of the votes of the neurons by label.
 	'''
-	global all_output_numbers, most_spiked_output_numbers, top_percent_output_numbers, input_numbers
+	votes = get_neuron_votes(spike_rates)
 
-	current_evaluation = int(current_example_num / update_interval)
-	start_num = current_example_num - update_interval
-	end_num = current_example_num
+	if votes is not None:
+		for rect, h in zip(rects, votes):
+			rect.set_height(h)
 
-	for performance in performances.keys():
-		difference = output_numbers[performance][start_num : end_num, 0] - input_numbers[start_num : end_num]
-		correct = len(np.where(difference == 0)[0])
-		performances[performance][current_evaluation] = correct / float(update_interval) * 100
-
-	return performances
+	fig.canvas.draw()
+	return rects
 
 
 def plot_performance(fig_num, performances, num_evaluations):
@@ -492,14 +604,13 @@ def plot_performance(fig_num, performances, num_evaluations):
 	return im, fig_num, fig
 
 
-def update_performance_plot(im, performances, current_example_num, fig):
+def update_performance_plot(im, performances, fig):
 	'''
 	Update the plot of the performance based on results thus far.
 	'''
-	performances = get_current_performance(performances, current_example_num)
 	im.set_ydata(performances.values())
 	fig.canvas.draw()
-	return im, performances
+	return im
 
 
 def predict_label(assignments, kmeans_assignments, kmeans, simple_clusters, index_matrix, input_numbers, spike_rates, average_firing_rate):
@@ -621,13 +732,13 @@ def assign_labels(result_monitor, input_numbers):
 					maximum_rate[i] = rate[i // n_e, i % n_e]
 					assignments[i // n_e, i % n_e] = j
 
-	weight_matrix = np.copy(np.array(connections['AeAe'][:].todense()))
+	weight_matrix = np.array(get_sparse_matrix(connections['AeAe']).todense())
 
 	kmeans_assignments = {}
 	votes_vector = {}
 
 	# get the list of flattened input weights per neuron per feature
-	weights = get_input_weights(np.copy(input_connections['XeAe'][:].todense()))
+	weights = get_input_weights(np.asarray(get_sparse_matrix(input_connections['XeAe']).todense()))
 
 	# create and fit a KMeans model
 	kmeans = KMeans(n_clusters=25).fit(weights)
@@ -691,22 +802,46 @@ def assign_labels(result_monitor, input_numbers):
 
 
 def build_network():
-	global fig_num
-
-	neuron_groups['e'] = b.NeuronGroup(n_e_total, neuron_eqs_e, threshold=v_thresh_e, refractory=refrac_e, reset=scr_e, compile=True, freeze=True)
-	neuron_groups['i'] = b.NeuronGroup(n_e_total, neuron_eqs_i, threshold=v_thresh_i, refractory=refrac_i, reset=v_reset_i, compile=True, freeze=True)
+	global fig_num, network
+
+	if engine == 'numpy':
+		network = ne.NumpyNetwork(dt, seed=args.seed)
+		neuron_groups['e'] = ne.NeuronGroup(n_e_total, dt, tau=net_params.tc_v_e * b.ms, v_rest=v_rest_e, v_reset=v_reset_e, v_thresh=v_thresh_e_value,
+								v_inhibitory=net_params.v_inhibitory_e * b.mV, refractory=refrac_e, v_init=v_rest_e - net_params.v_init_below_rest * b.mV,
+								theta_plus=0.0 if test_mode else theta_plus_e, tc_theta=None if test_mode else tc_theta, offset=offset,
+								method=integrator, lazy_theta=lazy_theta, wta_locations=n_e if inhibition == 'wta' else None)
+		network.add(neuron_groups['e'])
+
+		# the approximate inhibition modes inhibit the excitatory neurons directly, without the inhibitory population
+		if inhibition == 'full':
+			neuron_groups['i'] = ne.NeuronGroup(n_e_total, dt, tau=net_params.tc_v_i * b.ms, v_rest=v_rest_i, v_reset=v_reset_i, v_thresh=v_thresh_i,
+									v_inhibitory=net_params.v_inhibitory_i * b.mV, refractory=refrac_i, v_init=v_rest_i - net_params.v_init_below_rest * b.mV, method=integrator)
+			network.add(neuron_groups['i'])
+	else:
+		# brian's exponential Euler integrates the linear decays exactly and v exponentially towards its equilibrium
+		method = 'exponential_Euler' if integrator == 'exact' else 'Euler'
+		neuron_groups['e'] = b.NeuronGroup(n_e_total, neuron_eqs_e, threshold=v_thresh_e, refractory=refrac_e, reset=scr_e, compile=True, freeze=True, method=method)
+		neuron_groups['i'] = b.NeuronGroup(n_e_total, neuron_eqs_i, threshold=v_thresh_i, refractory=refrac_i, reset=v_reset_i, compile=True, freeze=True, method=method)
+		neuron_groups['e'].lastspike = -1.0 * b.second
 
 	for name in population_names:
 		print '...creating neuron group:', name
 
+		# the NumPy engine has no subgroups; its groups already start 40mV below their resting potentials
+		if engine == 'numpy':
+			neuron_groups[name + 'e'] = neuron_groups['e']
+			if inhibition == 'full':
+				neuron_groups[name + 'i'] = neuron_groups['i']
+			continue
+
 		# get a subgroup of size 'n_e' from all exc
 		neuron_groups[name + 'e'] = neuron_groups['e'].subgroup(conv_features * n_e)
 		# get a subgroup of size 'n_i' from the inhibitory layer
 		neuron_groups[name + 'i'] = neuron_groups['i'].subgroup(conv_features * n_e)
 
 		# start the membrane potentials of these groups 40mV below their resting potentials
-		neuron_groups[name + 'e'].v = v_rest_e - 40. * b.mV
-		neuron_groups[name + 'i'].v = v_rest_i - 40. * b.mV
+		neuron_groups[name + 'e'].v = v_rest_e - net_params.v_init_below_rest * b.mV
+		neuron_groups[name + 'i'].v = v_rest_i - net_params.v_init_below_rest * b.mV
 
 	print '...creating recurrent connections'
 
@@ -723,102 +858,67 @@ def build_network():
 		# neuron_groups['e'].theta = np.load(weight_path + 'theta_A' + '_' + ending +'.npy')
 
 		for conn_type in recurrent_conn_names:
+			# create connection name (composed of population and connection types)
+			conn_name = name + conn_type[0] + name + conn_type[1]
+			# instantiate the created connection from the (cached) topology
+			sources, targets = topology[conn_type]
 			if conn_type == 'ei':
-				# create connection name (composed of population and connection types)
-				conn_name = name + conn_type[0] + name + conn_type[1]
-				# create a connection from the first group in conn_name with the second group
-				connections[conn_name] = b.Connection(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], structure='sparse', state='g' + conn_type[0])
-				# instantiate the created connection
-				for feature in xrange(conv_features):
-					for n in xrange(n_e):
-						connections[conn_name][feature * n_e + n, feature * n_e + n] = 10.4
-
+				weights = np.ones(len(sources)) * net_params.weight_ei
 			elif conn_type == 'ie':
-				# create connection name (composed of population and connection types)
-				conn_name = name + conn_type[0] + name + conn_type[1]
-				# create a connection from the first group in conn_name with the second group
-				connections[conn_name] = b.Connection(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], structure='sparse', state='g' + conn_type[0])
-				# instantiate the created connection
-				for feature in xrange(conv_features):
-					for other_feature in xrange(conv_features):
-						if feature != other_feature:
-							for n in xrange(n_e):
-								connections[conn_name][feature * n_e + n, other_feature * n_e + n] = 17.4
-
-				if random_inhibition_prob != 0.0:
-					for feature in xrange(conv_features):
-						for other_feature in xrange(conv_features):
-							for n_this in xrange(n_e):
-								for n_other in xrange(n_e):
-									if n_this != n_other:
-										if b.random() < random_inhibition_prob:
-											connections[conn_name][feature * n_e + n_this, other_feature * n_e + n_other] = 17.4
-
+				weights = np.ones(len(sources)) * net_params.weight_ie
 			elif conn_type == 'ee':
-				# create connection name (composed of population and connection types)
-				conn_name = name + conn_type[0] + name + conn_type[1]
 				# get weights from file if we are in test mode
 				if test_mode:
-					weight_matrix = get_matrix_from_file(weights_dir + conn_name + '_' + ending + '.npy', conv_features * n_e, conv_features * n_e)
-				# create a connection from the first group in conn_name with the second group
+					weights = load_weights(conn_name, conv_features * n_e)
+				else:
+					weights = (np.random.random(len(sources)) + 0.01) * 0.3
+
+			# create a connection from the first group in conn_name with the second group
+			if engine == 'numpy' and inhibition != 'full' and conn_type == 'ei':
+				continue
+			elif engine == 'numpy' and inhibition != 'full' and conn_type == 'ie':
+				# the excitatory spikes inhibit the other features at their location directly (kept under the 'AiAe' name)
+				connections[conn_name] = ne.LocationInhibition(neuron_groups[name + 'e'], neuron_groups[conn_name[2:4]], 'g' + conn_type[0],
+												conv_features, n_e, net_params.weight_ie, sources, targets, weights)
+				network.add(connections[conn_name])
+			elif engine == 'numpy' and conn_type == 'ie':
+				# inhibition of the other features at the same location, as a per-location reduction of the spikes
+				connections[conn_name] = ne.LocationInhibition(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], 'g' + conn_type[0],
+												conv_features, n_e, net_params.weight_ie, sources, targets, weights)
+				network.add(connections[conn_name])
+			elif engine == 'numpy' and conn_type == 'ei':
+				# one-to-one: excitatory spikes add straight into the matching inhibitory neurons' conductance
+				connections[conn_name] = ne.OneToOneConnection(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], 'g' + conn_type[0], net_params.weight_ei)
+				network.add(connections[conn_name])
+			elif engine == 'numpy' and conn_type == 'ee' and lattice_structure in [ '4', '8' ] and len(sources) > 0:
+				# banded (DIA-style) storage: one weight per (feature pair, lattice offset, location)
+				connections[conn_name] = ne.LatticeConnection(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], 'g' + conn_type[0],
+												n_e, sources, targets, weights, quantized=quantize and test_mode)
+				network.add(connections[conn_name])
+			elif engine == 'numpy':
+				connections[conn_name] = ne.SparseConnection(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], 'g' + conn_type[0], sources, targets, weights)
+				network.add(connections[conn_name])
+			elif conn_type == 'ei':
+				connections[conn_name] = b.IdentityConnection(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], state='g' + conn_type[0], weight=net_params.weight_ei)
+			else:
 				connections[conn_name] = b.Connection(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], structure='sparse', state='g' + conn_type[0])
-				# instantiate the created connection
-				if connectivity == 'all':
-					for feature in xrange(conv_features):
-						for other_feature in xrange(conv_features):
-							if feature != other_feature:
-								for this_n in xrange(n_e):
-									for other_n in xrange(n_e):
-										if is_lattice_connection(n_e_sqrt, this_n, other_n):
-											if test_mode:
-												connections[conn_name][feature * n_e + this_n, other_feature * n_e + other_n] = weight_matrix[feature * n_e + this_n, other_feature * n_e + other_n]
-											else:
-												connections[conn_name][feature * n_e + this_n, other_feature * n_e + other_n] = (b.random() + 0.01) * 0.3
-
-				elif connectivity == 'pairs':
-					for feature in xrange(conv_features):
-						if feature % 2 == 0:
-							for this_n in xrange(n_e):
-								for other_n in xrange(n_e):
-									if is_lattice_connection(n_e_sqrt, this_n, other_n):
-										if test_mode:
-											connections[conn_name][feature * n_e + this_n, (feature + 1) * n_e + other_n] = weight_matrix[feature * n_e + this_n, (feature + 1) * n_e + other_n]
-										else:
-											connections[conn_name][feature * n_e + this_n, (feature + 1) * n_e + other_n] = (b.random() + 0.01) * 0.3
-						elif feature % 2 == 1:
-							for this_n in xrange(n_e):
-								for other_n in xrange(n_e):
-									if is_lattice_connection(n_e_sqrt, this_n, other_n):
-										if test_mode:
-											connections[conn_name][feature * n_e + this_n, (feature - 1) * n_e + other_n] = weight_matrix[feature * n_e + this_n, (feature - 1) * n_e + other_n]
-										else:
-											connections[conn_name][feature * n_e + this_n, (feature - 1) * n_e + other_n] = (b.random() + 0.01) * 0.3
-
-				elif connectivity == 'linear':
-					for feature in xrange(conv_features):
-						if feature != conv_features - 1:
-							for this_n in xrange(n_e):
-								for other_n in xrange(n_e):
-									if is_lattice_connection(n_e_sqrt, this_n, other_n):
-										if test_mode:
-											connections[conn_name][feature * n_e + this_n, (feature + 1) * n_e + other_n] = weight_matrix[feature * n_e + this_n, (feature + 1) * n_e + other_n]
-										else:
-											connections[conn_name][feature * n_e + this_n, (feature + 1) * n_e + other_n] = (b.random() + 0.01) * 0.3
-						if feature != 0:
-							for this_n in xrange(n_e):
-								for other_n in xrange(n_e):
-									if is_lattice_connection(n_e_sqrt, this_n, other_n):
-										if test_mode:
-											connections[conn_name][feature * n_e + this_n, (feature - 1) * n_e + other_n] = weight_matrix[feature * n_e + this_n, (feature - 1) * n_e + other_n]
-										else:
-											connections[conn_name][feature * n_e + this_n, (feature - 1) * n_e + other_n] = (b.random() + 0.01) * 0.3
-
-				elif connectivity == 'none':
-					pass
+				connect_from_arrays(connections[conn_name], sources, targets, weights)
 
 		# if STDP from excitatory -> excitatory is on and this connection is excitatory -> excitatory
 		if ee_STDP_on and 'ee' in recurrent_conn_names:
-			stdp_methods[name + 'e' + name + 'e'] = b.STDP(connections[name + 'e' + name + 'e'], eqs=eqs_stdp_ee, pre=eqs_stdp_pre_ee, post=eqs_stdp_post_ee, wmin=0., wmax=wmax_ee)
+			if engine == 'numpy':
+				stdp_class = ne.LatticeSTDP if isinstance(connections[name + 'e' + name + 'e'], ne.LatticeConnection) else ne.SparseSTDP
+				stdp_methods[name + 'e' + name + 'e'] = stdp_class(connections[name + 'e' + name + 'e'], dt, tc_pre_ee, tc_post_ee, nu_ee_pre, nu_ee_post,
+												wmax_ee, depression=stdp_depression, weight_dependence=use_weight_dependence, exp_pre=exp_ee_pre, exp_post=exp_ee_post)
+				network.add(stdp_methods[name + 'e' + name + 'e'])
+			else:
+				stdp_methods[name + 'e' + name + 'e'] = b.STDP(connections[name + 'e' + name + 'e'], eqs=eqs_stdp_ee, pre=eqs_stdp_pre_ee, post=eqs_stdp_post_ee, wmin=0., wmax=wmax_ee)
+
+		# the NumPy engine only counts spikes
+		if engine == 'numpy':
+			spike_counters[name + 'e'] = ne.SpikeCounter(neuron_groups[name + 'e'])
+			network.add(spike_counters[name + 'e'])
+			continue
 
 		print '...creating monitors for:', name
 
@@ -832,7 +932,7 @@ def build_network():
 			spike_monitors[name + 'e'] = b.SpikeMonitor(neuron_groups[name + 'e'])
 			spike_monitors[name + 'i'] = b.SpikeMonitor(neuron_groups[name + 'i'])
 
-	if record_spikes and do_plot:
+	if record_spikes and do_plot and engine == 'brian':
 		b.figure(fig_num)
 		fig_num += 1
 		b.ion()
@@ -841,44 +941,18 @@ def build_network():
 		b.subplot(212)
 		b.raster_plot(spike_monitors['Ai'], refresh=1000 * b.ms, showlast=1000 * b.ms)
 
-	# creating lattice locations for each patch
-	if connectivity == 'all':
-		lattice_locations = {}
-		for this_n in xrange(conv_features * n_e):
-			lattice_locations[this_n] = [ other_n for other_n in xrange(conv_features * n_e) if is_lattice_connection(n_e_sqrt, this_n % n_e, other_n % n_e) ]
-	elif connectivity == 'pairs':
-		lattice_locations = {}
-		for this_n in xrange(conv_features * n_e):
-			lattice_locations[this_n] = []
-			for other_n in xrange(conv_features * n_e):
-				if this_n // n_e % 2 == 0:
-					if is_lattice_connection(n_e_sqrt, this_n % n_e, other_n % n_e) and other_n // n_e == this_n // n_e + 1:
-						lattice_locations[this_n].append(other_n)
-				elif this_n // n_e % 2 == 1:
-					if is_lattice_connection(n_e_sqrt, this_n % n_e, other_n % n_e) and other_n // n_e == this_n // n_e - 1:
-						lattice_locations[this_n].append(other_n)
-	elif connectivity == 'linear':
-		lattice_locations = {}
-		for this_n in xrange(conv_features * n_e):
-			lattice_locations[this_n] = []
-			for other_n in xrange(conv_features * n_e):
-				if this_n // n_e != conv_features - 1:
-					if is_lattice_connection(n_e_sqrt, this_n % n_e, other_n % n_e) and other_n // n_e == this_n // n_e + 1:
-						lattice_locations[this_n].append(other_n)
-				elif this_n // n_e != 0:
-					if is_lattice_connection(n_e_sqrt, this_n % n_e, other_n % n_e) and other_n // n_e == this_n // n_e - 1:
-						lattice_locations[this_n].append(other_n)
-	elif connectivity == 'none':
-		lattice_locations = {}
-
 	# setting up parameters for weight normalization between patches
-	num_lattice_connections = sum([ len(value) for value in lattice_locations.values() ])
+	num_lattice_connections = np.sum(topology['lattice_counts'])
 	weight['ee_recurr'] = (num_lattice_connections / conv_features) * 0.15
 
 	# creating Poission spike train from input image (784 vector, 28x28 image)
 	for name in input_population_names:
-		input_groups[name + 'e'] = b.PoissonGroup(n_input, 0)
-		rate_monitors[name + 'e'] = b.PopulationRateMonitor(input_groups[name + 'e'], bin=(single_example_time + resting_time) / b.second)
+		if engine == 'numpy':
+			input_groups[name + 'e'] = ne.PoissonInput(n_input, dt)
+			network.add(input_groups[name + 'e'])
+		else:
+			input_groups[name + 'e'] = b.PoissonGroup(n_input, 0)
+			rate_monitors[name + 'e'] = b.PopulationRateMonitor(input_groups[name + 'e'], bin=(single_example_time + resting_time) / b.second)
 
 	# creating connections from input Poisson spike train to convolution patch populations
 	for name in input_connection_names:
@@ -889,24 +963,29 @@ def build_network():
 			# saved connection name
 			conn_name = name[0] + conn_type[0] + name[1] + conn_type[1]
 
-			# get weight matrix depending on training or test phase
+			# one synapse from each pixel of a convolution window to each neuron at that window's location
+			sources, targets, _ = get_saved_synapses(conn_name)
+
+			# get weights depending on training or test phase
 			if test_mode:
-				weight_matrix = get_matrix_from_file(weights_dir + conn_name + '_' + ending + '.npy', n_input, conv_features * n_e)
-				# weight_matrix[weight_matrix < 0.20] = 0
+				weights = load_weights(conn_name, n_input)
+				# weights[weights < 0.20] = 0
+			else:
+				weights = (np.random.random(len(sources)) + 0.01) * 0.3
 
 			# create connections from the windows of the input group to the neuron population
-			input_connections[conn_name] = b.Connection(input_groups['Xe'], neuron_groups[name[1] + conn_type[1]], structure='sparse', state='g' + conn_type[0], delay=True, max_delay=delay[conn_type][1])
-			
-			if test_mode:
-				for feature in xrange(conv_features):
-					for n in xrange(n_e):
-						for idx in xrange(conv_size ** 2):
-							input_connections[conn_name][convolution_locations[n][idx], feature * n_e + n] = weight_matrix[convolution_locations[n][idx], feature * n_e + n]
+			if engine == 'numpy':
+				# brian leaves the delays of this connection at zero; optionally draw them from [0, max_delay]
+				delays = None
+				if random_input_delays:
+					delays = np.random.randint(0, int(round(delay[conn_type][1] / dt)) + 1, size=len(sources))
+				input_connections[conn_name] = ne.ConvolutionConnection(input_groups['Xe'], neuron_groups[name[1] + conn_type[1]], 'g' + conn_type[0],
+													convolution_locations, conv_features, weights, dt, max_delay=delay[conn_type][1], delays=delays,
+													quantized=quantize and test_mode)
+				network.add(input_connections[conn_name])
 			else:
-				for feature in xrange(conv_features):
-					for n in xrange(n_e):
-						for idx in xrange(conv_size ** 2):
-							input_connections[conn_name][convolution_locations[n][idx], feature * n_e + n] = (b.random() + 0.01) * 0.3
+				input_connections[conn_name] = b.Connection(input_groups['Xe'], neuron_groups[name[1] + conn_type[1]], structure='sparse', state='g' + conn_type[0], delay=True, max_delay=delay[conn_type][1])
+				connect_from_arrays(input_connections[conn_name], sources, targets, weights)
 
 			if test_mode:
 				# normalize_weights()
@@ -921,11 +1000,126 @@ def build_network():
 			# STDP connection name
 			conn_name = name[0] + conn_type[0] + name[1] + conn_type[1]
 			# create the STDP object
-			stdp_methods[conn_name] = b.STDP(input_connections[conn_name], eqs=eqs_stdp_ee, pre=eqs_stdp_pre_ee, post=eqs_stdp_post_ee, wmin=0., wmax=wmax_ee)
+			if engine == 'numpy':
+				stdp_methods[conn_name] = ne.ConvolutionSTDP(input_connections[conn_name], dt, tc_pre_ee, tc_post_ee, nu_ee_pre, nu_ee_post, wmax_ee,
+												depression=stdp_depression, weight_dependence=use_weight_dependence, exp_pre=exp_ee_pre, exp_post=exp_ee_post)
+				network.add(stdp_methods[conn_name])
+			else:
+				stdp_methods[conn_name] = b.STDP(input_connections[conn_name], eqs=eqs_stdp_ee, pre=eqs_stdp_pre_ee, post=eqs_stdp_post_ee, wmin=0., wmax=wmax_ee)
+
+	# record network size for the timing summary / benchmarks
+	for conn_name in connections:
+		timer.set_value('synapses_' + conn_name, get_sparse_matrix(connections[conn_name]).nnz)
+	for conn_name in input_connections:
+		timer.set_value('synapses_' + conn_name, get_sparse_matrix(input_connections[conn_name]).nnz)
+	timer.set_value('neurons', n_e_total * (2 if inhibition == 'full' else 1))
 
 	print '\n'
 
 
+def run_network(duration):
+	'''
+	Advance the simulation by 'duration' with the selected engine.
+	'''
+	if partitions is not None:
+		partitions.run(duration)
+	elif engine == 'numpy':
+		network.run(duration)
+	else:
+		b.run(duration)
+
+
+def get_plastic_state():
+	'''
+	Arrays holding what the network learns in training: input and lattice weights, and
+	adaptive thresholds (NumPy engine only).
+	'''
+	state = { 'XeAe' : input_connections['XeAe'].weights, 'theta' : neuron_groups['e'].theta }
+	if 'AeAe' in connections and ee_STDP_on:
+		state['AeAe'] = connections['AeAe'].data
+
+	return state
+
+
+def synchronize_workers():
+	'''
+	Replace this worker's learned state with the merge of all workers' states.
+	'''
+	scores = np.sum(spike_counters['Ae'].count.reshape((conv_features, n_e)), axis=1)
+	averager.synchronize(worker, get_plastic_state(), scores)
+
+
+def train_shard(worker_num, shard_size):
+	'''
+	Body of a data-parallel training worker: train on examples [worker_num * shard_size,
+	(worker_num + 1) * shard_size) of the training set.
+	'''
+	global worker, example_offset, num_examples, ending, do_plot, timer
+
+	worker, example_offset, num_examples = worker_num, worker_num * shard_size, shard_size
+	ending, do_plot = ending + '_worker_' + str(worker_num), False
+
+	# each worker keeps its own timings (and trace file)
+	trace_file = None if args.profile_trace is None else args.profile_trace + '.worker_' + str(worker_num)
+	timer = PhaseTimer(args.profile, args.profile_interval, trace_file, metadata=vars(args))
+
+	# decorrelate the workers' input spike trains
+	network.random_state = np.random.RandomState(args.seed + 1 + worker_num)
+	np.random.seed(args.seed + 1 + worker_num)
+
+	try:
+		run_simulation()
+
+		# include the final weight normalization in the merged state
+		synchronize_workers()
+	except:
+		# don't leave the other workers waiting for this one at their next synchronization
+		averager.abort()
+		raise
+	timer.close()
+
+
+def run_data_parallel():
+	'''
+	Train 'num_workers' forked copies of the network on disjoint shards of the training set, merging
+	their learned state every 'average_interval' examples, and take over the final merged state.
+	'''
+	global averager
+
+	# every worker has to reach the same synchronization points
+	if num_examples % num_workers != 0:
+		raise Exception('the number of examples (' + str(num_examples) + ') must be divisible by the number of workers (' + str(num_workers) + ')')
+
+	merge = 'winner' if weight_sharing == 'weight_sharing' else 'mean'
+	averager = WeightAverager(get_plastic_state(), num_workers, merge=merge, winner_arrays=('XeAe',), num_features=conv_features)
+
+	shard_size = num_examples // num_workers
+	print '...training', num_workers, 'workers on', shard_size, 'examples each'
+
+	# don't let the workers inherit unwritten output
+	sys.stdout.flush()
+
+	workers = [ mp.Process(target=train_shard, args=(worker_num, shard_size)) for worker_num in xrange(num_workers) ]
+	for process in workers:
+		process.start()
+
+	# a worker killed from outside (e.g., out of memory) can't abort the synchronization barrier
+	# itself: release and stop the others as soon as any worker fails
+	while any([ process.is_alive() for process in workers ]):
+		if any([ process.exitcode not in [ None, 0 ] for process in workers ]):
+			averager.abort()
+			for process in workers:
+				process.terminate()
+		time.sleep(0.5)
+	for process in workers:
+		process.join()
+
+	if any([ process.exitcode != 0 for process in workers ]):
+		raise Exception('a data-parallel training worker failed')
+
+	averager.get_merged(get_plastic_state())
+
+
 def run_simulation():
 	'''
 	Logic for running the simulation itself.
@@ -933,8 +1127,13 @@ def run_simulation():
 	global fig_num, input_intensity, previous_spike_count, rates, assignments, clusters, cluster_assignments, \
 				kmeans, kmeans_assignments, simple_clusters, simple_cluster_assignments, index_matrix
 
+	# in asynchronous plotting mode, snapshots are drawn by a separate renderer process
+	publisher = None
+	if do_plot and plot_mode == 'async':
+		publisher = PlotPublisher({ 'conv_size' : conv_size, 'conv_features' : conv_features, 'n_e' : n_e, 'wmax_ee' : wmax_ee })
+
 	# plot input weights
-	if not test_mode and do_plot:
+	if not test_mode and do_plot and publisher is None:
 		input_weight_monitor, fig_weights = plot_2d_input_weights()
 		fig_num += 1
 		if connectivity != 'none':
@@ -944,24 +1143,23 @@ def run_simulation():
 		fig_num += 1
 
 	average_firing_rate = np.ones(10)
-	if do_plot and not test_mode:
+	if do_plot and not test_mode and publisher is None:
 		cluster_monitor, cluster_fig = plot_cluster_centers([ np.zeros((conv_size, conv_size)) ] * 25)
 		fig_num += 1
 
 	# plot input intensities
-	if do_plot:
+	if do_plot and publisher is None:
 		input_image_monitor, input_image = plot_input(rates)
 		fig_num += 1
 
-	# plot performance
+	# accuracy of each voting mechanism, updated as every example comes in
 	num_evaluations = int(num_examples / update_interval)
-	performances = {}
-	performances['all'], performances['most_spiked'], performances['top_percent'], performances['kmeans'], \
-										performances['simple_clusters'], performances['spatial_clusters'] = ( np.zeros(num_evaluations) for _ in xrange(6) )
-	if do_plot_performance and do_plot:
+	metrics = StreamingMetrics(output_numbers.keys(), update_interval, num_evaluations)
+	performances = metrics.performances
+
+	# plot performance
+	if do_plot_performance and do_plot and publisher is None:
 		performance_monitor, fig_num, fig_performance = plot_performance(fig_num, performances, num_evaluations)
-	else:
-		performances = get_current_performance(performances, 0)
 
 	# set firing rates to zero initially
 	for name in input_population_names:
@@ -970,7 +1168,7 @@ def run_simulation():
 	# initialize network
 	j = 0
 	num_retries = 0
-	b.run(0)
+	run_network(0)
 
 	# start recording time
 	start_time = timeit.default_timer()
@@ -986,56 +1184,76 @@ def run_simulation():
 		
 		else:
 			# ensure weights don't grow without bound
-			normalize_weights()
+			with timer.phase('normalize_weights'):
+				normalize_weights()
 			# get the firing rates of the next input example
-			rates = (training['x'][j % 60000, :, :] / 8.0) * input_intensity
+			rates = (training['x'][(example_offset + j) % 60000, :, :] / 8.0) * input_intensity
 		
 		# plot the input at this step
-		if do_plot:
-			input_image_monitor = update_input(rates, input_image_monitor, input_image)
+		with timer.phase('plot'):
+			if publisher is not None:
+				publisher.publish('input', rates)
+			elif do_plot:
+				input_image_monitor = update_input(rates, input_image_monitor, input_image)
 		
 		# sets the input firing rates
 		input_groups['Xe'].rate = rates.reshape(n_input)
 		
 		# run the network for a single example time
-		b.run(single_example_time)
+		with timer.phase('run_example'):
+			run_network(single_example_time)
 		
 		# get new neuron label assignments every 'update_interval'
 		if j % update_interval == 0 and j > 0:
-			assignments, kmeans, kmeans_assignments, simple_clusters, weights, average_firing_rate, index_matrix = \
+			with timer.phase('assign_labels'):
+				assignments, kmeans, kmeans_assignments, simple_clusters, weights, average_firing_rate, index_matrix = \
 																assign_labels(result_monitor[:], input_numbers[j - update_interval : j])
-			if do_plot and not test_mode:
-				update_cluster_centers(kmeans.cluster_centers_, cluster_monitor, cluster_fig)
+			with timer.phase('plot'):
+				if do_plot and not test_mode and publisher is None:
+					update_cluster_centers(kmeans.cluster_centers_, cluster_monitor, cluster_fig)
 
 		# get count of spikes over the past iteration
 		current_spike_count = np.copy(spike_counters['Ae'].count[:]).reshape((conv_features, n_e)) - previous_spike_count
 		previous_spike_count = np.copy(spike_counters['Ae'].count[:]).reshape((conv_features, n_e))
+		timer.count('spikes', int(np.sum(current_spike_count)))
 
 		# set weights to those of the most-fired neuron
 		if not test_mode and weight_sharing == 'weight_sharing':
-			set_weights_most_fired(current_spike_count)
-
-		# update weights every 'weight_update_interval'
-		if j % weight_update_interval == 0 and not test_mode and do_plot:
-			update_2d_input_weights(input_weight_monitor, fig_weights)
-			if connectivity != 'none':
-				update_patch_weights(patch_weight_monitor, fig2_weights)
-			
-		if not test_mode and do_plot:
-			update_neuron_votes(neuron_rects, fig_neuron_votes, result_monitor[:])
+			with timer.phase('set_weights_most_fired'):
+				set_weights_most_fired(current_spike_count)
+
+		with timer.phase('plot'):
+			# update weights every 'weight_update_interval'
+			if j % weight_update_interval == 0 and not test_mode and publisher is not None:
+				publisher.publish('input_weights', get_2d_input_weights())
+				if connectivity != 'none':
+					publisher.publish('patch_weights', get_patch_weights())
+			elif j % weight_update_interval == 0 and not test_mode and do_plot:
+				update_2d_input_weights(input_weight_monitor, fig_weights)
+				if connectivity != 'none':
+					update_patch_weights(patch_weight_monitor, fig2_weights)
+				
+			if not test_mode and publisher is not None:
+				votes = get_neuron_votes(result_monitor[:])
+				if votes is not None:
+					publisher.publish('votes', votes)
+			elif not test_mode and do_plot:
+				update_neuron_votes(neuron_rects, fig_neuron_votes, result_monitor[:])
 
 		# if the neurons in the network didn't spike more than four times
 		if np.sum(current_spike_count) < 5 and num_retries < 3:
 			# increase the intensity of input
 			input_intensity += 2
 			num_retries += 1
+			timer.count('retries')
 			
 			# set all network firing rates to zero
 			for name in input_population_names:
 				input_groups[name + 'e'].rate = 0
 
 			# let the network relax back to equilibrium
-			b.run(resting_time)
+			with timer.phase('run_retry_rest'):
+				run_network(resting_time)
 		# otherwise, record results and continue simulation
 		else:
 			num_retries = 0
@@ -1046,29 +1264,33 @@ def run_simulation():
 			if test_mode and use_testing_set:
 				input_numbers[j] = testing['y'][j % 10000][0]
 			else:
-				input_numbers[j] = training['y'][j % 60000][0]
+				input_numbers[j] = training['y'][(example_offset + j) % 60000][0]
 			
 			# get the output classifications of the network
-			output_numbers['all'][j, :], output_numbers['most_spiked'][j, :], output_numbers['top_percent'][j, :], \
+			with timer.phase('predict_label'):
+				output_numbers['all'][j, :], output_numbers['most_spiked'][j, :], output_numbers['top_percent'][j, :], \
 							output_numbers['kmeans'][j, :], output_numbers['simple_clusters'][j, :], output_numbers['spatial_clusters'][j, :] = \
 							predict_label(assignments, kmeans_assignments, kmeans, simple_clusters, index_matrix, 
 							input_numbers[j - update_interval - (j % update_interval) : j - (j % update_interval)], result_monitor[j % update_interval, :], average_firing_rate)
+			metrics.update(input_numbers[j], { mechanism : int(output_numbers[mechanism][j, 0]) for mechanism in output_numbers })
 			
 			# print progress
 			if j % print_progress_interval == 0 and j > 0:
-				print 'runs done:', j, 'of', int(num_examples), '(time taken for past', print_progress_interval, 'runs:', str(timeit.default_timer() - start_time) + ')'
+				print 'runs done:', j, 'of', int(num_examples), '(time taken for past', print_progress_interval, 'runs:', str(timeit.default_timer() - start_time) + ')', \
+						'(accuracy over the last', min(j + 1, update_interval), 'runs: %.2f, smoothed: %.2f)' % (metrics.get_accuracy('all'), metrics.smoothed['all'])
 				start_time = timeit.default_timer()
 			
 			# plot performance if appropriate
 			if j % update_interval == 0 and j > 0:
-				if do_plot_performance and do_plot:
-					# updating the performance plot
-					perf_plot, performances = update_performance_plot(performance_monitor, performances, j, fig_performance)
-				else:
-					performances = get_current_performance(performances, j)
+				with timer.phase('performance'):
+					if do_plot_performance and do_plot and publisher is None:
+						# updating the performance plot
+						update_performance_plot(performance_monitor, performances, fig_performance)
+					elif do_plot_performance and publisher is not None:
+						publisher.publish('performance', performances)
 
-				# pickling performance recording and iteration number
-				p.dump((j, performances), open(performance_dir + ending + '.p', 'wb'))
+					# pickling performance recording and iteration number
+					metrics.save(performance_dir + ending + '.p')
 
 				for performance in performances:
 					print '\nClassification performance (' + performance + ')', performances[performance][1:int(j / float(update_interval)) + 1], \
@@ -1080,17 +1302,33 @@ def run_simulation():
 				input_groups[name + 'e'].rate = 0
 			
 			# run the network for 'resting_time' to relax back to rest potentials
-			b.run(resting_time)
+			with timer.phase('run_rest'):
+				run_network(resting_time)
 			# bookkeeping
 			input_intensity = start_input_intensity
+			timer.end_example(j)
 			j += 1
 
+			# merge the learned state with the other data-parallel workers
+			if averager is not None and j % average_interval == 0:
+				with timer.phase('average_weights'):
+					synchronize_workers()
+
 	# set weights to those of the most-fired neuron
 	if not test_mode and weight_sharing == 'weight_sharing':
 		set_weights_most_fired(current_spike_count)
 
-	# ensure weights don't grow without bound
-	normalize_weights()
+	# ensure weights don't grow without bound (like every other normalization, this is a training
+	# step: the test weights are fixed, and may be quantized)
+	if not test_mode:
+		normalize_weights()
+
+	# pickling the final performance recording and iteration number
+	metrics.save(performance_dir + ending + '.p')
+
+	if publisher is not None:
+		print 'plot snapshots dropped by the renderer:', publisher.num_dropped
+		publisher.close()
 
 
 def save_results():
@@ -1105,6 +1343,8 @@ def save_results():
 		save_theta()
 	if not test_mode:
 		save_connections()
+		if quantize:
+			save_quantized_connections()
 	else:
 		np.save(activity_dir + 'results_' + str(num_examples) + '_' + ending, result_monitor)
 		np.save(activity_dir + 'input_numbers_' + str(num_examples) + '_' + ending, input_numbers)
@@ -1187,12 +1427,59 @@ if __name__ == '__main__':
 	parser.add_argument('--random_inhibition_prob', type=float, default=0.0)
 	parser.add_argument('--top_percent', type=int, default=10)
 	parser.add_argument('--do_plot', type=bool, default=True)
+	parser.add_argument('--plot_mode', default='inline', choices=['inline', 'async'])
+	parser.add_argument('--profile', action='store_true')
+	parser.add_argument('--profile_interval', type=int, default=100)
+	parser.add_argument('--profile_trace', default=None)
+	parser.add_argument('--num_examples', type=int, default=None)
+	parser.add_argument('--update_interval', type=int, default=None)
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--threads', type=int, default=1)
+	parser.add_argument('--topology_cache_dir', default=top_level_path + 'cache/topology/')
+	parser.add_argument('--no_topology_cache', action='store_true')
+	parser.add_argument('--engine', default='brian')
+	parser.add_argument('--random_input_delays', action='store_true')
+	parser.add_argument('--integrator', default='euler')
+	parser.add_argument('--dt', type=float, default=0.5)
+	parser.add_argument('--workers', type=int, default=1)
+	parser.add_argument('--average_interval', type=int, default=100)
+	parser.add_argument('--lazy_theta', action='store_true')
+	parser.add_argument('--inhibition', default='full')
+	parser.add_argument('--quantize', action='store_true')
 
 	args = parser.parse_args()
 	mode, connectivity, weight_dependence, post_pre, conv_size, conv_stride, conv_features, weight_sharing, lattice_structure, \
 		random_lattice_prob, random_inhibition_prob, top_percent, do_plot = args.mode, args.connectivity, args.weight_dependence, \
 		args.post_pre, args.conv_size, args.conv_stride, args.conv_features, args.weight_sharing, args.lattice_structure, \
 		args.random_lattice_prob, args.random_inhibition_prob, args.top_percent, args.do_plot
+	plot_mode = args.plot_mode
+	engine, random_input_delays, integrator = args.engine, args.random_input_delays, args.integrator
+
+	if engine not in [ 'brian', 'numpy' ]:
+		raise Exception('unknown simulation engine: ' + engine)
+	if integrator not in [ 'euler', 'exact' ]:
+		raise Exception('unknown integrator: ' + integrator)
+
+	num_workers, average_interval = args.workers, args.average_interval
+	if num_workers > 1 and (args.mode != 'train' or engine != 'numpy'):
+		raise Exception('data-parallel training (--workers > 1) needs --mode=train and --engine=numpy')
+	if num_workers > 1 and args.threads > 1:
+		raise Exception('data-parallel training (--workers > 1) runs each worker in one thread')
+
+	lazy_theta = args.lazy_theta
+	if lazy_theta and engine != 'numpy':
+		raise Exception('lazy theta decay (--lazy_theta) needs --engine=numpy')
+
+	inhibition = args.inhibition
+	if inhibition not in [ 'full', 'direct', 'wta' ]:
+		raise Exception('unknown inhibition mode: ' + inhibition)
+	if inhibition != 'full' and engine != 'numpy':
+		raise Exception('approximate inhibition (--inhibition=' + inhibition + ') needs --engine=numpy')
+
+	# training writes 8-bit checkpoints next to the full ones; testing keeps the weights quantized in memory
+	quantize = args.quantize
+	if quantize and args.mode == 'test' and engine != 'numpy':
+		raise Exception('quantized inference (--quantize) needs --engine=numpy')
 
 	print '\n'
 
@@ -1208,16 +1495,30 @@ if __name__ == '__main__':
 	print 'random inhibitory connections probability:', args.random_inhibition_prob
 	print 'top percentage voting:', args.top_percent
 	print 'plot?', args.do_plot
+	print 'plotting mode:', args.plot_mode
+	print 'threads:', args.threads
+	print 'simulation engine:', args.engine
+	print 'integrator (timestep):', args.integrator, '(' + str(args.dt) + ' ms)'
+	print 'data-parallel workers (averaging interval):', args.workers, '(' + str(args.average_interval) + ')'
+	print 'lazy theta decay?', args.lazy_theta
+	print 'inhibition:', args.inhibition
+	print 'quantized weights?', args.quantize
 
 	print '\n'
 
+	# the generated (weave) state updaters and resets of the neuron groups and the STDP traces run their
+	# loops over neurons with OpenMP if more than one thread is requested; the thread count has to be set
+	# before the compiled code first runs
+	os.environ['OMP_NUM_THREADS'] = str(args.threads)
+
 	# set global preferences
-	b.set_global_preferences(defaultclock = b.Clock(dt=0.5*b.ms), useweave = True, gcc_options = ['-ffast-math -march=native'], usecodegen = True,
-		usecodegenweave = True, usecodegenstateupdate = True, usecodegenthreshold = False, usenewpropagate = True, usecstdp = True, openmp = False,
+	dt = args.dt * b.ms
+	b.set_global_preferences(defaultclock = b.Clock(dt=dt), useweave = True, gcc_options = ['-ffast-math -march=native'], usecodegen = True,
+		usecodegenweave = True, usecodegenstateupdate = True, usecodegenthreshold = False, usenewpropagate = True, usecstdp = True, openmp = args.threads > 1,
 		magic_useframes = False, useweave_linear_diffeq = True)
 
 	# for reproducibility's sake
-	np.random.seed(0)
+	np.random.seed(args.seed)
 
 	# setting test / train mode
 	if mode == 'test':
@@ -1239,13 +1540,13 @@ if __name__ == '__main__':
 
 	# set parameters for simulation based on train / test mode
 	if test_mode:
-		num_examples = 10000
+		num_examples = 10000 if args.num_examples is None else args.num_examples
 		use_testing_set = True
 		do_plot_performance = False
 		record_spikes = True
 		ee_STDP_on = False
 	else:
-		num_examples = 60000
+		num_examples = 60000 if args.num_examples is None else args.num_examples
 		use_testing_set = False
 		do_plot_performance = False
 		record_spikes = True
@@ -1264,25 +1565,25 @@ if __name__ == '__main__':
 
 
 	# time (in seconds) per data example presentation and rest period in between, used to calculate total runtime
-	single_example_time = 0.35 * b.second
-	resting_time = 0.15 * b.second
+	single_example_time = net_params.single_example_time * b.second
+	resting_time = net_params.resting_time * b.second
 	runtime = num_examples * (single_example_time + resting_time)
 
 	# set the update interval
 	if test_mode:
 		update_interval = num_examples
 	else:
-		update_interval = 100
+		update_interval = 100 if args.update_interval is None else args.update_interval
 
 	# weight updates and progress printing intervals
 	weight_update_interval = 10
 	print_progress_interval = 10
 
 	# rest potential parameters, reset potential parameters, threshold potential parameters, and refractory periods
-	v_rest_e, v_rest_i = -65. * b.mV, -60. * b.mV
-	v_reset_e, v_reset_i = -65. * b.mV, -45. * b.mV
-	v_thresh_e, v_thresh_i = -52. * b.mV, -40. * b.mV
-	refrac_e, refrac_i = 5. * b.ms, 2. * b.ms
+	v_rest_e, v_rest_i = net_params.v_rest_e * b.mV, net_params.v_rest_i * b.mV
+	v_reset_e, v_reset_i = net_params.v_reset_e * b.mV, net_params.v_reset_i * b.mV
+	v_thresh_e, v_thresh_i = net_params.v_thresh_e * b.mV, net_params.v_thresh_i * b.mV
+	refrac_e, refrac_i = net_params.refrac_e * b.ms, net_params.refrac_i * b.ms
 
 	# dictionaries for weights and delays
 	weight, delay = {}, {}
@@ -1301,7 +1602,7 @@ if __name__ == '__main__':
 	weight['ee_input'] = (conv_size ** 2) * 0.1625
 	delay['ee_input'] = (0 * b.ms, 10 * b.ms)
 	delay['ei_input'] = (0 * b.ms, 5 * b.ms)
-	input_intensity = start_input_intensity = 2.0
+	input_intensity = start_input_intensity = net_params.start_input_intensity
 
 	# time constants, learning rates, max weights, weight dependence, etc.
 	tc_pre_ee, tc_post_ee = 20 * b.ms, 20 * b.ms
@@ -1312,14 +1613,17 @@ if __name__ == '__main__':
 
 	# setting up differential equations (depending on train / test mode)
 	if test_mode:
-		scr_e = 'v = v_reset_e; timer = 0*ms'
+		scr_e = 'v = v_reset_e; lastspike = t'
 	else:
 		tc_theta = 1e7 * b.ms
 		theta_plus_e = 0.05 * b.mV
-		scr_e = 'v = v_reset_e; theta += theta_plus_e; timer = 0*ms'
+		scr_e = 'v = v_reset_e; theta += theta_plus_e; lastspike = t'
 
-	offset = 20.0 * b.mV
-	v_thresh_e = '(v>(theta - offset + ' + str(v_thresh_e) + ')) * (timer>refrac_e)'
+	offset = net_params.offset * b.mV
+	v_thresh_e_value = v_thresh_e
+	# the reset timer runs at 100 times the clock from the last spike; storing the spike time
+	# instead of integrating the timer saves a state variable and its update every step
+	v_thresh_e = '(v>(theta - offset + ' + str(v_thresh_e) + ')) * ((t - lastspike) * 100.0 > refrac_e)'
 
 	# equations for neurons
 	neuron_eqs_e = '''
@@ -1334,7 +1638,7 @@ if __name__ == '__main__':
 	else:
 		neuron_eqs_e += '\n  dtheta/dt = -theta / (tc_theta)  : volt'
 
-	neuron_eqs_e += '\n  dtimer/dt = 100.0 : ms'
+	neuron_eqs_e += '\n  lastspike : second'
 
 	neuron_eqs_i = '''
 			dv/dt = ((v_rest_i - v) + (I_synE + I_synI) / nS) / (10*ms)  : volt
@@ -1380,6 +1684,9 @@ if __name__ == '__main__':
 			eqs_stdp_pre_ee = 'pre = 1.'
 			eqs_stdp_post_ee = 'w += nu_ee_post * pre; post = 1.'
 
+	# whether presynaptic spikes depress (mirrors the rule picked above, for the NumPy engine)
+	stdp_depression = use_weight_dependence or use_post_pre
+
 	print '\n'
 
 	# set ending of filename saves
@@ -1392,17 +1699,35 @@ if __name__ == '__main__':
 	# creating dictionaries for various objects
 	neuron_groups, input_groups, connections, input_connections, stdp_methods, \
 		rate_monitors, spike_monitors, spike_counters, output_numbers = {}, {}, {}, {}, {}, {}, {}, {}, {}
+	network, partitions = None, None
 
-	# creating convolution locations inside the input image
-	convolution_locations = {}
-	for n in xrange(n_e):
-		convolution_locations[n] = [ ((n % n_e_sqrt) * conv_stride + (n // n_e_sqrt) * n_input_sqrt * conv_stride) + (x * n_input_sqrt) + y for y in xrange(conv_size) for x in xrange(conv_size) ]
+	# data-parallel training state: shared-memory weight averager, this process' worker number, and
+	# the index of its first training example
+	averager, worker, example_offset = None, 0, 0
 
 	# instantiating neuron "vote" monitor
 	result_monitor = np.zeros((update_interval, conv_features, n_e))
 
+	# per-phase timers (only record anything if '--profile' or '--profile_trace' is passed)
+	timer = PhaseTimer(args.profile, args.profile_interval, args.profile_trace, metadata=vars(args))
+
+	# load (or compute and cache) the network topology: convolution locations inside the input
+	# image, excitatory <-> inhibitory edges, lattice edges and lattice neighbourhood sizes
+	with timer.phase('load_topology'):
+		topology = get_topology(conv_size, conv_stride, conv_features, connectivity, lattice_structure, random_inhibition_prob,
+								args.seed, cache_dir=None if args.no_topology_cache else args.topology_cache_dir)
+		convolution_locations = topology['convolution_locations']
+
 	# build the spiking neural network
-	build_network()
+	with timer.phase('build_network'):
+		build_network()
+
+		# with several threads, the NumPy engine simulates blocks of independent locations in parallel
+		if engine == 'numpy' and args.threads > 1:
+			if is_location_separable(network):
+				partitions = LocationPartitions(network, conv_features, n_e, args.threads)
+			else:
+				print '...network does not split by location (needs --connectivity=none); simulating it in one process'
 
 	# bookkeeping variables
 	previous_spike_count = np.zeros((conv_features, n_e))
@@ -1422,11 +1747,21 @@ if __name__ == '__main__':
 	rates = np.zeros((n_input_sqrt, n_input_sqrt))
 
 	# run the simulation of the network
-	run_simulation()
+	if num_workers > 1:
+		run_data_parallel()
+	else:
+		run_simulation()
 
 	# save and plot results
-	save_results()
+	with timer.phase('save_results'):
+		save_results()
 
 	# evaluate results
 	if test_mode:
-		evaluate_results()
+		with timer.phase('evaluate_results'):
+			evaluate_results()
+
+	if partitions is not None:
+		partitions.close()
+
+	timer.close()
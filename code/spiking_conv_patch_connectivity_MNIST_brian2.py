@@ -12,6 +12,7 @@ import time, os.path, scipy, math, sys, timeit, random, argparse
 
 from scipy.sparse import coo_matrix
 from struct import unpack
+from topology_cache import get_topology
 from brian2 import *
 
 np.set_printoptions(threshold=np.nan)
@@ -110,11 +111,12 @@ def save_connections():
 	# iterate over all connections to save
 	for conn_name in save_conns:
 		if conn_name == 'AeAe':
-			conn_matrix = connections[conn_name].w[:]
+			synapses = connections[conn_name]
 		else:
-			conn_matrix = input_connections[conn_name].w[:]
-		# sparsify it into (row, column, entry) tuples
-		conn_list_sparse = ([(i, j, conn_matrix[i, j]) for i in xrange(conn_matrix.shape[0]) for j in xrange(conn_matrix.shape[1]) ])
+			synapses = input_connections[conn_name]
+		# sparsify it into (row, column, entry) tuples; this also works after a standalone run
+		# (in the simulation's precision; float32 holds the neuron indices exactly)
+		conn_list_sparse = np.column_stack([ synapses.i[:], synapses.j[:], synapses.w[:] ]).astype(float_dtype)
 		# save it out to disk
 		np.save(top_level_path + 'weights/conv_patch_connectivity_weights/' + conn_name + '_' + ending, conn_list_sparse)
 
@@ -130,7 +132,7 @@ def save_theta():
 		print '...saving theta: weights/conv_patch_connectivity_weights/theta_' + pop_name + '_' + ending
 
 		# save out the theta parameters to file
-		np.save(top_level_path + 'weights/conv_patch_connectivity_weights/theta_' + pop_name + '_' + ending, neuron_groups[pop_name + 'e'].theta)
+		np.save(top_level_path + 'weights/conv_patch_connectivity_weights/theta_' + pop_name + '_' + ending, np.asarray(neuron_groups[pop_name + 'e'].theta[:], dtype=float_dtype))
 
 
 def set_weights_most_fired():
@@ -477,7 +479,15 @@ def get_new_assignments(result_monitor, input_numbers):
 def build_network():
 	global fig_num
 
-	neuron_groups['e'] = b.NeuronGroup(n_e_total, neuron_eqs_e, threshold=v_thresh_e, refractory=refrac_e, reset=scr_e)
+	# in standalone mode, weights are normalized inside the simulation from summed variables
+	normalize_ee = standalone and not test_mode and connectivity != 'none' and lattice_structure != 'none'
+	eqs_e = neuron_eqs_e
+	if standalone and not test_mode:
+		eqs_e += '\n  w_sum : 1'
+	if normalize_ee:
+		eqs_e += '\n  ee_out : 1\n  ee_feature_sum : 1 (linked)'
+
+	neuron_groups['e'] = b.NeuronGroup(n_e_total, eqs_e, threshold=v_thresh_e, refractory=refrac_e, reset=scr_e)
 	neuron_groups['i'] = b.NeuronGroup(n_e_total, neuron_eqs_i, threshold=v_thresh_i, refractory=refrac_i, reset=v_reset_i)
 
 	for name in population_names:
@@ -498,100 +508,47 @@ def build_network():
 		# if we're in test mode / using some stored weights
 		if test_mode or weight_path[-8:] == 'weights/conv_patch_connectivity_weights/':
 			# load up adaptive threshold parameters
-			neuron_groups['e'].theta = np.load(weight_path + 'theta_A' + '_' + ending +'.npy')
+			neuron_groups['e'].theta = np.load(weight_path + 'theta_A' + '_' + ending +'.npy').astype(float_dtype)
 		else:
 			# otherwise, set the adaptive additive threshold parameter at 20mV
 			neuron_groups['e'].theta = np.ones((n_e_total)) * 20.0 * b.mV
 
 		for conn_type in recurrent_conn_names:
-			if conn_type == 'ei':
-				# create connection name (composed of population and connection types)
-				conn_name = name + conn_type[0] + name + conn_type[1]
-				# create a connection from the first group in conn_name with the second group
-				connections[conn_name] = b.Synapses(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], model='w : 1', on_pre='ge += w')
-				# instantiate the created connection
-				connections[conn_name].connect(condition='i == j')
-				for feature in xrange(conv_features):
-					for n in xrange(n_e):
-						connections[conn_name].w[feature * n_e + n, feature * n_e + n] = 10.4
-
-			elif conn_type == 'ie':
-				# create connection name (composed of population and connection types)
-				conn_name = name + conn_type[0] + name + conn_type[1]
-				# create a connection from the first group in conn_name with the second group
-				connections[conn_name] = b.Synapses(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], model='w : 1', on_pre='ge += w')
-				# instantiate the created connection
-				connections[conn_name].connect(condition='i != j and i % n_e == j')
-				for feature in xrange(conv_features):
-					for other_feature in xrange(conv_features):
-						if feature != other_feature:
-							for n in xrange(n_e):
-								connections[conn_name].w[feature * n_e + n, other_feature * n_e + n] = 17.4
-
-				if random_inhibition_prob != 0.0:
-					for feature in xrange(conv_features):
-						for other_feature in xrange(conv_features):
-							for n_this in xrange(n_e):
-								for n_other in xrange(n_e):
-									if n_this != n_other:
-										if b.random() < random_inhibition_prob:
-											connections[conn_name].connect(feature * n_e + n_this, other_feature * n_e + n_other)
-											connections[conn_name].w[feature * n_e + n_this, other_feature * n_e + n_other] = 17.4
+			# create connection name (composed of population and connection types)
+			conn_name = name + conn_type[0] + name + conn_type[1]
+			# presynaptic spikes increment the conductance of the connection's type (as 'state' does in brian 1)
+			on_pre = 'g' + conn_type[0] + ' += w'
+
+			# create a connection from the first group in conn_name with the second group
+			if conn_type == 'ee' and not test_mode:
+				model = 'w : 1\n' + eqs_stdp_ee
+				if normalize_ee:
+					model += '\nee_out_pre = w : 1 (summed)'
+				connections[conn_name] = b.Synapses(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], model=model, \
+											on_pre=on_pre + '; ' + eqs_stdp_pre_ee, on_post=eqs_stdp_post_ee)
+			elif conn_type == 'ei':
+				# one-to-one with a fixed weight: no per-synapse weights needed
+				connections[conn_name] = b.Synapses(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], on_pre='ge += 10.4')
+				connections[conn_name].connect(j='i')
+				continue
+			else:
+				connections[conn_name] = b.Synapses(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], model='w : 1', on_pre=on_pre)
+
+			# instantiate the created connection from the topology's index arrays, in one go
+			sources, targets = topology[conn_type]
+			if len(sources) == 0:
+				continue
+
+			connections[conn_name].connect(i=sources, j=targets)
 
+			if conn_type == 'ie':
+				connections[conn_name].w = 17.4
 			elif conn_type == 'ee':
-				# create connection name (composed of population and connection types)
-				conn_name = name + conn_type[0] + name + conn_type[1]
 				# get weights from file if we are in test mode
 				if test_mode:
-					weight_matrix = get_matrix_from_file(weight_path + conn_name + '_' + ending + '.npy', conv_features * n_e, conv_features * n_e)
-				# create a connection from the first group in conn_name with the second group
-				if not test_mode:
-					connections[conn_name] = b.Synapses(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], model='w : 1\n' + eqs_stdp_ee, on_pre=eqs_stdp_pre_ee, on_post=eqs_stdp_post_ee)
+					connections[conn_name].w = get_matrix_from_file(weight_path + conn_name + '_' + ending + '.npy', n_e_total, n_e_total)[sources, targets].astype(float_dtype)
 				else:
-					connections[conn_name] = b.Synapses(neuron_groups[conn_name[0:2]], neuron_groups[conn_name[2:4]], model='w : 1')
-				# instantiate the created connection
-				sources, targets = [], []
-
-				if connectivity == 'all':
-					for feature in xrange(conv_features):
-						for other_feature in xrange(conv_features):
-							if feature != other_feature:
-								for this_n in xrange(n_e):
-									for other_n in xrange(n_e):
-										if is_lattice_connection(n_e_sqrt, this_n, other_n):
-											sources.append(feature * n_e + this_n)
-											targets.append(other_feature * n_e + other_n)
-
-					connections[conn_name].connect(i=sources, j=targets)
-					if test_mode:
-						connections[conn_name].w[sources, targets] = weight_matrix[sources, targets]
-					else:
-						connections[conn_name].w[sources, targets] = (b.random() + 0.01) * 0.3
-
-				elif connectivity == 'pairs':
-					for feature in xrange(conv_features):
-						if feature % 2 == 0:
-							for this_n in xrange(n_e):
-								for other_n in xrange(n_e):
-									if is_lattice_connection(n_e_sqrt, this_n, other_n):
-										sources.append(feature * n_e + this_n)
-										targets.append((feature + 1) * n_e + other_n)
-					
-						elif feature % 2 == 1:
-							for this_n in xrange(n_e):
-								for other_n in xrange(n_e):
-									if is_lattice_connection(n_e_sqrt, this_n, other_n):
-										sources.append(feature * n_e + this_n)
-										targets.append((feature + 1) * n_e + other_n)
-
-					connections[conn_name].connect(i=sources, j=targets)
-					if test_mode:
-						connections[conn_name].w[sources, targets] = weight_matrix[sources, targets]
-					else:
-						connections[conn_name].w[sources, targets] = [ (b.random() + 0.01) * 0.3 for _ in xrange(len(sources)) ]
-
-				elif connectivity == 'none':
-					pass
+					connections[conn_name].w = ((np.random.random(len(sources)) + 0.01) * 0.3).astype(float_dtype)
 
 		print '...creating monitors for:', name
 
@@ -611,32 +568,28 @@ def build_network():
 		b.plot(spike_counters['Ai'].t / b.ms, spike_counters['Ai'].i, '.k')
 
 
-	# creating lattice locations for each patch
-	if connectivity == 'all':
-		lattice_locations = {}
-		for this_n in xrange(conv_features * n_e):
-			lattice_locations[this_n] = [ other_n for other_n in xrange(conv_features * n_e) if is_lattice_connection(n_e_sqrt, this_n % n_e, other_n % n_e) ]
-	elif connectivity == 'pairs':
-		lattice_locations = {}
-		for this_n in xrange(conv_features * n_e):
-			lattice_locations[this_n] = []
-			for other_n in xrange(conv_features * n_e):
-				if this_n // n_e % 2 == 0:
-					if is_lattice_connection(n_e_sqrt, this_n % n_e, other_n % n_e) and other_n // n_e == this_n // n_e + 1:
-						lattice_locations[this_n].append(other_n)
-				elif this_n // n_e % 2 == 1:
-					if is_lattice_connection(n_e_sqrt, this_n % n_e, other_n % n_e) and other_n // n_e == this_n // n_e - 1:
-						lattice_locations[this_n].append(other_n)
-	elif connectivity == 'none':
-		lattice_locations = {}
-
 	# setting up parameters for weight normalization between patches
-	num_lattice_connections = sum([ len(value) for value in lattice_locations.values() ])
+	num_lattice_connections = np.sum(topology['lattice_counts'])
 	weight['ee_recurr'] = (num_lattice_connections / conv_features) * 0.15
 
+	if normalize_ee:
+		# per-feature sums of the outgoing between-patch weights: AeAe rows are summed into 'ee_out', and
+		# those into one neuron per feature, which every excitatory neuron of the feature links back to
+		standalone_objects['feature_sums'] = b.NeuronGroup(conv_features, 'ee_sum : 1')
+		standalone_objects['feature_summing'] = b.Synapses(neuron_groups['e'], standalone_objects['feature_sums'], model='ee_sum_post = ee_out_pre : 1 (summed)')
+		standalone_objects['feature_summing'].connect(i=np.arange(n_e_total), j=np.arange(n_e_total) // n_e)
+		neuron_groups['e'].ee_feature_sum = b.linked_var(standalone_objects['feature_sums'], 'ee_sum', index=np.arange(n_e_total) // n_e)
+
+		# the standalone equivalent of the 'AeAe' part of 'normalize_weights', at the start of each example
+		connections['AeAe'].run_regularly('w = w * %f / ee_feature_sum_pre' % weight['ee_recurr'], dt=single_example_time + resting_time, when='end')
+
 	# creating Poission spike train from input image (784 vector, 28x28 image)
 	for name in input_population_names:
-		input_groups[name + 'e'] = b.PoissonGroup(n_input, 0 * b.hertz)
+		if standalone:
+			# the whole input schedule is a TimedArray of per-example rates, gated off during the resting period
+			input_groups[name + 'e'] = b.PoissonGroup(n_input, rates='stimulus(t, i) * int(t % (single_example_time + resting_time) < single_example_time)')
+		else:
+			input_groups[name + 'e'] = b.PoissonGroup(n_input, 0 * b.hertz)
 		rate_monitors[name + 'e'] = b.PopulationRateMonitor(input_groups[name + 'e'])
 
 	# creating connections from input Poisson spike train to convolution patch populations
@@ -653,34 +606,29 @@ def build_network():
 				weight_matrix = get_matrix_from_file(weight_path + conn_name + '_' + ending + '.npy', n_input, conv_features * n_e)
 
 			# create connections from the windows of the input group to the neuron population
+			on_pre = 'g' + conn_type[0] + ' += w'
 			if not test_mode:
-				input_connections[conn_name] = b.Synapses(input_groups['Xe'], neuron_groups[name[1] + conn_type[1]], model='w : 1\n' + eqs_stdp_ee, on_pre=eqs_stdp_pre_ee, on_post=eqs_stdp_post_ee)
+				model = 'w : 1\n' + eqs_stdp_ee
+				if standalone:
+					model += '\nw_sum_post = w : 1 (summed)'
+				input_connections[conn_name] = b.Synapses(input_groups['Xe'], neuron_groups[name[1] + conn_type[1]], model=model, \
+													on_pre=on_pre + '; ' + eqs_stdp_pre_ee, on_post=eqs_stdp_post_ee)
 			else:
-				input_connections[conn_name] = b.Synapses(input_groups['Xe'], neuron_groups[name[1] + conn_type[1]], model='w : 1')
+				input_connections[conn_name] = b.Synapses(input_groups['Xe'], neuron_groups[name[1] + conn_type[1]], model='w : 1', on_pre=on_pre)
+
+			# one synapse from each pixel of a convolution window to each neuron at that window's location
+			sources = np.tile(np.ravel(convolution_locations), conv_features)
+			targets = np.repeat(np.arange(n_e_total), conv_size ** 2)
+			input_connections[conn_name].connect(i=sources, j=targets)
 
-			sources, targets = [], []
 			if test_mode:
-				for feature in xrange(conv_features):
-					for n in xrange(n_e):
-						for idx in xrange(conv_size ** 2):
-							sources.append(convolution_locations[n][idx])
-							targets.append(feature * n_e + n)
-
-				input_connections[conn_name].connect(i=sources, j=targets)
-				input_connections[conn_name].w[np.array(sources), np.array(targets)] = weight_matrix[sources, targets]
+				input_connections[conn_name].w = weight_matrix[sources, targets].astype(float_dtype)
 			else:
-				for feature in xrange(conv_features):
-					for n in xrange(n_e):
-						for idx in xrange(conv_size ** 2):
-							sources.append(convolution_locations[n][idx])
-							targets.append(feature * n_e + n)
+				input_connections[conn_name].w = ((np.random.random(len(sources)) + 0.01) * 0.3).astype(float_dtype)
 
-				input_connections[conn_name].connect(i=sources, j=targets)
-				print len(sources), len(targets), len([ (b.random() + 0.01) * 0.3 for _ in xrange(len(sources)) ])
-				print input_connections[conn_name].w[np.array(sources), np.array(targets)].shape
-				input_connections[conn_name].w[np.array(sources), np.array(targets)] = [ (b.random() + 0.01) * 0.3 for _ in xrange(len(sources)) ]
-
-	print input_connections[conn_name].w.shape
+			if standalone and not test_mode:
+				# the standalone equivalent of the 'XeAe' part of 'normalize_weights', at the start of each example
+				input_connections[conn_name].run_regularly('w = w * %f / w_sum_post' % weight['ee_input'], dt=single_example_time + resting_time, when='end')
 
 	print '\n'
 
@@ -841,6 +789,51 @@ def run_simulation():
 		set_weights_most_fired()
 
 
+def run_standalone():
+	'''
+	Run the whole training / test schedule as one compiled C++ program (brian2's
+	'cpp_standalone' device), then recover the per-example spike counts and
+	classifications from the recorded spikes. There is no Python code between
+	examples, so input intensity retries and weight sharing aren't available here.
+	'''
+	global result_monitor, assignments
+
+	example_time = single_example_time + resting_time
+
+	network = b.Network(neuron_groups['e'], neuron_groups['i'], input_groups.values(), connections.values(), input_connections.values(),
+							rate_monitors.values(), spike_counters.values(), standalone_objects.values())
+	network.run(num_examples * example_time, report='text', report_period=60 * b.second)
+
+	print '...building and running standalone simulation in', standalone_dir
+	b.device.build(directory=standalone_dir, compile=True, run=True)
+
+	# per-example spike counts over the presentation period of every example
+	spike_times, spike_indices = np.asarray(spike_counters['Ae'].t[:] / b.second), np.asarray(spike_counters['Ae'].i[:])
+	examples = (spike_times / float(example_time / b.second)).astype(int)
+	presented = spike_times - examples * float(example_time / b.second) < float(single_example_time / b.second)
+	spike_counts = np.zeros((num_examples, n_e_total))
+	np.add.at(spike_counts, (examples[presented], spike_indices[presented]), 1)
+	spike_counts = spike_counts.reshape((num_examples, conv_features, n_e))
+
+	data = testing if test_mode and use_testing_set else training
+	for j in xrange(num_examples):
+		input_numbers[j] = data['y'][j % len(data['y'])][0]
+
+	# label assignments and classifications, exactly as they are made during a runtime-mode run
+	for j in xrange(num_examples):
+		if j % update_interval == 0 and j > 0:
+			assignments = get_new_assignments(spike_counts[j - update_interval : j], input_numbers[j - update_interval : j])
+
+		all_output_numbers[j, :], most_spiked_output_numbers[j, :], top_percent_output_numbers[j, :] = get_recognized_number_ranking(assignments, spike_counts[j])
+
+	for start in xrange(0, num_examples, update_interval):
+		end = min(start + update_interval, num_examples)
+		print 'Classification performance (all vote), examples', start, 'to', end, ':', \
+				np.mean(all_output_numbers[start : end, 0] == np.asarray(input_numbers[start : end])) * 100
+
+	result_monitor = spike_counts[-update_interval:]
+
+
 def save_and_plot_results():
 	global fig_num
 	
@@ -854,6 +847,10 @@ def save_and_plot_results():
 		np.save(top_level_path + 'activity/conv_patch_connectivity_activity/results_' + str(num_examples) + '_' + ending, result_monitor)
 		np.save(top_level_path + 'activity/conv_patch_connectivity_activity/input_numbers_' + str(num_examples) + '_' + ending, input_numbers)
 
+	# (label, 'all' vote prediction) of every example, e.g. for comparing precisions
+	np.save(top_level_path + 'activity/conv_patch_connectivity_activity/' + ('test' if test_mode else 'train') + '_output_numbers_' + \
+				str(num_examples) + '_' + ending, np.column_stack([ input_numbers, all_output_numbers[:, 0] ]).astype(np.int64))
+
 	if do_plot:
 		if rate_monitors:
 			b.figure(fig_num)
@@ -900,6 +897,10 @@ if __name__ == '__main__':
 	parser.add_argument('--lattice_structure', default='4')
 	parser.add_argument('--random_inhibition_prob', type=float, default=0.0)
 	parser.add_argument('--top_percent', type=int, default=10)
+	parser.add_argument('--num_examples', type=int, default=None)
+	parser.add_argument('--standalone', action='store_true')
+	parser.add_argument('--threads', type=int, default=1)
+	parser.add_argument('--precision', default='float64', choices=['float64', 'float32'])
 	
 	args = parser.parse_args()
 	mode, connectivity, weight_dependence, post_pre, conv_size, conv_stride, conv_features, weight_sharing, lattice_structure, random_inhibition_prob, top_percent = \
@@ -913,6 +914,23 @@ if __name__ == '__main__':
 
 	print '\n'
 
+	# floating point type of all neuron state, STDP traces and weights (and of the saved weights / thresholds)
+	precision = args.precision
+	float_dtype = np.float32 if precision == 'float32' else np.float64
+	b.prefs.core.default_float_dtype = float_dtype
+	print 'precision:', precision, '\n'
+
+	# compile the whole simulation into a single C++ program (with 'threads' OpenMP threads) instead of
+	# running it from Python example by example
+	standalone = args.standalone
+	standalone_dir = top_level_path + 'build/brian2_standalone/'
+	if standalone:
+		if weight_sharing == 'weight_sharing':
+			raise Exception('weight sharing is not supported in standalone mode')
+		b.set_device('cpp_standalone', directory=standalone_dir, build_on_run=False)
+		b.prefs.devices.cpp_standalone.openmp_threads = args.threads
+		b.prefs.codegen.cpp.extra_compile_args_gcc = [ '-O3', '-ffast-math', '-march=native' ]
+
 	# for reproducibility's sake
 	np.random.seed(0)
 
@@ -937,14 +955,14 @@ if __name__ == '__main__':
 	# set parameters for simulation based on train / test mode
 	if test_mode:
 		weight_path = top_level_path + 'weights/conv_patch_connectivity_weights/'
-		num_examples = 10000 * 1
+		num_examples = 10000 * 1 if args.num_examples is None else args.num_examples
 		use_testing_set = True
 		do_plot_performance = False
 		record_spikes = True
 		ee_STDP_on = False
 	else:
 		weight_path = top_level_path + 'random/conv_patch_connectivity_random/'
-		num_examples = 60000 * 1
+		num_examples = 60000 * 1 if args.num_examples is None else args.num_examples
 		use_testing_set = False
 		do_plot_performance = True
 		record_spikes = True
@@ -1013,14 +1031,16 @@ if __name__ == '__main__':
 
 	# setting up differential equations (depending on train / test mode)
 	if test_mode:
-		scr_e = 'v = v_reset_e; timer = 0 * second'
+		scr_e = 'v = v_reset_e'
 	else:
 		tc_theta = 1e7 * b.ms
 		theta_plus_e = 0.05 * b.mV
-		scr_e = 'v = v_reset_e; theta += theta_plus_e; timer = 0 * second'
+		scr_e = 'v = v_reset_e; theta += theta_plus_e'
 
 	offset = 20.0 * b.mV
-	v_thresh_e = '(v>(theta - offset + ' + str(v_thresh_e) + ')) * (timer>refrac_e)'
+	# the reset timer runs at a tenth of the clock from the last spike; brian's own 'lastspike'
+	# (kept since the group is refractory) replaces integrating it
+	v_thresh_e = '(v>(theta - offset + ' + str(v_thresh_e) + ')) * ((t - lastspike) * 0.1 > refrac_e)'
 
 	# equations for neurons
 	neuron_eqs_e = '''
@@ -1035,7 +1055,6 @@ if __name__ == '__main__':
 	else:
 		neuron_eqs_e += '\n  dtheta / dt = -theta / (tc_theta)  : volt'
 
-	neuron_eqs_e += '\n  dtimer / dt = 0.1  : second'
 
 	neuron_eqs_i = '''
 			dv / dt = ((v_rest_i - v) + (I_synE + I_synI) / nS) / (0.01 * second)  : volt
@@ -1085,22 +1104,32 @@ if __name__ == '__main__':
 
 	# set ending of filename saves
 	ending = connectivity + '_' + str(conv_size) + '_' + str(conv_stride) + '_' + str(conv_features) + '_' + str(n_e) + '_' + weight_dependence + '_' + post_pre + '_' + weight_sharing + '_' + lattice_structure + '_' + str(random_inhibition_prob)
+	# single precision runs never overwrite (or load) double precision files
+	if precision != 'float64':
+		ending += '_' + precision
 
 	b.ion()
 	fig_num = 1
 	
 	# creating dictionaries for various objects
 	neuron_groups, input_groups, connections, input_connections, stdp_methods, \
-		rate_monitors, spike_monitors, spike_counters = {}, {}, {}, {}, {}, {}, {}, {}
+		rate_monitors, spike_monitors, spike_counters, standalone_objects = {}, {}, {}, {}, {}, {}, {}, {}, {}
+
+	# network topology (convolution locations inside the input image, index arrays of all recurrent
+	# connections and lattice neighbourhood sizes), shared with the brian 1 script's cache
+	topology = get_topology(conv_size, conv_stride, conv_features, connectivity, lattice_structure, random_inhibition_prob, 0,
+								cache_dir=top_level_path + 'cache/topology/')
+	convolution_locations = topology['convolution_locations']
 
-	# creating convolution locations inside the input image
-	convolution_locations = {}
-	for n in xrange(n_e):
-		convolution_locations[n] = [ ((n % n_e_sqrt) * conv_stride + (n // n_e_sqrt) * n_input_sqrt * conv_stride) + (x * n_input_sqrt) + y for y in xrange(conv_size) for x in xrange(conv_size) ]
-	
 	# instantiating neuron "vote" monitor
 	result_monitor = np.zeros((update_interval, conv_features, n_e))
 
+	# in standalone mode, the input rates of all examples are laid out in advance
+	if standalone:
+		data = testing if test_mode and use_testing_set else training
+		images = data['x'][np.arange(num_examples) % len(data['x'])].reshape((num_examples, n_input))
+		stimulus = b.TimedArray(((images / 8.0) * start_input_intensity).astype(float_dtype) * b.hertz, dt=single_example_time + resting_time)
+
 	# build the spiking neural network
 	build_network()
 
@@ -1114,7 +1143,10 @@ if __name__ == '__main__':
 	rates = np.zeros((n_input_sqrt, n_input_sqrt))
 
 	# run the simulation of the network
-	run_simulation()
+	if standalone:
+		run_standalone()
+	else:
+		run_simulation()
 
 	# save and plot results
 	save_and_plot_results()
\ No newline at end of file
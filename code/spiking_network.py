@@ -1,7 +1,15 @@
 '''
 This file is meant to contain various spiking neural network models and associated methods and attributes.
 
-Experiments can be run using these network models with arbitrary parameter settings.
+Experiments can be run using these network models with arbitrary parameter settings. A network
+is built once and all of its state (neuron groups, connections, label assignments, etc.) is held
+on the instance, so one process can run any number of training / test phases, parameter sweeps or
+notebook sessions without re-importing or re-building anything:
+
+	network = SpikingCNN(conv_size=16, conv_stride=4, conv_features=50, connectivity='none')
+	network.train(get_MNIST_data(MNIST_data_path + 'training', train=True), 1000)
+	accuracy, spike_counts = network.test(get_MNIST_data(MNIST_data_path + 'testing', train=False), 1000)
+	network.save()
 
 Work in progress!
 
@@ -9,15 +17,12 @@ Work in progress!
 '''
 
 import numpy as np
-import brian as b
+import cPickle as p
 import brian_no_units
+import brian as b
 
 import time, os.path, scipy, math, sys, timeit, random, argparse
 
-sys.path.append('/home/dan/code/python_mcl/mcl')
-
-from sklearn.cluster import KMeans
-from mcl_clustering import networkx_mcl
 from scipy.sparse import coo_matrix
 from struct import unpack
 from brian import *
@@ -26,20 +31,19 @@ MNIST_data_path = '../data/'
 top_level_path = '../'
 weight_path = top_level_path + 'weights/conv_patch_connectivity_weights/'
 
-do_plot = True
 n_input = 784
 
 
 def get_MNIST_data(pickle_name, train):
 	'''
-	Read input-vector (image) and target class (label, 0-9) and return it as 
+	Read input-vector (image) and target class (label, 0-9) and return it as
 	a list of tuples.
 	'''
 	if os.path.isfile('%s.pickle' % pickle_name):
 		data = p.load(open('%s.pickle' % pickle_name))
 	else:
 		# Open the images with gzip in read binary mode
-		if b_train:
+		if train:
 			images = open(MNIST_data_path + 'train-images-idx3-ubyte', 'rb')
 			labels = open(MNIST_data_path + 'train-labels-idx1-ubyte', 'rb')
 		else:
@@ -69,7 +73,7 @@ def get_MNIST_data(pickle_name, train):
 			y[i] = unpack('>B', labels.read(1))[0]
 
 		data = {'x': x, 'y': y, 'rows': rows, 'cols': cols}
-		p.dump(data, open("%s.pickle" % picklename, "wb"))
+		p.dump(data, open("%s.pickle" % pickle_name, "wb"))
 	return data
 
 
@@ -79,7 +83,7 @@ def get_matrix_from_file(file_name, n_src, n_tgt):
 	'weight_matrix' and return it
 	'''
 
-	# load the stored ndarray into 'readout', instantiate 'weight_matrix' as 
+	# load the stored ndarray into 'readout', instantiate 'weight_matrix' as
 	# correctly-shaped zeros matrix
 	readout = np.load(file_name)
 	weight_matrix = np.zeros((n_src, n_tgt))
@@ -122,8 +126,8 @@ class SpikingCNN(object):
 	Our proposed model with an added "convolutional" layer.
 	'''
 
-	def __init__(self, n_input=784, conv_size=16, conv_stride=4, conv_features=50, connectivity='all', weight_dependence=False, post_pre=True, 
-					weight_sharing=False, lattice_structure='4', random_lattice_prob=0.0, random_inhibition_prob=0.0):
+	def __init__(self, n_input=784, conv_size=16, conv_stride=4, conv_features=50, connectivity='all', weight_dependence=False, post_pre=True,
+					weight_sharing=False, lattice_structure='4', random_lattice_prob=0.0, random_inhibition_prob=0.0, dt=0.5):
 		'''
 		Constructor for the spiking convolutional neural network model.
 
@@ -131,18 +135,19 @@ class SpikingCNN(object):
 		conv_size: side length of convolution windows used
 		conv_stride: stride (horizontal and vertical) of convolution windows used
 		conv_features: number of convolution features (or patches) used
-		connectivity: connection style between patches; one of 'none', 'pairs', all'; more to be added
+		connectivity: connection style between patches; one of 'none', 'pairs', 'linear', 'all'
 		weight_dependence: whether to use weight STDP with weight dependence
 		post_pre: whether to use STDP with both post- and pre-synpatic traces
 		weight_sharing: whether to impose that all neurons within a convolution patch share a common set of weights
 		lattice_structure: lattice connectivity pattern between patches; one of 'none', '4', '8', and 'all'
 		random_lattice_prob: probability of adding random additional lattice connections between patches
 		random_inhibition_prob: probability of adding random additional inhibition edges from the inhibitory to excitatory population
+		dt: simulation time step (in milliseconds)
 		'''
 		self.n_input, self.conv_size, self.conv_stride, self.conv_features, self.connectivity, self.weight_dependence, \
-			self.post_pre, self.weight_sharing, self.lattice_structure, self.random_lattice_prob, self.random_inhibition_prob = \
+			self.post_pre, self.weight_sharing, self.lattice_structure, self.random_lattice_prob, self.random_inhibition_prob, self.dt = \
 			n_input, conv_size, conv_stride, conv_features, connectivity, weight_dependence, post_pre, weight_sharing, lattice_structure, \
-			random_lattice_prob, random_inhibition_prob
+			random_lattice_prob, random_inhibition_prob, dt
 
 		# number of inputs to the network
 		self.n_input_sqrt = int(math.sqrt(self.n_input))
@@ -159,9 +164,94 @@ class SpikingCNN(object):
 
 		# set update intervals
 		self.update_interval = 100
-		self.weight_update_interval = 10
 		self.print_progress_interval = 10
 
+		# dictionaries for weights and delays
+		self.weight, self.delay = {}, {}
+
+		# setting weight, delay, and intensity parameters
+		self.weight['ee_input'] = (conv_size ** 2) * 0.175
+		self.delay['ee_input'] = (0 * b.ms, 10 * b.ms)
+		self.delay['ei_input'] = (0 * b.ms, 5 * b.ms)
+		self.input_intensity = self.start_input_intensity = 2.0
+		self.wmax_ee = 1.0
+
+		# populations, connections, saved connections, etc.
+		self.input_population_names = [ 'X' ]
+		self.population_names = [ 'A' ]
+		self.input_connection_names = [ 'XA' ]
+		self.save_connections = [ 'XeAe', 'AeAe' ]
+		self.input_conn_names = [ 'ee_input' ]
+		self.recurrent_conn_names = [ 'ei', 'ie', 'ee' ]
+
+		# set ending of filename saves
+		self.ending = self.get_ending(n_input, conv_size, conv_stride, conv_features, connectivity, weight_dependence, post_pre,
+										weight_sharing, lattice_structure, random_lattice_prob, random_inhibition_prob)
+
+		# creating dictionaries for various objects
+		self.neuron_groups, self.input_groups, self.connections, self.input_connections, self.stdp_methods, \
+			self.spike_counters = {}, {}, {}, {}, {}, {}
+
+		# creating convolution locations inside the input image
+		self.convolution_locations = {}
+		for n in xrange(self.n_excitatory_patch):
+			self.convolution_locations[n] = [ ((n % self.n_excitatory_patch_sqrt) * self.conv_stride + (n // self.n_excitatory_patch_sqrt) \
+													* self.n_input_sqrt * self.conv_stride) + (x * self.n_input_sqrt) + y \
+													for y in xrange(self.conv_size) for x in xrange(self.conv_size) ]
+
+		# bookkeeping: neuron spike / votes monitor, label assignments, spike counts
+		self.result_monitor = np.zeros((self.update_interval, self.conv_features, self.n_excitatory_patch))
+		self.assignments = np.ones((self.conv_features, self.n_excitatory_patch))
+		self.previous_spike_count = np.zeros((self.conv_features, self.n_excitatory_patch))
+		self.num_examples_trained = 0
+
+		self.build_network()
+
+
+	@classmethod
+	def get_ending(cls, n_input=784, conv_size=16, conv_stride=4, conv_features=50, connectivity='all', weight_dependence=False, post_pre=True,
+					weight_sharing=False, lattice_structure='4', random_lattice_prob=0.0, random_inhibition_prob=0.0):
+		'''
+		Ending of the file names under which a network with these parameters is saved, without
+		building one.
+		'''
+		n_excitatory_patch = ((int(math.sqrt(n_input)) - conv_size) / conv_stride + 1) ** 2
+
+		# for filesaving purposes
+		stdp_input = ''
+		if weight_dependence:
+			stdp_input += 'weight_dependence_'
+		else:
+			stdp_input += 'no_weight_dependence_'
+		if post_pre:
+			stdp_input += 'post_pre'
+		else:
+			stdp_input += 'no_post_pre'
+		if weight_sharing:
+			use_weight_sharing = 'weight_sharing'
+		else:
+			use_weight_sharing = 'no_weight_sharing'
+
+		return connectivity + '_' + str(conv_size) + '_' + str(conv_stride) + '_' + str(conv_features) + '_' + str(n_excitatory_patch) + \
+					'_' + stdp_input + '_' + use_weight_sharing + '_' + str(lattice_structure) + '_' + str(random_lattice_prob) + \
+					'_' + str(random_inhibition_prob)
+
+
+	def __repr__(self):
+		return 'SpikingCNN(' + self.ending + ')'
+
+
+	def build_network(self):
+		'''
+		Create the neuron groups, connections, STDP rules and spike counters, and
+		collect them into a training network (with plasticity) and a test network
+		(without), which share all neuron and connection state.
+		'''
+		n_e = self.n_excitatory_patch
+
+		# the simulation clock shared by all objects of this network
+		self.clock = b.Clock(dt=self.dt * b.ms)
+
 		# rest potential parameters, reset potential parameters, threshold potential parameters, and refractory periods
 		v_rest_e, v_rest_i = -65. * b.mV, -60. * b.mV
 		v_reset_e, v_reset_i = -65. * b.mV, -45. * b.mV
@@ -172,12 +262,13 @@ class SpikingCNN(object):
 		tc_pre_ee, tc_post_ee = 20 * b.ms, 20 * b.ms
 		nu_ee_pre, nu_ee_post = 0.0001, 0.01
 		exp_ee_post = exp_ee_pre = 0.2
-		w_mu_pre, w_mu_post = 0.2, 0.2
+		wmax_ee = self.wmax_ee
 
-		# parameters for neuron equations
+		# parameters for neuron equations; the adaptive threshold only adapts (and decays)
+		# while 'plastic' is set, i.e., during training
 		tc_theta = 1e7 * b.ms
 		theta_plus = 0.05 * b.mV
-		scr_e = 'v = v_reset_e; theta += theta_plus; timer = 0*ms'
+		scr_e = 'v = v_reset_e; theta += plastic * theta_plus; timer = 0*ms'
 		offset = 20.0 * b.mV
 		v_thresh_e = '(v>(theta - offset + ' + str(v_thresh_e) + ')) * (timer>refrac_e)'
 
@@ -188,8 +279,9 @@ class SpikingCNN(object):
 				I_synI = gi * nS * (-100. * mV - v)  : amp
 				dge / dt = -ge / (1.0*ms)  : 1
 				dgi / dt = -gi / (2.0*ms)  : 1
-				dtheta / dt = -theta / (tc_theta)  : volt
+				dtheta / dt = -plastic * theta / (tc_theta)  : volt
 				dtimer / dt = 100.0  : ms
+				plastic  : 1
 			'''
 
 		neuron_eqs_i = '''
@@ -206,27 +298,9 @@ class SpikingCNN(object):
 				dpost / dt = -post / tc_post_ee : 1.0
 			'''
 
-		# dictionaries for weights and delays
-		self.weight, self.delay = {}, {}
-
-		# setting weight, delay, and intensity parameters
-		self.weight['ee_input'] = (conv_size ** 2) * 0.175
-		self.delay['ee_input'] = (0 * b.ms, 10 * b.ms)
-		self.delay['ei_input'] = (0 * b.ms, 5 * b.ms)
-		self.input_intensity = self.start_input_intensity = 2.0
-		self.wmax_ee = 1.0
-
-		# populations, connections, saved connections, etc.
-		self.input_population_names = [ 'X' ]
-		self.population_names = [ 'A' ]
-		self.input_connection_names = [ 'XA' ]
-		self.save_connections = [ 'XeAe', 'AeAe' ]
-		self.input_connection_names = [ 'ee_input' ]
-		self.recurrent_connection_names = [ 'ei', 'ie', 'ee' ]
-
 		# setting STDP update rule
-		if weight_dependence:
-			if post_pre:
+		if self.weight_dependence:
+			if self.post_pre:
 				eqs_stdp_pre_ee = 'pre = 1.; w -= nu_ee_pre * post * w ** exp_ee_pre'
 				eqs_stdp_post_ee = 'w += nu_ee_post * pre * (wmax_ee - w) ** exp_ee_post; post = 1.'
 
@@ -235,7 +309,7 @@ class SpikingCNN(object):
 				eqs_stdp_post_ee = 'w += nu_ee_post * pre * (wmax_ee - w) ** exp_ee_post; post = 1.'
 
 		else:
-			if post_pre:
+			if self.post_pre:
 				eqs_stdp_pre_ee = 'pre = 1.; w -= nu_ee_pre * post'
 				eqs_stdp_post_ee = 'w += nu_ee_post * pre; post = 1.'
 
@@ -243,59 +317,20 @@ class SpikingCNN(object):
 				eqs_stdp_pre_ee = 'pre = 1.'
 				eqs_stdp_post_ee = 'w += nu_ee_post * pre; post = 1.'
 
-		print '\n'
-
-		# for filesaving purposes
-		stdp_input = ''
-		if self.weight_dependence:
-			stdp_input += 'weight_dependence_'
-		else:
-			stdp_input += 'no_weight_dependence_'
-		if self.post_pre:
-			stdp_input += 'post_pre'
-		else:
-			stdp_input += 'no_post_pre'
-		if self.weight_sharing:
-			use_weight_sharing = 'weight_sharing'
-		else:
-			use_weight_sharing = 'no_weight_sharing'
-
-		# set ending of filename saves
-		self.ending = self.connectivity + '_' + str(self.conv_size) + '_' + str(self.conv_stride) + '_' + str(self.conv_features) + \
-							'_' + str(self.n_excitatory_patch) + '_' + stdp_input + '_' + \
-							use_weight_sharing + '_' + str(self.lattice_structure) + '_' + str(self.random_lattice_prob) + \
-							'_' + str(self.random_inhibition_prob)
-
-		self.fig_num = 1
-
-		# creating dictionaries for various objects
-		self.neuron_groups, self.input_groups, self.connections, self.input_connections, self.stdp_methods, self.rate_monitors, \
-			self.spike_monitors, self.spike_counters, self.output_numbers = {}, {}, {}, {}, {}, {}, {}, {}, {}
-
-		# creating convolution locations inside the input image
-		self.convolution_locations = {}
-		for n in xrange(self.n_excitatory_patch):
-			self.convolution_locations[n] = [ ((n % self.n_excitatory_patch_sqrt) * self.conv_stride + (n // self.n_excitatory_patch_sqrt) \
-													* self.n_input_sqrt * self.conv_stride) + (x * self.n_input_sqrt) + y \
-													for y in xrange(self.conv_size) for x in xrange(self.conv_size) ]
-		
-		# instantiating neuron spike / votes monitor
-		self.result_monitor = np.zeros((self.update_interval, self.conv_features, self.n_excitatory_patch))
-
 		# creating overarching neuron populations
-		self.neuron_groups['e'] = b.NeuronGroup(self.n_excitatory, neuron_eqs_e, threshold=v_thresh_e, \
-															refractory=refrac_e, reset=scr_e, compile=True, freeze=True)
-		self.neuron_groups['i'] = b.NeuronGroup(self.n_inhibitory, neuron_eqs_i, threshold=v_thresh_i, \
-															refractory=refrac_i, reset=v_reset_i, compile=True, freeze=True)
+		self.neuron_groups['e'] = b.NeuronGroup(self.n_excitatory, neuron_eqs_e, threshold=v_thresh_e, refractory=refrac_e, \
+															reset=scr_e, compile=True, freeze=True, clock=self.clock)
+		self.neuron_groups['i'] = b.NeuronGroup(self.n_inhibitory, neuron_eqs_i, threshold=v_thresh_i, refractory=refrac_i, \
+															reset=v_reset_i, compile=True, freeze=True, clock=self.clock)
 
 		# create neuron subpopulations
 		for name in self.population_names:
 			print '...creating neuron group:', name
 
 			# get a subgroup of size 'n_e' from all exc
-			self.neuron_groups[name + 'e'] = self.neuron_groups['e'].subgroup(self.conv_features * self.n_excitatory_patch)
+			self.neuron_groups[name + 'e'] = self.neuron_groups['e'].subgroup(self.conv_features * n_e)
 			# get a subgroup of size 'n_i' from the inhibitory layer
-			self.neuron_groups[name + 'i'] = self.neuron_groups['i'].subgroup(self.conv_features * self.n_excitatory_patch)
+			self.neuron_groups[name + 'i'] = self.neuron_groups['i'].subgroup(self.conv_features * n_e)
 
 			# start the membrane potentials of these groups 40mV below their resting potentials
 			self.neuron_groups[name + 'e'].v = v_rest_e - 40. * b.mV
@@ -307,98 +342,43 @@ class SpikingCNN(object):
 			# set the adaptive additive threshold parameter at 20mV
 			self.neuron_groups['e'].theta = np.ones((self.n_excitatory)) * 20.0 * b.mV
 
-			for connection_type in self.recurrent_connection_names:
-				if connection_type == 'ei':
-					# create connection name (composed of population and connection types)
-					connection_name = name + connection_type[0] + name + connection_type[1]
-					# create a connection from the first group in conn_name with the second group
-					self.connections[connection_name] = b.Connection(self.neuron_groups[connection_name[0:2]], \
-													self.neuron_groups[connection_name[2:4]], structure='sparse', state='g' + conn_type[0])
+			for conn_type in self.recurrent_conn_names:
+				# create connection name (composed of population and connection types)
+				conn_name = name + conn_type[0] + name + conn_type[1]
+				# create a connection from the first group in conn_name with the second group
+				self.connections[conn_name] = b.Connection(self.neuron_groups[conn_name[0:2]], \
+												self.neuron_groups[conn_name[2:4]], structure='sparse', state='g' + conn_type[0])
+
+				if conn_type == 'ei':
 					# instantiate the created connection
 					for feature in xrange(self.conv_features):
-						for n in xrange(self.n_excitatory_patch):
-							self.connections[conn_name][feature * self.n_excitatory_patch + n, \
-															feature * self.n_excitatory_patch + n] = 10.4
-
-				elif connection_type == 'ie':
-					# create connection name (composed of population and connection types)
-					connection_name = name + connection_type[0] + name + connection_type[1]
-					# create a connection from the first group in conn_name with the second group
-					self.connections[connection_name] = b.Connection(self.neuron_groups[connection_name[0:2]], \
-													self.neuron_groups[connection_name[2:4]], structure='sparse', state='g' + conn_type[0])
+						for n in xrange(n_e):
+							self.connections[conn_name][feature * n_e + n, feature * n_e + n] = 10.4
+
+				elif conn_type == 'ie':
 					# instantiate the created connection
 					for feature in xrange(self.conv_features):
 						for other_feature in xrange(self.conv_features):
 							if feature != other_feature:
-								for n in xrange(self.n_excitatory_patch):
-									self.connections[connection_name][feature * self.n_excitatory_patch + n, \
-															other_feature * self.n_excitatory_patch + n] = 17.4
+								for n in xrange(n_e):
+									self.connections[conn_name][feature * n_e + n, other_feature * n_e + n] = 17.4
 
 					# adding random inhibitory connections as specified
 					if self.random_inhibition_prob != 0.0:
 						for feature in xrange(self.conv_features):
 							for other_feature in xrange(self.conv_features):
-								for n_this in xrange(self.n_excitatory_patch):
-									for n_other in xrange(self.n_excitatory_patch):
+								for n_this in xrange(n_e):
+									for n_other in xrange(n_e):
 										if n_this != n_other:
 											if b.random() < self.random_inhibition_prob:
-												self.connections[connection_name][feature * self.n_excitatory_patch + n_this, \
-														other_feature * self.n_excitatory_patch + n_other] = 17.4
-
-				elif connection_type == 'ee':
-					# create connection name (composed of population and connection types)
-					connection_name = name + connection_type[0] + name + connection_type[1]
-					# create a connection from the first group in conn_name with the second group
-					self.connections[connection_name] = b.Connection(self.neuron_groups[connection_name[0:2]], \
-								self.neuron_groups[connection_name[2:4]], structure='sparse', state='g' + connection_type[0])
+												self.connections[conn_name][feature * n_e + n_this, other_feature * n_e + n_other] = 17.4
+
+				elif conn_type == 'ee':
 					# instantiate the created connection
-					if self.connectivity == 'all':
-						for feature in xrange(self.conv_features):
-							for other_feature in xrange(self.conv_features):
-								if feature != other_feature:
-									for this_n in xrange(self.n_excitatory_patch):
-										for other_n in xrange(self.n_excitatory_patch):
-											if is_lattice_connection(self.n_excitatory_patch_sqrt, this_n, other_n):
-												self.connections[connection_name][feature * self.n_excitatory_patch + this_n, \
-														other_feature * self.n_excitatory_patch + other_n] = \
-																(b.random() + 0.01) * 0.3
-
-					elif self.connectivity == 'pairs':
-						for feature in xrange(self.conv_features):
-							if feature % 2 == 0:
-								for this_n in xrange(self.n_excitatory_patch):
-									for other_n in xrange(self.n_excitatory_patch):
-										if is_lattice_connection(self.n_excitatory_patch_sqrt, this_n, other_n):
-											self.connections[connection_name][feature * self.n_excitatory_patch + this_n, \
-													(feature + 1) * self.n_excitatory_patch + other_n] = (b.random() + 0.01) * 0.3
-							elif feature % 2 == 1:
-								for this_n in xrange(self.n_excitatory_patch):
-									for other_n in xrange(self.n_excitatory_patch):
-										if is_lattice_connection(self.n_excitatory_patch_patch, this_n, other_n):
-											self.connections[connection_name][feature * self.n_excitatory_patch + this_n, \
-													(feature - 1) * self.n_excitatory_patch + other_n] = (b.random() + 0.01) * 0.3
-
-					elif connectivity == 'linear':
-						for feature in xrange(self.conv_features):
-							if feature != self.conv_features - 1:
-								for this_n in xrange(self.n_excitatory_patch):
-									for other_n in xrange(self.n_excitatory_patch):
-										if is_lattice_connection(self.n_excitatory_patch_sqrt, this_n, other_n):
-											self.connections[connection_name][feature * self.n_excitatory_patch + this_n, \
-													(feature + 1) * self.n_excitatory_patch + other_n] = \
-																(b.random() + 0.01) * 0.3
-							if feature != 0:
-								for this_n in xrange(self.n_excitatory_patch):
-									for other_n in xrange(self.n_excitatory_patch):
-										if is_lattice_connection(self.n_excitatory_patch_sqrt, this_n, other_n):
-											self.connections[connection_name][feature * self.n_excitatory_patch + this_n, \
-													(feature - 1) * self.n_excitatory_patch + other_n] = \
-																(b.random() + 0.01) * 0.3
-
-					elif self.connectivity == 'none':
-						pass
-
-			# if STDP from excitatory -> excitatory is on and this connection is excitatory -> excitatory
+					for this_n, other_n in self.get_lattice_connections():
+						self.connections[conn_name][this_n, other_n] = (b.random() + 0.01) * 0.3
+
+			# STDP on the connections between patches
 			if 'ee' in self.recurrent_conn_names:
 				self.stdp_methods[name + 'e' + name + 'e'] = b.STDP(self.connections[name + 'e' + name + 'e'], \
 																eqs=eqs_stdp_ee, pre=eqs_stdp_pre_ee, \
@@ -406,139 +386,71 @@ class SpikingCNN(object):
 
 			print '...creating monitors for:', name
 
-			# spike rate monitors for excitatory and inhibitory neuron populations
-			self.rate_monitors[name + 'e'] = b.PopulationRateMonitor(self.neuron_groups[name + 'e'], \
-													bin=(self.single_example_time + self.resting_time) / b.second)
-			self.rate_monitors[name + 'i'] = b.PopulationRateMonitor(self.neuron_groups[name + 'i'], \
-													bin=(self.single_example_time + self.resting_time) / b.second)
+			# spike counters for the excitatory neuron population
 			self.spike_counters[name + 'e'] = b.SpikeCounter(self.neuron_groups[name + 'e'])
 
-			# record neuron population spikes
-			self.spike_monitors[name + 'e'] = b.SpikeMonitor(self.neuron_groups[name + 'e'])
-			self.spike_monitors[name + 'i'] = b.SpikeMonitor(self.neuron_groups[name + 'i'])
-
-		if do_plot:
-			b.figure(self.fig_num)
-			fig_num += 1
-			b.ion()
-			b.subplot(211)
-			b.raster_plot(self.spike_monitors['Ae'], refresh=1000 * b.ms, showlast=1000 * b.ms)
-			b.subplot(212)
-			b.raster_plot(self.spike_monitors['Ai'], refresh=1000 * b.ms, showlast=1000 * b.ms)
-
-		# specifying locations of lattice connections
-		self.lattice_locations = {}
-		if self.connectivity == 'all':
-			for this_n in xrange(self.conv_features * self.n_excitatory_patch):
-				self.lattice_locations[this_n] = [ other_n for other_n in xrange(self.conv_features * self.n_excitatory_patch) \
-												if is_lattice_connection(self.n_excitatory_patch_sqrt, \
-												this_n % self.n_excitatory_patch, other_n % self.n_excitatory_patch) ]
-		elif self.connectivity == 'pairs':
-			for this_n in xrange(self.conv_features * self.n_excitatory_patch):
-				self.lattice_locations[this_n] = []
-				for other_n in xrange(self.conv_features * self.n_excitatory_patch):
-					if this_n // self.n_excitatory_patch % 2 == 0:
-						if is_lattice_connection(self.n_excitatory_patch_sqrt, this_n % self.n_excitatory_patch, \
-													other_n % self.n_excitatory_patch) and \
-													other_n // self.n_excitatory_patch == this_n // self.n_excitatory_patch + 1:
-							self.lattice_locations[this_n].append(other_n)
-					elif this_n // self.n_excitatory_patch % 2 == 1:
-						if is_lattice_connection(self.n_excitatory_patch_sqrt, this_n % self.n_excitatory_patch, \
-													other_n % self.n_excitatory_patch) and \
-													other_n // self.n_excitatory_patch == this_n // self.n_excitatory_patch - 1:
-							self.lattice_locations[this_n].append(other_n)
-		elif self.connectivity == 'linear':
-			for this_n in xrange(self.conv_features * self.n_excitatory_patch):
-				self.lattice_locations[this_n] = []
-				for other_n in xrange(conv_features * self.n_excitatory_patch):
-					if this_n // self.n_excitatory_patch != self.conv_features - 1:
-						if is_lattice_connection(self.n_excitatory_patch_sqrt, this_n % self.n_excitatory_patch, \
-													other_n % self.n_excitatory_patch) and \
-													other_n // self.n_excitatory_patch == this_n // self.n_excitatory_patch + 1:
-							self.lattice_locations[this_n].append(other_n)
-					elif this_n // self.n_excitatory_patch != 0:
-						if is_lattice_connection(self.n_excitatory_patch_sqrt, this_n % self.n_excitatory_patch, \
-													other_n % self.n_excitatory_patch) and \
-													other_n // self.n_excitatory_patch == this_n // self.n_excitatory_patch - 1:
-							self.lattice_locations[this_n].append(other_n)
-
 		# setting up parameters for weight normalization between patches
-		num_lattice_connections = sum([ len(value) for value in lattice_locations.values() ])
+		num_lattice_connections = len(self.get_lattice_connections())
 		self.weight['ee_recurr'] = (num_lattice_connections / self.conv_features) * 0.15
 
 		# creating Poission spike train from input image (784 vector, 28x28 image)
 		for name in self.input_population_names:
-			self.input_groups[name + 'e'] = b.PoissonGroup(self.n_input, 0)
-			self.rate_monitors[name + 'e'] = b.PopulationRateMonitor(self.input_groups[name + 'e'], \
-														bin=(self.single_example_time + self.resting_time) / b.second)
+			self.input_groups[name + 'e'] = b.PoissonGroup(self.n_input, 0, clock=self.clock)
 
 		# creating connections from input Poisson spike train to convolution patch populations
 		for name in self.input_connection_names:
 			print '\n...creating connections between', name[0], 'and', name[1]
-			
+
 			# for each of the input connection types (in this case, excitatory -> excitatory)
-			for connection_type in self.input_conn_names:
+			for conn_type in self.input_conn_names:
 				# saved connection name
-				connection_name = name[0] + connection_type[0] + name[1] + connection_type[1]
+				conn_name = name[0] + conn_type[0] + name[1] + conn_type[1]
 
 				# create connections from the windows of the input group to the neuron population
-				self.input_connections[connection_name] = b.Connection(self.input_groups['Xe'], \
-								self.neuron_groups[name[1] + connection_type[1]], structure='sparse', \
-								state='g' + connection_type[0], delay=True, max_delay=self.delay[connection_type][1])
+				self.input_connections[conn_name] = b.Connection(self.input_groups['Xe'], \
+								self.neuron_groups[name[1] + conn_type[1]], structure='sparse', \
+								state='g' + conn_type[0], delay=True, max_delay=self.delay[conn_type][1])
 
 				for feature in xrange(self.conv_features):
-					for n in xrange(self.n_excitatory_patch):
+					for n in xrange(n_e):
 						for idx in xrange(self.conv_size ** 2):
-							self.input_connections[connection_name][self.convolution_locations[n][idx], \
-												feature * self.n_excitatory_patch + n] = (b.random() + 0.01) * 0.3
-
-			# if excitatory -> excitatory STDP is specified, add it here (input to excitatory populations)
-			print '...creating STDP for connection', name
-			
-			# STDP connection name
-			connection_name = name[0] + connection_type[0] + name[1] + connection_type[1]
-			# create the STDP object
-			self.stdp_methods[connection_name] = b.STDP(self.input_connections[connection_name], \
-					eqs=eqs_stdp_ee, pre=eqs_stdp_pre_ee, post=eqs_stdp_post_ee, wmin=0., wmax=self.wmax_ee)
-
-		print '\n'
-
-	@classmethod
-	def from_file(ending):
-		'''
-		For the test phase, load the necessary network parameters from disk.
+							self.input_connections[conn_name][self.convolution_locations[n][idx], feature * n_e + n] = (b.random() + 0.01) * 0.3
 
-		ending: 
-		'''
-		this.ending = ending
+				print '...creating STDP for connection', name
 
+				# create the STDP object
+				self.stdp_methods[conn_name] = b.STDP(self.input_connections[conn_name], \
+						eqs=eqs_stdp_ee, pre=eqs_stdp_pre_ee, post=eqs_stdp_post_ee, wmin=0., wmax=self.wmax_ee)
 
-	def train(self):
-		'''
-		Main loop for training phase.
-		'''
-		start = timeit.default_timer()
-		data = get_labeled_data(MNIST_data_path + 'training', b_train=True)
-		print 'time needed to load training dataset:', timeit.default_timer() - start
+		print '\n'
 
-		runtime = len(data[0]) * (self.single_example_time + self.resting_time)
+		# training and test networks; the latter simply leaves out the STDP objects
+		objects = self.neuron_groups.values() + self.input_groups.values() + self.connections.values() + \
+					self.input_connections.values() + self.spike_counters.values()
+		self.networks = { 'train' : b.Network(*(objects + self.stdp_methods.values())), 'test' : b.Network(*objects) }
 
 
-	def test(self):
+	def get_lattice_connections(self):
 		'''
-		Main loop for test phase.
+		Get the (source, target) excitatory neuron index pairs connected between
+		patches, according to the 'connectivity' and 'lattice_structure' settings.
 		'''
-		start = timeit.default_timer()
-		data = get_labeled_data(MNIST_data_path + 'test', b_train=False)
-		print 'time needed to load test dataset:', timeit.default_timer() - start
+		n_e = self.n_excitatory_patch
 
-		runtime = len(data[0]) * (self.single_example_time + self.resting_time)
+		if self.connectivity == 'all':
+			feature_pairs = [ (feature, other_feature) for feature in xrange(self.conv_features) \
+								for other_feature in xrange(self.conv_features) if feature != other_feature ]
+		elif self.connectivity == 'pairs':
+			feature_pairs = [ (feature, feature + 1) if feature % 2 == 0 else (feature, feature - 1) \
+								for feature in xrange(self.conv_features) if feature % 2 == 1 or feature + 1 < self.conv_features ]
+		elif self.connectivity == 'linear':
+			feature_pairs = [ (feature, feature + 1) for feature in xrange(self.conv_features - 1) ] + \
+								[ (feature, feature - 1) for feature in xrange(1, self.conv_features) ]
+		elif self.connectivity == 'none':
+			feature_pairs = []
 
-	def step(self):
-		'''
-		Do one iteration (corresponding to a single input example) of the algorithm.
-		'''
-		pass
+		return [ (feature * n_e + this_n, other_feature * n_e + other_n) for feature, other_feature in feature_pairs \
+					for this_n in xrange(n_e) for other_n in xrange(n_e) if self.is_lattice_connection(this_n, other_n) ]
 
 
 	def is_lattice_connection(self, i, j):
@@ -549,78 +461,283 @@ class SpikingCNN(object):
 		i: First neuron's index
 		j: Second neuron's index
 		'''
-		sqrt = int(math.sqrt(this.n_excitatory_patch))
+		sqrt = self.n_excitatory_patch_sqrt
 
-		if this.lattice_structure == 'none':
+		if self.lattice_structure == 'none':
 			return False
-		if this.lattice_structure == '4':
+		if self.lattice_structure == '4':
 			return i + 1 == j and j % sqrt != 0 or i - 1 == j and i % sqrt != 0 or i + sqrt == j or i - sqrt == j
-		if this.lattice_structure == '8':
+		if self.lattice_structure == '8':
 			return i + 1 == j and j % sqrt != 0 or i - 1 == j and i % sqrt != 0 or i + sqrt == j or i - sqrt == j or i + sqrt == j + 1 and j % sqrt != 0 or i + sqrt == j - 1 and i % sqrt != 0 or i - sqrt == j + 1 and i % sqrt != 0 or i - sqrt == j - 1 and j % sqrt != 0
-		if this.lattice_structure == 'all':
+		if self.lattice_structure == 'all':
 			return True
 
 
-	def save_connections(self):
+	def set_plastic(self, plastic):
+		'''
+		Switch the adaptive thresholds on (training) or off (testing). STDP is switched
+		by choosing which of 'self.networks' to run.
 		'''
-		Save all connections in 'save_conns'; ending may be set to the index of the last
-		example run through the network
+		self.neuron_groups['e'].plastic = 1.0 if plastic else 0.0
 
-		self: this SpikingCNN object
+
+	def step(self, image, plastic=True):
+		'''
+		Do one iteration (corresponding to a single input example) of the algorithm: present
+		the image (retrying with increased intensity if the excitatory layer barely spikes),
+		let the network relax, and return the excitatory spike counts of the presentation.
+
+		image: input example; any array with 'n_input' pixels valued in [0, 255]
+		plastic: whether to apply STDP, the adaptive thresholds and weight normalization / sharing
+		'''
+		network = self.networks['train' if plastic else 'test']
+		self.set_plastic(plastic)
+
+		# ensure weights don't grow without bound
+		if plastic:
+			self.normalize_weights()
+
+		input_intensity = self.start_input_intensity
+		num_retries = 0
+
+		while True:
+			# sets the input firing rates and run the network for a single example time
+			self.input_groups['Xe'].rate = (np.reshape(image, self.n_input) / 8.0) * input_intensity
+			network.run(self.single_example_time)
+
+			# get count of spikes over the past iteration
+			spike_count = np.copy(self.spike_counters['Ae'].count[:]).reshape((self.conv_features, self.n_excitatory_patch))
+			current_spike_count = spike_count - self.previous_spike_count
+			self.previous_spike_count = spike_count
+
+			# set weights to those of the most-fired neuron
+			if plastic and self.weight_sharing:
+				self.set_weights_most_fired(current_spike_count)
+
+			# set input firing rates back to zero and let the network relax back to equilibrium
+			self.input_groups['Xe'].rate = 0
+			network.run(self.resting_time)
+
+			# if the neurons in the network didn't spike more than four times, try again with more intense input
+			if np.sum(current_spike_count) < 5 and num_retries < 3:
+				input_intensity += 2
+				num_retries += 1
+			else:
+				return current_spike_count
+
+
+	def train(self, data, n=None, start=0):
+		'''
+		Main loop for training phase. Runs 'n' examples of 'data' (starting at index 'start'
+		and wrapping around) through the network with plasticity on, re-assigning labels to
+		the excitatory neurons every 'update_interval' examples. Returns the classification
+		accuracy (in percent) over each 'update_interval' window.
+
+		data: dictionary with images 'x' and labels 'y', as returned by 'get_MNIST_data'
+		n: number of training examples (defaults to the size of the dataset)
+		start: index of the first training example
 		'''
+		if n is None:
+			n = len(data['x'])
+
+		input_numbers = np.zeros(n, dtype=int)
+		output_numbers = np.zeros(n, dtype=int)
+		performances = []
+
+		start_time = timeit.default_timer()
+
+		for j in xrange(n):
+			idx = (start + j) % len(data['x'])
 
-		# iterate over all connections to save
-		for connection_name in self.save_connections:
-			save_name = connection_name + '_' + self.ending
-			print '...saving connection: weights/conv_patch_connectivity_weights/' + save_name
+			# get new neuron label assignments every 'update_interval'
+			if j % self.update_interval == 0 and j > 0:
+				self.assign_labels(self.result_monitor, input_numbers[j - self.update_interval : j])
 
-			if connection_name == 'AeAe':
-				connection_matrix = this.connections[connection_name][:]
-			elif connection_name == 'XeAe':
-				connection_matrix = this.input_connections[connection_name][:]
+				performances.append(np.mean(output_numbers[j - self.update_interval : j] == input_numbers[j - self.update_interval : j]) * 100)
+				print '\nClassification performance (all):', performances[-1], '\n'
 
-			# sparsify it into (row, column, entry) tuples and save it to disk
-			sparse_connection = ([(i, j, connection_matrix[i, j]) for i in xrange(connection_matrix.shape[0]) for j in xrange(connection_matrix.shape[1]) ])
-			np.save(top_level_path + 'weights/conv_patch_connectivity_weights/' + save_name, sparse_connection)
+			current_spike_count = self.step(data['x'][idx], plastic=True)
 
+			# record the spike counts, label and classification of this example
+			self.result_monitor[j % self.update_interval] = current_spike_count
+			input_numbers[j] = data['y'][idx][0]
+			output_numbers[j] = self.predict_label(current_spike_count)[0]
 
-	def save_theta(self):
+			# print progress
+			if j % self.print_progress_interval == 0 and j > 0:
+				print 'runs done:', j, 'of', n, '(time taken for past', self.print_progress_interval, 'runs:', str(timeit.default_timer() - start_time) + ')'
+				start_time = timeit.default_timer()
+
+		# ensure weights don't grow without bound
+		self.normalize_weights()
+		self.num_examples_trained += n
+
+		return performances
+
+
+	def test(self, data, n=None, start=0):
 		'''
-		Save the adaptive threshold parameters to a file.
+		Main loop for test phase. Runs 'n' examples of 'data' through the network with
+		plasticity off, and classifies them with the label assignments from training.
+		Returns the classification accuracy (in percent) and the spike counts per example.
+
+		data: dictionary with images 'x' and labels 'y', as returned by 'get_MNIST_data'
+		n: number of test examples (defaults to the size of the dataset)
+		start: index of the first test example
 		'''
+		if n is None:
+			n = len(data['x'])
+
+		spike_counts = np.zeros((n, self.conv_features, self.n_excitatory_patch))
+		input_numbers = np.zeros(n, dtype=int)
+		output_numbers = np.zeros(n, dtype=int)
+
+		start_time = timeit.default_timer()
+
+		for j in xrange(n):
+			idx = (start + j) % len(data['x'])
+
+			spike_counts[j] = self.step(data['x'][idx], plastic=False)
+			input_numbers[j] = data['y'][idx][0]
+			output_numbers[j] = self.predict_label(spike_counts[j])[0]
+
+			# print progress
+			if j % self.print_progress_interval == 0 and j > 0:
+				print 'runs done:', j, 'of', n, '(time taken for past', self.print_progress_interval, 'runs:', str(timeit.default_timer() - start_time) + ')'
+				start_time = timeit.default_timer()
+
+		accuracy = np.mean(output_numbers == input_numbers) * 100
+		print '\nTest classification performance (all):', accuracy, '\n'
+
+		return accuracy, spike_counts
+
+
+	def assign_labels(self, result_monitor, input_numbers):
+		'''
+		Based on the spike counts 'result_monitor' recorded for the examples labeled
+		'input_numbers', assign to each excitatory neuron the label it responded to most.
+		'''
+		input_numbers = np.asarray(input_numbers)
+		rates = np.zeros((10, self.conv_features, self.n_excitatory_patch))
+
+		for j in xrange(10):
+			num_assignments = np.sum(input_numbers == j)
+			if num_assignments > 0:
+				rates[j] = np.sum(result_monitor[:len(input_numbers)][input_numbers == j], axis=0) / float(num_assignments)
+
+		# neurons which never fired keep the default label
+		self.assignments = np.where(np.max(rates, axis=0) > 0, np.argmax(rates, axis=0), 1)
+		return self.assignments
+
+
+	def predict_label(self, spike_count):
+		'''
+		Given the spike counts of the excitatory layer on one example, rank the labels by
+		the average spike count of the neurons assigned to them ('all' voting).
+		'''
+		summed_rates = np.zeros(10)
+
+		for i in xrange(10):
+			num_assignments = np.sum(self.assignments == i)
+			if num_assignments > 0:
+				summed_rates[i] = np.sum(spike_count[self.assignments == i]) / float(num_assignments)
+
+		return np.argsort(summed_rates)[::-1]
+
+
+	def get_weight_matrix(self, conn_name):
+		'''
+		Get the dense weight matrix of connection 'conn_name' ('XeAe' or 'AeAe').
+		'''
+		if conn_name in self.input_connections:
+			return np.asarray(self.input_connections[conn_name][:].todense())
+		return np.asarray(self.connections[conn_name][:].todense())
+
+
+	def set_weight_matrix(self, conn_name, weight_matrix):
+		'''
+		Copy the entries of 'weight_matrix' into the existing synapses of connection 'conn_name'.
+		'''
+		if conn_name in self.input_connections:
+			connection = self.input_connections[conn_name]
+		else:
+			connection = self.connections[conn_name]
+
+		for i, j in zip(*coo_matrix(connection[:]).nonzero()):
+			connection[i, j] = weight_matrix[i, j]
+
+
+	def save(self, directory=weight_path):
+		'''
+		Save the network's parameters, connection weights (as (row, column, entry)
+		triplets), adaptive thresholds and label assignments to 'directory'.
+		'''
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+
+		p.dump(self.get_params(), open(directory + 'params_' + self.ending + '.p', 'wb'))
+
+		for conn_name in self.save_connections:
+			print '...saving connection: ' + directory + conn_name + '_' + self.ending
+			weight_matrix = coo_matrix(self.get_weight_matrix(conn_name))
+			np.save(directory + conn_name + '_' + self.ending, np.column_stack([weight_matrix.row, weight_matrix.col, weight_matrix.data]))
 
-		# iterate over population for which to save theta parameters
 		for population_name in self.population_names:
-			save_name = 'theta_' + population_name + '_' + self.ending
-			# print out saved theta populations
-			print '...saving theta: weights/conv_patch_connectivity_weights/' + save_name
+			print '...saving theta: ' + directory + 'theta_' + population_name + '_' + self.ending
+			np.save(directory + 'theta_' + population_name + '_' + self.ending, self.neuron_groups[population_name + 'e'].theta)
 
-			# save out the theta parameters to file
-			np.save(top_level_path + 'weights/conv_patch_connectivity_weights/' + save_name, neuron_groups[population_name + 'e'].theta)
+		np.save(directory + 'assignments_' + self.ending, self.assignments)
 
 
-	def set_weights_most_fired(self):
+	@classmethod
+	def load(cls, ending, directory=weight_path):
+		'''
+		Build a network from the files written by 'save' (identified by their 'ending').
+		'''
+		network = cls(**p.load(open(directory + 'params_' + ending + '.p', 'rb')))
+
+		for conn_name in network.save_connections:
+			n_src = network.n_input if conn_name in network.input_connections else network.n_excitatory
+			network.set_weight_matrix(conn_name, get_matrix_from_file(directory + conn_name + '_' + ending + '.npy', n_src, network.n_excitatory))
+
+		for population_name in network.population_names:
+			network.neuron_groups[population_name + 'e'].theta = np.load(directory + 'theta_' + population_name + '_' + ending + '.npy')
+
+		network.assignments = np.load(directory + 'assignments_' + ending + '.npy')
+
+		return network
+
+
+	def get_params(self):
+		'''
+		Get the constructor arguments of this network.
+		'''
+		return { 'n_input' : self.n_input, 'conv_size' : self.conv_size, 'conv_stride' : self.conv_stride, 'conv_features' : self.conv_features,
+					'connectivity' : self.connectivity, 'weight_dependence' : self.weight_dependence, 'post_pre' : self.post_pre,
+					'weight_sharing' : self.weight_sharing, 'lattice_structure' : self.lattice_structure, 'random_lattice_prob' : self.random_lattice_prob,
+					'random_inhibition_prob' : self.random_inhibition_prob, 'dt' : self.dt }
+
+
+	def set_weights_most_fired(self, current_spike_count):
 		'''
 		For each convolutional patch, set the weights to those of the neuron which
 		fired the most in the last iteration.
 		'''
+		n_e = self.n_excitatory_patch
 
 		for connection_name in self.input_connections:
 			for feature in xrange(self.conv_features):
-				# count up the spikes for the neurons in this convolution patch
-				column_sums = np.sum(self.current_spike_count[feature : feature + 1, :], axis=0)
-
-				# find the excitatory neuron which spiked the most
-				most_spiked = np.argmax(column_sums)
+				# find the excitatory neuron which spiked the most in this convolution patch
+				most_spiked = np.argmax(current_spike_count[feature])
 
 				# create a "dense" version of the most spiked excitatory neuron's weight
-				most_spiked_dense = self.input_connections[connection_name][:, feature * self.n_excitatory_patch + most_spiked].todense()
+				most_spiked_dense = self.input_connections[connection_name][:, feature * n_e + most_spiked].todense()
 
 				# set all other neurons' (in the same convolution patch) weights the same as the most-spiked neuron in the patch
-				for n in xrange(n_excitatory_patch):
+				for n in xrange(n_e):
 					if n != most_spiked:
 						other_dense = self.input_connections[connection_name][:, feature * n_e + n].todense()
-						other_dense[convolution_locations[n]] = most_spiked_dense[self.convolution_locations[most_spiked]]
+						other_dense[self.convolution_locations[n]] = most_spiked_dense[self.convolution_locations[most_spiked]]
 						self.input_connections[connection_name][:, feature * n_e + n] = other_dense
 
 
@@ -628,28 +745,30 @@ class SpikingCNN(object):
 		'''
 		Squash the input -> excitatory weights to sum to a prespecified number.
 		'''
+		n_e = self.n_excitatory_patch
+
 		for connection_name in self.input_connections:
 			connection = self.input_connections[connection_name][:].todense()
 			for feature in xrange(self.conv_features):
-				feature_connection = connection[:, feature * self.n_excitatory_patch : (feature + 1) * n_excitatory_patch]
-				column_sums = np.sum(feature_connection, axis=0)
+				feature_connection = connection[:, feature * n_e : (feature + 1) * n_e]
+				column_sums = np.sum(np.asarray(feature_connection), axis=0)
 				column_factors = self.weight['ee_input'] / column_sums
 
 				for n in xrange(n_e):
 					dense_weights = self.input_connections[connection_name][:, feature * n_e + n].todense()
-					dense_weights[convolution_locations[n]] *= column_factors[n]
+					dense_weights[self.convolution_locations[n]] *= column_factors[n]
 					self.input_connections[connection_name][:, feature * n_e + n] = dense_weights
 
-		for connection_name in connections:
-			if 'AeAe' in connection_name and lattice_structure != 'none':
-				connection = connections[connection_name][:].todense()
-				for feature in xrange(conv_features):
+		for connection_name in self.connections:
+			if 'AeAe' in connection_name and self.lattice_structure != 'none' and self.connectivity != 'none':
+				connection = self.connections[connection_name][:].todense()
+				for feature in xrange(self.conv_features):
 					feature_connection = connection[feature * n_e : (feature + 1) * n_e, :]
 					column_sums = np.sum(feature_connection)
-					column_factors = weight['ee_recurr'] / column_sums
+					column_factors = self.weight['ee_recurr'] / column_sums
 
 					for idx in xrange(feature * n_e, (feature + 1) * n_e):
-						connections[connection_name][idx, :] *= column_factors
+						self.connections[connection_name][idx, :] *= column_factors
 
 
 if __name__ == '__main__':
@@ -660,18 +779,16 @@ if __name__ == '__main__':
 	parser.add_argument('--conv_stride', type=int, default=4)
 	parser.add_argument('--conv_features', type=int, default=50)
 	parser.add_argument('--connectivity', default='all')
-	parser.add_argument('--weight_dependence', default=False)
-	parser.add_argument('--post_pre', default=True)
-	parser.add_argument('--weight_sharing', default=False)
+	parser.add_argument('--weight_dependence', action='store_true')
+	parser.add_argument('--no_post_pre', action='store_true')
+	parser.add_argument('--weight_sharing', action='store_true')
 	parser.add_argument('--lattice_structure', default='4')
 	parser.add_argument('--random_lattice_prob', type=float, default=0.0)
 	parser.add_argument('--random_inhibition_prob', type=float, default=0.0)
-	parser.add_argument('--top_percent', type=int, default=10)
-	
+	parser.add_argument('--num_train', type=int, default=60000)
+	parser.add_argument('--num_test', type=int, default=10000)
+
 	args = parser.parse_args()
-	mode, connectivity, weight_dependence, post_pre, conv_size, conv_stride, conv_features, weight_sharing, lattice_structure, random_lattice_prob, random_inhibition_prob, top_percent = \
-		args.mode, args.connectivity, args.weight_dependence, args.post_pre, args.conv_size, args.conv_stride, args.conv_features, args.weight_sharing, \
-		args.lattice_structure, args.random_lattice_prob, args.random_inhibition_prob, args.top_percent
 
 	print '\n'
 
@@ -686,13 +803,26 @@ if __name__ == '__main__':
 		magic_useframes = False, useweave_linear_diffeq = True)
 
 	np.random.seed(0)
-	b.ion()
-
-	if mode == 'train':
-		network = SpikingCNN(n_input, conv_size, conv_stride, conv_features, connectivity, weight_dependence, post_pre, weight_sharing, lattice_structure, random_lattice_prob, random_inhibition_prob)
-		network.build_network(mode)
-		network.train()
-	elif mode == 'test':
-		network = SpikingCNN.from_file(ending)
-		network.build_network(mode)
-		network.test()
\ No newline at end of file
+
+	params = (n_input, args.conv_size, args.conv_stride, args.conv_features, args.connectivity, args.weight_dependence, \
+				not args.no_post_pre, args.weight_sharing, args.lattice_structure, args.random_lattice_prob, args.random_inhibition_prob)
+
+	if args.mode == 'train':
+		network = SpikingCNN(*params)
+
+		start = timeit.default_timer()
+		training = get_MNIST_data(MNIST_data_path + 'training', train=True)
+		print 'time needed to load training dataset:', timeit.default_timer() - start
+
+		network.train(training, args.num_train)
+		network.save()
+
+	elif args.mode == 'test':
+		# only the saved network is built
+		network = SpikingCNN.load(SpikingCNN.get_ending(*params))
+
+		start = timeit.default_timer()
+		testing = get_MNIST_data(MNIST_data_path + 'testing', train=False)
+		print 'time needed to load test dataset:', timeit.default_timer() - start
+
+		network.test(testing, args.num_test)
@@ -0,0 +1,96 @@
+'''
+Streaming classification metrics for the training / test loops.
+
+Every example updates, in constant time per voting mechanism: a confusion matrix over the
+last 'window' examples (the oldest example is subtracted as the newest is added), an
+exponentially smoothed accuracy, and the per-window accuracies which used to be recomputed by
+slicing the full output arrays every 'update_interval' examples. Current values can be read at
+any time, without waiting for the end of a window.
+'''
+
+import numpy as np
+import cPickle as p
+
+
+class StreamingMetrics(object):
+	'''
+	Rolling confusion matrices and smoothed accuracies, one per voting mechanism.
+	'''
+
+	def __init__(self, mechanisms, window, num_windows, smoothing=0.01, num_labels=10):
+		'''
+		mechanisms: names of the voting mechanisms
+		window: number of most recent examples in the rolling confusion matrices (and per-window accuracies)
+		num_windows: number of per-window accuracies to keep (entry k covers examples [(k - 1) * window, k * window))
+		smoothing: weight of the newest example in the exponentially smoothed accuracy
+		'''
+		self.mechanisms, self.window, self.smoothing = mechanisms, window, smoothing
+		self.num_examples = 0
+
+		self.labels = np.zeros(window, dtype=np.int64)
+		self.predictions = { mechanism : np.zeros(window, dtype=np.int64) for mechanism in mechanisms }
+		self.confusion = { mechanism : np.zeros((num_labels, num_labels), dtype=np.int64) for mechanism in mechanisms }
+		self.num_correct = { mechanism : 0 for mechanism in mechanisms }
+		self.smoothed = { mechanism : None for mechanism in mechanisms }
+
+		self.window_correct = { mechanism : 0 for mechanism in mechanisms }
+		self.performances = { mechanism : np.zeros(num_windows) for mechanism in mechanisms }
+
+	def update(self, label, predictions):
+		'''
+		Record one example: its true 'label' and the label predicted by each mechanism.
+		'''
+		slot = self.num_examples % self.window
+		full = self.num_examples >= self.window
+		old_label = self.labels[slot]
+		self.labels[slot] = label
+
+		for mechanism in self.mechanisms:
+			prediction = predictions[mechanism]
+			correct = prediction == label
+
+			# forget the example which leaves the window
+			if full:
+				old_prediction = self.predictions[mechanism][slot]
+				self.confusion[mechanism][old_label, old_prediction] -= 1
+				self.num_correct[mechanism] -= old_prediction == old_label
+
+			self.predictions[mechanism][slot] = prediction
+			self.confusion[mechanism][label, prediction] += 1
+			self.num_correct[mechanism] += correct
+			self.window_correct[mechanism] += correct
+
+			if self.smoothed[mechanism] is None:
+				self.smoothed[mechanism] = 100.0 * correct
+			else:
+				self.smoothed[mechanism] += self.smoothing * (100.0 * correct - self.smoothed[mechanism])
+
+		self.num_examples += 1
+
+		# close a window of per-window accuracies
+		if self.num_examples % self.window == 0:
+			evaluation = self.num_examples // self.window
+			for mechanism in self.mechanisms:
+				if evaluation < len(self.performances[mechanism]):
+					self.performances[mechanism][evaluation] = 100.0 * self.window_correct[mechanism] / self.window
+				self.window_correct[mechanism] = 0
+
+	def get_accuracy(self, mechanism):
+		'''
+		Accuracy (in %) of 'mechanism' over the last 'window' examples.
+		'''
+		return 100.0 * self.num_correct[mechanism] / max(min(self.num_examples, self.window), 1)
+
+	def get_current(self):
+		'''
+		Current rolling and smoothed accuracies per mechanism.
+		'''
+		return { mechanism : { 'rolling' : self.get_accuracy(mechanism), 'smoothed' : self.smoothed[mechanism] } \
+																			for mechanism in self.mechanisms }
+
+	def save(self, file_name):
+		'''
+		Pickle the per-window accuracies, in the '(number of examples, performances)' format
+		read by the performance plotting scripts.
+		'''
+		p.dump((self.num_examples, self.performances), open(file_name, 'wb'))
@@ -0,0 +1,175 @@
+'''
+On-disk cache of the network topology of the convolutional patch connectivity experiments.
+
+For a given (conv_size, conv_stride, conv_features, connectivity, lattice_structure,
+random_inhibition_prob, seed), the connectivity structure built by 'build_network' is
+deterministic: the convolution windows in the input, the excitatory <-> inhibitory edges,
+the lattice edges between patches and the lattice neighbourhood sizes. These are computed
+once as index arrays and stored in a '.npz' file keyed by a hash of the parameters, so
+test runs and repeated sweep jobs load them instead of rebuilding them in Python loops.
+'''
+
+import numpy as np
+import os, hashlib
+
+n_input = 784
+cache_version = 1
+
+
+def get_lattice_mask(sqrt, lattice_structure):
+	'''
+	Boolean (sqrt ** 2, sqrt ** 2) matrix whose (i, j) entry is True if nodes i and j are
+	neighbors in a 4-, 8-, or all-lattice.
+
+	sqrt: square root of the number of nodes in population
+	lattice_structure: one of 'none', '4', '8', 'all'
+	'''
+	i, j = np.indices((sqrt ** 2, sqrt ** 2))
+
+	if lattice_structure == 'none':
+		return np.zeros((sqrt ** 2, sqrt ** 2), dtype=bool)
+	if lattice_structure == '4':
+		return ((i + 1 == j) & (j % sqrt != 0)) | ((i - 1 == j) & (i % sqrt != 0)) | (i + sqrt == j) | (i - sqrt == j)
+	if lattice_structure == '8':
+		return ((i + 1 == j) & (j % sqrt != 0)) | ((i - 1 == j) & (i % sqrt != 0)) | (i + sqrt == j) | (i - sqrt == j) | \
+				((i + sqrt == j + 1) & (j % sqrt != 0)) | ((i + sqrt == j - 1) & (i % sqrt != 0)) | \
+				((i - sqrt == j + 1) & (i % sqrt != 0)) | ((i - sqrt == j - 1) & (j % sqrt != 0))
+	if lattice_structure == 'all':
+		return np.ones((sqrt ** 2, sqrt ** 2), dtype=bool)
+
+	raise Exception('unknown lattice structure: ' + str(lattice_structure))
+
+
+def get_feature_pairs(connectivity, conv_features):
+	'''
+	(feature, other_feature) pairs of patches connected by lattice edges, in the order in
+	which 'build_network' has always created them.
+	'''
+	if connectivity == 'all':
+		return [ (feature, other_feature) for feature in xrange(conv_features) for other_feature in xrange(conv_features) if feature != other_feature ]
+	if connectivity == 'pairs':
+		return [ (feature, feature + 1) if feature % 2 == 0 else (feature, feature - 1) for feature in xrange(conv_features) \
+																			if feature % 2 == 1 or feature + 1 < conv_features ]
+	if connectivity == 'linear':
+		pairs = []
+		for feature in xrange(conv_features):
+			if feature != conv_features - 1:
+				pairs.append((feature, feature + 1))
+			if feature != 0:
+				pairs.append((feature, feature - 1))
+		return pairs
+	if connectivity == 'none':
+		return []
+
+	raise Exception('unknown connectivity: ' + str(connectivity))
+
+
+def get_lattice_counts(connectivity, conv_features, mask):
+	'''
+	Number of lattice neighbours per excitatory neuron, as counted by the 'lattice_locations'
+	dictionary of 'build_network' (which sets up the between-patch weight normalization).
+	'''
+	n_e = mask.shape[0]
+	row_counts = np.sum(mask, axis=1)
+
+	if connectivity == 'all':
+		# every feature (including the neuron's own) is counted here
+		per_feature = np.ones(conv_features, dtype=np.int64) * conv_features
+	elif connectivity == 'pairs':
+		per_feature = np.array([ 1 if feature % 2 == 1 or feature + 1 < conv_features else 0 for feature in xrange(conv_features) ])
+	elif connectivity == 'linear':
+		# the old dictionary counted a single neighbouring patch per feature (the next one, or the
+		# previous one for the last feature), and none with a single feature
+		per_feature = np.ones(conv_features, dtype=np.int64) if conv_features > 1 else np.zeros(1, dtype=np.int64)
+	else:
+		per_feature = np.zeros(conv_features, dtype=np.int64)
+
+	return np.ravel(np.outer(per_feature, row_counts))
+
+
+def build_topology(conv_size, conv_stride, conv_features, connectivity, lattice_structure, random_inhibition_prob, seed):
+	'''
+	Compute the topology index arrays. Excitatory neuron 'feature * n_e + n' sits at location
+	'n' of convolution patch 'feature'; edge lists are (source, target) index arrays.
+	'''
+	n_input_sqrt = int(np.sqrt(n_input))
+	n_e_sqrt = (n_input_sqrt - conv_size) / conv_stride + 1
+	n_e = n_e_sqrt ** 2
+
+	# pixel indices of each convolution window, in the order of the old 'convolution_locations' lists
+	n, x, y = np.arange(n_e)[:, np.newaxis, np.newaxis], np.arange(conv_size)[np.newaxis, np.newaxis, :], np.arange(conv_size)[np.newaxis, :, np.newaxis]
+	convolution_locations = ((n % n_e_sqrt) * conv_stride + (n // n_e_sqrt) * n_input_sqrt * conv_stride) + (x * n_input_sqrt) + y
+	convolution_locations = convolution_locations.reshape((n_e, conv_size ** 2)).astype(np.int32)
+
+	neurons = np.arange(conv_features * n_e)
+	features, locations = neurons // n_e, neurons % n_e
+
+	# excitatory -> inhibitory: one-to-one
+	ei = np.vstack([ neurons, neurons ])
+
+	# inhibitory -> excitatory: the same location in every other feature ...
+	other_features = np.arange(conv_features)
+	ie_sources = np.repeat(neurons, conv_features)
+	ie_targets = np.tile(other_features, len(neurons)) * n_e + np.repeat(locations, conv_features)
+	keep = np.repeat(features, conv_features) != np.tile(other_features, len(neurons))
+	ie = [ np.vstack([ ie_sources[keep], ie_targets[keep] ]) ]
+
+	# ... plus random extra edges to other locations, drawn from the seeded stream
+	if random_inhibition_prob != 0.0:
+		random_state = np.random.RandomState(seed)
+		other_locations = ~np.eye(n_e, dtype=bool)
+		for feature in xrange(conv_features):
+			edges = (random_state.random_sample((conv_features, n_e, n_e)) < random_inhibition_prob) & other_locations
+			other_feature, n_this, n_other = np.nonzero(edges)
+			ie.append(np.vstack([ feature * n_e + n_this, other_feature * n_e + n_other ]))
+	ie = np.hstack(ie)
+
+	# excitatory -> excitatory: lattice edges between connected patches
+	mask = get_lattice_mask(n_e_sqrt, lattice_structure)
+	this_n, other_n = np.nonzero(mask)
+	ee = [ np.zeros((2, 0), dtype=np.int64) ]
+	for feature, other_feature in get_feature_pairs(connectivity, conv_features):
+		ee.append(np.vstack([ feature * n_e + this_n, other_feature * n_e + other_n ]))
+	ee = np.hstack(ee)
+
+	return { 'convolution_locations' : convolution_locations, 'ei' : ei.astype(np.int32), 'ie' : ie.astype(np.int32),
+				'ee' : ee.astype(np.int32), 'lattice_counts' : get_lattice_counts(connectivity, conv_features, mask).astype(np.int32) }
+
+
+def get_cache_file(cache_dir, conv_size, conv_stride, conv_features, connectivity, lattice_structure, random_inhibition_prob, seed):
+	'''
+	Path of the cache file for a configuration.
+	'''
+	key = repr((cache_version, conv_size, conv_stride, conv_features, connectivity, lattice_structure, float(random_inhibition_prob), seed))
+	return os.path.join(cache_dir, 'topology_' + hashlib.sha1(key).hexdigest() + '.npz')
+
+
+def get_topology(conv_size, conv_stride, conv_features, connectivity, lattice_structure, random_inhibition_prob, seed, cache_dir=None):
+	'''
+	Load the topology of a configuration from the cache, building (and caching) it if it
+	isn't there yet. Pass 'cache_dir=None' to always build it.
+	'''
+	params = (conv_size, conv_stride, conv_features, connectivity, lattice_structure, random_inhibition_prob, seed)
+
+	if cache_dir is None:
+		return build_topology(*params)
+
+	cache_file = get_cache_file(cache_dir, *params)
+	if os.path.isfile(cache_file):
+		print '...loading network topology from', cache_file
+		cached = np.load(cache_file)
+		return { name : cached[name] for name in cached.files }
+
+	topology = build_topology(*params)
+
+	if not os.path.isdir(cache_dir):
+		os.makedirs(cache_dir)
+
+	# write to a temporary file first, so concurrent jobs never read a partial cache file
+	temp_file = cache_file[:-len('.npz')] + '.' + str(os.getpid()) + '.tmp.npz'
+	np.savez(temp_file, **topology)
+	os.rename(temp_file, cache_file)
+
+	print '...saved network topology to', cache_file
+
+	return topology